@@ -0,0 +1,293 @@
+import math
+import time
+from collections import deque
+
+from backends import FEASIBLE, OPTIMAL, PulpBackend, SolveResult
+from bnb import Chains
+
+
+class Packing(object):
+    """A feasible set of atoms that can be grown and shrunk one atom at a time.
+
+    Items are checked against the atom holding them and groups through the
+    chains of bnb.Chains, so the feasibility rules are exactly those of the
+    exact engine. Nothing is built per atom up front: an atom's chain is
+    made the first time it is tried, and packings of the same model can
+    share them.
+    """
+
+    def __init__(self, model, chains=None):
+        self.item_ids, self.offsets = model.item_ids, model.offsets
+        self.values = model.values
+        self.num_atoms = model.num_atoms
+        if chains is None:
+            # single-member groups without a parent constrain nothing
+            chains = Chains(model, [g for g, (members, parent) in enumerate(model.groups)
+                                    if parent is not None or len(members) > 1])
+        self.chains = chains
+        self.chosen = set()
+        self.holder = {}
+        self.active = {}
+        self.users = {}
+        self.total = 0
+
+    def fits(self, a):
+        holder, item_ids = self.holder, self.item_ids
+        for k in range(self.offsets[a], self.offsets[a + 1]):
+            if item_ids[k] in holder:
+                return False
+        for g, member in self.chains[a]:
+            current = self.active.get(g)
+            if current is not None and (current != member or member < self.num_atoms):
+                return False
+        return True
+
+    def add(self, a):
+        self.chosen.add(a)
+        for k in range(self.offsets[a], self.offsets[a + 1]):
+            self.holder[self.item_ids[k]] = a
+        for g, member in self.chains[a]:
+            self.active[g] = member
+            self.users.setdefault(g, set()).add(a)
+        self.total += self.values[a]
+
+    def remove(self, a):
+        self.chosen.discard(a)
+        for k in range(self.offsets[a], self.offsets[a + 1]):
+            del self.holder[self.item_ids[k]]
+        for g, member in self.chains[a]:
+            users = self.users[g]
+            users.discard(a)
+            if not users:
+                del self.users[g]
+                del self.active[g]
+        self.total -= self.values[a]
+
+    def conflicts(self, a):
+        """Chosen atoms that would have to leave for atom a to fit."""
+        result = set()
+        for k in range(self.offsets[a], self.offsets[a + 1]):
+            b = self.holder.get(self.item_ids[k])
+            if b is not None:
+                result.add(b)
+        # every chosen atom using a group uses it through the active member
+        for g, member in self.chains[a]:
+            current = self.active.get(g)
+            if current is not None and (current != member or member < self.num_atoms):
+                result.update(self.users[g])
+        return list(result)
+
+    def fill(self, order, deadline=None):
+        """Greedily adds every atom of order that still fits, stopping at the
+        perf_counter time deadline if one is given. The deadline is checked
+        every 1024 atoms, so the first ones are always tried."""
+        for k, a in enumerate(order):
+            if deadline is not None and k and not k % 1024 and time.perf_counter() >= deadline:
+                break
+            if a not in self.chosen and self.values[a] > 0 and self.fits(a):
+                self.add(a)
+
+
+def item_bound(model, atoms):
+    """Bound on the optimum of the given atoms: every item, and every "at most
+    one" group made only of atoms, is worth at most the best value per item
+    (or group) among the atoms holding it. This is BranchAndBound's bound
+    without its masks. It takes one pass over the atoms' items, done with
+    numpy when it is installed."""
+    n = model.num_atoms
+    values, item_ids, offsets = model.values, model.item_ids, model.offsets
+    groups = [members for members, parent in model.groups
+              if parent is None and len(members) > 1 and all(m < n for m in members)]
+    if not atoms:
+        return 0.0
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+    if numpy is None:
+        group_keys = {}
+        for g, members in enumerate(groups):
+            for m in members:
+                group_keys.setdefault(m, []).append(~g)
+        best = {}
+        bound = 0.0
+        for a in atoms:
+            keys = list(item_ids[offsets[a]:offsets[a + 1]]) + group_keys.get(a, [])
+            if not keys:
+                bound += values[a]
+                continue
+            density = values[a] / float(len(keys))
+            for key in keys:
+                if density > best.get(key, 0.0):
+                    best[key] = density
+        return bound + sum(best.values())
+
+    offsets = numpy.asarray(offsets, dtype=numpy.int64)
+    ids = numpy.asarray(item_ids, dtype=numpy.int64)[:offsets[-1]]
+    chosen = numpy.zeros(n, dtype=bool)
+    chosen[atoms] = True
+    counts = numpy.diff(offsets)
+    sizes = counts.copy()
+    for members in groups:
+        sizes[members] += 1
+    worth = numpy.where(chosen, numpy.asarray(values, dtype=float), 0.0)
+    density = numpy.where(sizes > 0, worth / numpy.maximum(sizes, 1), 0.0)
+    best = numpy.zeros(int(ids.max()) + 1 if len(ids) else 0)
+    numpy.maximum.at(best, ids, numpy.repeat(density, counts))
+    bound = float(worth[sizes == 0].sum() + best.sum())
+    return bound + sum(float(density[members].max()) for members in groups)
+
+
+def lp_relaxation(model, time_limit=None):
+    """Solves the LP relaxation of model; returns (atom values, bound) or None.
+
+    scipy's HiGHS is used in process when it is installed, otherwise the
+    relaxation goes through pulp.
+    """
+    n = model.num_atoms
+    if n == 0:
+        return [], 0.0
+    try:
+        from scipy.optimize import linprog
+        from matrixmodel import constraint_matrix, objective
+    except ImportError:
+        linprog = None
+    if linprog is not None:
+        matrix, rhs = constraint_matrix(model)
+        cost = -objective(model)
+        options = {} if time_limit is None else {'time_limit': max(time_limit, 0.001)}
+        r = len(rhs)
+        lp = linprog(cost, A_ub=matrix if r else None, b_ub=rhs if r else None, bounds=(0, 1),
+                     method='highs', options=options)
+        if lp.status != 0:
+            return None
+        return [float(x) for x in lp.x[:n]], -float(lp.fun)
+
+    from pulp import LpContinuous, value
+    backend = PulpBackend(time_limit=time_limit)
+    problem, variables = backend.problem(model)
+    for z in variables:
+        z.cat = LpContinuous
+    problem.solve(backend.solver())
+    if problem.status != 1:
+        return None
+    return [z.value() or 0.0 for z in variables[:n]], value(problem.objective)
+
+
+def _ranked(atoms, scores, numpy=None):
+    """Returns atoms by decreasing score, ties in their given order; scores
+    is indexed by atom, and sorted with numpy when it is given."""
+    if numpy is None:
+        return sorted(atoms, key=scores.__getitem__, reverse=True)
+    atoms = numpy.asarray(atoms, dtype=numpy.int64)
+    return atoms[numpy.argsort(-scores[atoms], kind='stable')].tolist()
+
+
+def approximate(model, budget_ms=None):
+    """Finds a good allocation of model quickly, together with an upper bound.
+
+    A greedy pass by value per square root of the number of items comes
+    first. If time remains, the LP relaxation is solved and rounded (atoms
+    by decreasing LP value), and its optimum tightens the bound. Local
+    search then swaps in unselected atoms worth more than the atoms they
+    displace until nothing improves or the budget of budget_ms
+    milliseconds runs out. Returns a SolveResult whose gap measures how far
+    the allocation can be from optimal.
+
+    Every step stops at the budget, the greedy pass included, so a large
+    model may come back with a partial but feasible allocation. The item
+    bound needs only one pass over the items and is always computed.
+    """
+    start = time.perf_counter()
+    deadline = None if budget_ms is None else start + budget_ms / 1000.0
+    values = model.values
+    n = model.num_atoms
+
+    def remaining():
+        return None if deadline is None else deadline - time.perf_counter()
+
+    def expired():
+        left = remaining()
+        return left is not None and left <= 0
+
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+
+    atoms = [a for a in range(n) if values[a] > 0]
+    best = Packing(model)
+
+    # greedy by value per square root of the number of items
+    item_ids, offsets = model.item_ids, model.offsets
+    if numpy is not None:
+        sizes = numpy.diff(numpy.asarray(offsets, dtype=numpy.int64))
+        worth = numpy.asarray(values, dtype=float)
+        with numpy.errstate(divide='ignore'):
+            score = numpy.where(sizes > 0, worth / numpy.sqrt(sizes), numpy.inf)
+    else:
+        worth = values
+        score = [values[a] / math.sqrt(offsets[a + 1] - offsets[a])
+                 if offsets[a + 1] > offsets[a] else float('inf') for a in range(n)]
+    best.fill(_ranked(atoms, score, numpy), deadline)
+    bound = item_bound(model, atoms)
+
+    # LP relaxation rounding; setting up and reading back a large LP takes
+    # time beyond the solver's own limit, so it gets half of what is left
+    left = remaining()
+    if left is None or left > 0:
+        lp = lp_relaxation(model, None if left is None else left / 2)
+        if lp is not None:
+            x, lp_bound = lp
+            bound = min(bound, lp_bound)
+            rounded = Packing(model, best.chains)
+            rounded.fill(sorted(atoms, key=lambda a: (x[a], values[a]), reverse=True), deadline)
+            if rounded.total > best.total:
+                best = rounded
+
+    # local search: swap in an atom worth more than everything it displaces.
+    # Only the atoms sharing an item or a group with the displaced ones can
+    # fit or gain from a swap afterwards, so only those are tried again
+    holders = {}
+    for k, a in enumerate(atoms):
+        if not k % 1024 and expired():
+            holders = {}
+            break
+        for i in range(offsets[a], offsets[a + 1]):
+            holders.setdefault(item_ids[i], []).append(a)
+        for g, member in best.chains[a]:
+            holders.setdefault(~g, []).append(a)
+    queue = deque(_ranked(atoms, worth, numpy) if holders else ())
+    queued = set(queue)
+    steps = 0
+    while queue and best.total < bound - 1e-9:
+        if not steps % 64 and expired():
+            break
+        steps += 1
+        a = queue.popleft()
+        queued.discard(a)
+        if a in best.chosen:
+            continue
+        displaced = best.conflicts(a)
+        if values[a] > sum(values[b] for b in displaced) + 1e-9:
+            for b in displaced:
+                best.remove(b)
+            best.add(a)
+            freed = set()
+            for b in displaced:
+                for i in range(offsets[b], offsets[b + 1]):
+                    freed.update(holders[item_ids[i]])
+                for g, member in best.chains[b]:
+                    freed.update(holders[~g])
+            freed = sorted(freed, key=values.__getitem__, reverse=True)
+            best.fill(freed)
+            for c in freed:
+                if c not in best.chosen and c not in queued:
+                    queue.append(c)
+                    queued.add(c)
+
+    objective = best.total
+    status = OPTIMAL if objective >= bound - 1e-9 else FEASIBLE
+    return SolveResult(sorted(best.chosen), objective, max(bound, objective), status,
+                       "approx", time.perf_counter() - start)
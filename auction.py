@@ -0,0 +1,187 @@
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from decompose import submodel
+from itemuniverse import ItemUniverse
+from metrics import phase
+from wdpmodel import WDPModel
+
+
+class Auction(object):
+    """Collects the bids of many bidders and solves one combined WDP over them.
+
+    Every bid keeps its own structure (XOR groups, clause indicators) in the
+    combined model and all bids compete for items with the same name. Bids
+    created with universe=auction.universe are added without re-interning.
+    """
+
+    def __init__(self, universe=None):
+        self.universe = universe if universe is not None else ItemUniverse()
+        self.bidders = []
+        self.bids = []
+        self.atom_offsets = array('q', [0])
+        self.indicator_offsets = None
+        self.result = None
+        self.counterfactuals = None
+        self._model = None
+        self._index = {}
+
+    def __len__(self):
+        return len(self.bidders)
+
+    def add(self, bidder, bid):
+        """Adds the bid of a new bidder."""
+        if bidder in self._index:
+            raise ValueError("Bidder %r already has a bid." % (bidder,))
+        self._index[bidder] = len(self.bidders)
+        self.bidders.append(bidder)
+        self.bids.append(bid)
+        self.atom_offsets.append(self.atom_offsets[-1] + bid.size)
+        self._model = None
+
+    @property
+    def size(self):
+        """Total number of atoms over all bids."""
+        return self.atom_offsets[-1]
+
+    def _item_map(self, universe, maps):
+        """Returns a list mapping ids of another universe to ids in this one."""
+        key = id(universe)
+        if key not in maps:
+            intern = self.universe.intern
+            maps[key] = [intern(name) for name in universe.names]
+        return maps[key]
+
+    def model(self):
+        """Builds the combined WDP model.
+
+        Atoms of bidder b are numbered from atom_offsets[b]; the indicators
+        of all bids follow after the last atom, those of bidder b from
+        indicator_offsets[b] on.
+        """
+        total = self.size
+        item_ids = array('i')
+        offsets = array('q', [0])
+        values = []
+        groups = []
+        num_indicators = 0
+        indicator_offsets = array('q', [total])
+        maps = {}
+
+        for b, bid in enumerate(self.bids):
+            sub = bid.model()
+            start = self.atom_offsets[b]
+            n = sub.num_atoms
+
+            # copy the bid's atoms, translating item ids when needed
+            if bid.universe is self.universe:
+                item_ids.extend(sub.item_ids)
+            else:
+                idmap = self._item_map(bid.universe, maps)
+                item_ids.extend(idmap[i] for i in sub.item_ids)
+            base = offsets[-1]
+            offsets.extend(base + k for k in sub.offsets[1:])
+            values.extend(sub.values)
+
+            # renumber group variables into the combined model
+            def var(v, start=start, n=n, ind=total + num_indicators - n):
+                return v + start if v < n else v + ind
+            for members, parent in sub.groups:
+                if type(members) == range and members.stop <= n:
+                    members = range(members.start + start, members.stop + start)
+                else:
+                    members = [var(v) for v in members]
+                groups.append((members, None if parent is None else var(parent)))
+            num_indicators += sub.num_indicators
+            indicator_offsets.append(total + num_indicators)
+
+        self.indicator_offsets = indicator_offsets
+        return WDPModel(item_ids, offsets, values, groups, num_indicators)
+
+    def split(self, result):
+        """Maps the SolveResult of the combined model to {bidder: winners}."""
+        per_bid = [[] for b in self.bids]
+        for i in result.selected:
+            b = bisect_right(self.atom_offsets, i) - 1
+            per_bid[b].append(i - self.atom_offsets[b])
+        return dict((self.bidders[b], [(i,) + self.bids[b].atom(i) for i in per_bid[b]])
+                    for b in range(len(self.bids)))
+
+    def WDP(self, engine="auto", **options):
+        """Solves the combined winner determination problem.
+
+        Returns a dict mapping every bidder to its winners, as the list of
+        (index in the bidder's bid, items, value) tuples its own WDP returns.
+        The SolveResult (status, objective, bound) is kept in self.result.
+        engine and options are passed on to WDPModel.solve.
+        """
+        with phase("model"):
+            model = self._model = self.model()
+        self.result = model.solve(engine, **options)
+        with phase("extract"):
+            return self.split(self.result)
+
+    def without(self, model, b):
+        """Returns the atoms, indicators and model left once bidder b is taken out of model."""
+        start, stop = self.atom_offsets[b], self.atom_offsets[b + 1]
+        first, last = self.indicator_offsets[b], self.indicator_offsets[b + 1]
+        atoms = list(range(start)) + list(range(stop, model.num_atoms))
+        indicators = list(range(model.num_atoms, first)) + \
+            list(range(last, self.indicator_offsets[-1]))
+        return atoms, indicators, submodel(model, atoms, indicators)
+
+    def payments(self, engine="auto", workers=1, **options):
+        """Computes the VCG payment of every bidder.
+
+        A winner pays the welfare the others would reach without it, less
+        the welfare they get in the solution of WDP. Every winner thus needs
+        one more solve: its atoms and indicators are dropped from the model
+        WDP built, and the other winners of that solution seed the solve as
+        its incumbent, for engines that take one (see WDPModel.solve).
+        Bidders who win nothing pay 0 without a solve, and so do winners
+        worth 0, since the incumbent then already reaches the optimum. The
+        solves run on a pool of workers processes when workers > 1. WDP is run first (with engine and options) when the auction has
+        no solution yet.
+
+        Returns a dict mapping every bidder to its payment. The SolveResult
+        of each extra solve is kept in self.counterfactuals; payments are
+        exact only when those and self.result are OPTIMAL.
+        """
+        if self.result is None or self._model is None:
+            self.WDP(engine, **options)
+        model = self._model
+        welfare = self.result.objective
+        won = [[] for b in self.bids]
+        for i in self.result.selected:
+            won[bisect_right(self.atom_offsets, i) - 1].append(i)
+
+        jobs = []
+        payments = dict((bidder, 0) for bidder in self.bidders)
+        for b, atoms in enumerate(won):
+            value = sum(model.values[i] for i in atoms)
+            if value > 0:
+                kept, indicators, sub = self.without(model, b)
+                number = dict((a, k) for k, a in enumerate(kept))
+                incumbent = [number[i] for i in self.result.selected if i in number]
+                jobs.append((b, value, sub, incumbent))
+
+        with phase("payments"):
+            if workers > 1 and len(jobs) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [pool.submit(_counterfactual, sub, engine, incumbent, options)
+                               for b, value, sub, incumbent in jobs]
+                    results = [future.result() for future in futures]
+            else:
+                results = [_counterfactual(sub, engine, incumbent, options)
+                           for b, value, sub, incumbent in jobs]
+
+        self.counterfactuals = {}
+        for (b, value, sub, incumbent), result in zip(jobs, results):
+            self.counterfactuals[self.bidders[b]] = result
+            payments[self.bidders[b]] = result.objective - (welfare - value)
+        return payments
+
+
+def _counterfactual(model, engine, incumbent, options):
+    """Solves the model of an auction without one bidder, see Auction.payments."""
+    return model.solve(engine, incumbent=incumbent, **options)
@@ -0,0 +1,389 @@
+import abc
+import importlib.metadata
+import importlib.util
+import os
+import re
+import tempfile
+import time
+
+from bnb import BranchAndBound
+from metrics import count, phase
+
+# pulp and scipy take most of the startup time, so they are imported by the
+# backends that use them rather than here
+
+OPTIMAL = "optimal"
+FEASIBLE = "feasible"
+NOT_SOLVED = "not solved"
+
+
+class SolveResult(object):
+    """Outcome of solving a WDPModel.
+
+    selected holds the sorted indexes of the winning atoms, objective their
+    total value and bound the best known upper bound on the optimum (None
+    when the backend cannot tell). status is OPTIMAL, FEASIBLE (stopped on
+    a limit with a solution) or NOT_SOLVED (stopped before any solution;
+    selected is then empty, which is still a valid allocation).
+    """
+
+    __slots__ = ('selected', 'objective', 'bound', 'status', 'backend', 'seconds')
+
+    def __init__(self, selected, objective, bound, status, backend, seconds=0.0):
+        self.selected = selected
+        self.objective = objective
+        self.bound = bound
+        self.status = status
+        self.backend = backend
+        self.seconds = seconds
+
+    @property
+    def gap(self):
+        """Relative gap (bound - objective) / |bound|, or None without a bound."""
+        if self.bound is None:
+            return None
+        if self.bound == 0:
+            return 0.0
+        return max(0.0, (self.bound - self.objective) / abs(self.bound))
+
+    def __repr__(self):
+        return "SolveResult(status=%r, objective=%r, bound=%r, backend=%r)" % (
+            self.status, self.objective, self.bound, self.backend)
+
+
+class Winners(list):
+    """List of (winner index, winner items, winner value) tuples that also
+    carries the status, objective, bound and gap of the solve behind it."""
+
+    def __init__(self, winners, result):
+        list.__init__(self, winners)
+        self.result = result
+        self.status = result.status
+        self.objective = result.objective
+        self.bound = result.bound
+        self.gap = result.gap
+
+    def as_dict(self):
+        """Returns the winners and solve outcome as plain data for JSON output."""
+        return {"status": self.status, "objective": self.objective, "bound": self.bound,
+                "winners": [{"index": i, "items": items, "value": value}
+                            for i, items, value in self]}
+
+
+class SolverBackend(abc.ABC):
+    """Solves WDPModels under a wall-clock limit (seconds), a relative MIP
+    gap and a thread count; None leaves a setting at the solver default.
+    takes_start tells whether solve makes use of an incumbent."""
+
+    name = None
+    takes_start = True
+
+    def __init__(self, time_limit=None, gap=None, threads=None):
+        if gap is not None and not 0 <= gap < 1:
+            raise ValueError("Gap must be at least 0 and less than 1.")
+        self.time_limit = time_limit
+        self.gap = gap
+        self.threads = threads
+
+    @abc.abstractmethod
+    def solve(self, model, incumbent=None):
+        """Solves model and returns a SolveResult.
+
+        incumbent is an optional feasible set of atom indexes used as a
+        starting solution.
+        """
+        pass
+
+
+class PulpBackend(SolverBackend):
+    """Builds an integer program with pulp and hands it to one of pulp's solvers."""
+
+    def __init__(self, solver="PULP_CBC_CMD", time_limit=None, gap=None, threads=None):
+        SolverBackend.__init__(self, time_limit, gap, threads)
+        self.solver_name = solver
+        self.name = solver
+
+    def solver(self, warm_start=False, log_path=None):
+        """Returns a configured pulp solver instance."""
+        from pulp import getSolver
+        options = {'msg': False}
+        if self.time_limit is not None:
+            options['timeLimit'] = self.time_limit
+        if self.gap is not None:
+            options['gapRel'] = self.gap
+        if self.threads is not None:
+            options['threads'] = self.threads
+        if warm_start:
+            options['warmStart'] = True
+        if log_path is not None and self.solver_name == "PULP_CBC_CMD":
+            options['logPath'] = log_path
+        return getSolver(self.solver_name, **options)
+
+    def problem(self, model):
+        """Builds the pulp problem for model and returns (problem, variables)."""
+        from pulp import LpBinary, LpMaximize, LpProblem, LpVariable, lpDot, lpSum
+
+        # set up our problem, variables, and constraints
+        problem = LpProblem('winner_determination', LpMaximize)
+        variables = [LpVariable('z{}'.format(i + 1), 0, 1, LpBinary) for i in range(model.num_atoms)]
+        variables.extend(LpVariable('y{}'.format(i + 1), 0, 1, LpBinary) for i in range(model.num_indicators))
+
+        # create objective function value*variable
+        problem += lpDot(model.values, variables[:model.num_atoms])
+
+        # one row per item shared by several atoms
+        for item, atoms in model.item_rows().items():
+            if len(atoms) > 1:
+                problem += lpSum(variables[i] for i in atoms) <= 1
+
+        # one "at most one" row per group
+        for members, parent in model.groups:
+            if parent is None:
+                if len(members) > 1:
+                    problem += lpSum(variables[i] for i in members) <= 1
+            else:
+                problem += lpSum(variables[i] for i in members) <= variables[parent]
+        return problem, variables
+
+    def solve(self, model, incumbent=None):
+        start = time.perf_counter()
+        with phase("build"):
+            problem, variables = self.problem(model)
+        if incumbent is not None:
+            set_start(model, variables, incumbent)
+        return self.solve_problem(problem, variables[:model.num_atoms], model.values,
+                                  incumbent is not None, start)
+
+    def solve_problem(self, problem, atom_variables, values, warm_start=False, start=None):
+        """Solves a pulp problem whose atoms are atom_variables and reads back a SolveResult."""
+        from pulp import LpSolutionIntegerFeasible, LpSolutionOptimal, LpStatusOptimal
+        if start is None:
+            start = time.perf_counter()
+        handle, log_path = tempfile.mkstemp(suffix='.log')
+        os.close(handle)
+        try:
+            with phase("solver"):
+                problem.solve(self.solver(warm_start, log_path))
+            with open(log_path) as log:
+                log_text = log.read()
+        finally:
+            os.remove(log_path)
+        _count_cbc(log_text)
+
+        # only trust variable values when the solver reports a solution
+        sol_status = getattr(problem, 'sol_status', None)
+        if sol_status == LpSolutionOptimal or (sol_status is None and problem.status == LpStatusOptimal):
+            status = OPTIMAL
+        elif sol_status == LpSolutionIntegerFeasible:
+            status = FEASIBLE
+        else:
+            status = NOT_SOLVED
+        selected = []
+        if status != NOT_SOLVED:
+            with phase("read_solution"):
+                selected = [i for i, z in enumerate(atom_variables)
+                            if z.value() is not None and z.value() > 0.5]
+        objective = sum(values[i] for i in selected)
+        bound = objective if status == OPTIMAL and not self.gap else _cbc_bound(log_text)
+        if bound is None and status == OPTIMAL:
+            bound = objective / (1.0 - self.gap)
+        return SolveResult(selected, objective, bound, status, self.name, time.perf_counter() - start)
+
+
+def _cbc_bound(log_text):
+    """Reads CBC's best possible objective from its log (CBC minimises, so it is negated)."""
+    found = re.findall(r'best possible (\S+?)\)', log_text)
+    if not found:
+        return None
+    return -float(found[-1])
+
+
+def _count_cbc(log_text):
+    """Reports CBC's branch and bound nodes and LP iterations from its log."""
+    for name, pattern in (("mip_nodes", r'Enumerated nodes:\s+(\d+)'),
+                          ("lp_iterations", r'Total iterations:\s+(\d+)')):
+        found = re.search(pattern, log_text)
+        if found:
+            count(name, int(found.group(1)))
+
+
+def set_start(model, variables, incumbent):
+    """Sets pulp initial values from a feasible set of atom indexes, indicators included."""
+    chosen = set(incumbent)
+    for i, z in enumerate(variables):
+        z.setInitialValue(1 if i in chosen else 0)
+    # switch on the indicators that the chosen atoms need
+    parents = {}
+    for members, parent in model.groups:
+        if parent is not None:
+            for m in members:
+                parents.setdefault(m, []).append(parent)
+    pending = list(chosen)
+    while pending:
+        for parent in parents.get(pending.pop(), ()):
+            if variables[parent].varValue != 1:
+                variables[parent].setInitialValue(1)
+                pending.append(parent)
+
+
+class BranchAndBoundBackend(SolverBackend):
+    """In-process branch and bound from bnb.py. It is single-threaded, so threads is ignored."""
+
+    name = "bnb"
+
+    def solve(self, model, incumbent=None):
+        start = time.perf_counter()
+        search = BranchAndBound(model)
+        with phase("solver"):
+            selected = search.solve(incumbent, time_limit=self.time_limit, gap=self.gap)
+        count("bnb_nodes", search.nodes)
+        objective = sum(model.values[i] for i in selected)
+        status = OPTIMAL if search.complete and not self.gap else FEASIBLE
+        bound = objective if status == OPTIMAL else max(search.bound, objective)
+        return SolveResult(selected, objective, bound, status, self.name, time.perf_counter() - start)
+
+
+class HighsBackend(SolverBackend):
+    """Hands the model to HiGHS through scipy.optimize.milp as one sparse matrix.
+
+    No pulp objects are built, so this is the engine for large models. milp
+    takes no starting solution and no thread count, so incumbent and
+    threads are ignored.
+    """
+
+    name = "highs"
+    takes_start = False
+
+    def solve(self, model, incumbent=None):
+        import numpy
+        from matrixmodel import constraint_matrix, objective
+        from scipy.optimize import Bounds, LinearConstraint, milp
+
+        start = time.perf_counter()
+        if model.num_atoms + model.num_indicators == 0:
+            # milp rejects an empty objective
+            return SolveResult([], 0, 0, OPTIMAL, self.name, time.perf_counter() - start)
+        with phase("build"):
+            matrix, rhs = constraint_matrix(model)
+        options = {'disp': False}
+        if self.time_limit is not None:
+            options['time_limit'] = self.time_limit
+        if self.gap is not None:
+            options['mip_rel_gap'] = self.gap
+        constraints = [LinearConstraint(matrix, -numpy.inf, rhs)] if len(rhs) else []
+        c = objective(model)
+        with phase("solver"):
+            res = milp(-c, integrality=numpy.ones(len(c)), bounds=Bounds(0, 1),
+                       constraints=constraints, options=options)
+        count("mip_nodes", getattr(res, 'mip_node_count', None) or 0)
+
+        # winners are read back as one vector
+        selected = []
+        if res.x is not None:
+            selected = numpy.flatnonzero(res.x[:model.num_atoms] > 0.5).tolist()
+        objective_value = sum(model.values[i] for i in selected)
+        if res.status == 0 and not self.gap:
+            status, bound = OPTIMAL, objective_value
+        else:
+            status = FEASIBLE if res.x is not None else NOT_SOLVED
+            dual = getattr(res, 'mip_dual_bound', None)
+            bound = None if dual is None else max(-float(dual), objective_value)
+        return SolveResult(selected, objective_value, bound, status, self.name,
+                           time.perf_counter() - start)
+
+
+class DPBackend(SolverBackend):
+    """Exact subset dynamic programming from dp.py, for models with few items.
+
+    It always runs to the optimum, which takes a bounded time for the
+    models it accepts, so time_limit, gap and threads are ignored. Models
+    SubsetDP cannot handle, or with more than dp.MAX_BITS bits, raise
+    ValueError. The optimum needs no starting solution, so incumbent is
+    ignored.
+    """
+
+    name = "dp"
+    takes_start = False
+
+    def solve(self, model, incumbent=None):
+        from dp import MAX_BITS, SubsetDP
+        start = time.perf_counter()
+        search = SubsetDP(model)
+        if not search.supported():
+            raise ValueError("The dp engine needs a model of at most %d shared items and groups, "
+                             "without indicators other than those of XORofOR." % MAX_BITS)
+        with phase("solver"):
+            selected = search.solve()
+        objective = sum(model.values[i] for i in selected)
+        return SolveResult(selected, objective, objective, OPTIMAL, self.name,
+                           time.perf_counter() - start)
+
+
+def has_highs():
+    """Whether scipy provides milp (scipy 1.9 on), which the "highs" engine needs.
+
+    scipy.optimize is only looked up and its version read; nothing of it
+    is imported here.
+    """
+    if importlib.util.find_spec("scipy") is None or \
+            importlib.util.find_spec("scipy.optimize") is None:
+        return False
+    try:
+        version = importlib.metadata.version("scipy")
+    except importlib.metadata.PackageNotFoundError:
+        return False
+    match = re.match(r'(\d+)\.(\d+)', version)
+    return match is not None and (int(match.group(1)), int(match.group(2))) >= (1, 9)
+
+
+def has_pulp():
+    """Whether pulp is installed, which the "pulp" engines need."""
+    return importlib.util.find_spec("pulp") is not None
+
+
+_installed = []
+
+
+def installed_solvers():
+    """Names of the pulp solvers found on this machine (looked up once)."""
+    if not _installed:
+        from pulp import listSolvers
+        _installed.extend(listSolvers(onlyAvailable=True))
+    return _installed
+
+
+def available_backends():
+    """Names of the engines that can be used on this machine."""
+    return ["auto", "pulp", "bnb", "dp"] + (["highs"] if has_highs() else []) + installed_solvers()
+
+
+def get_backend(engine="auto", time_limit=None, gap=None, threads=None, model=None,
+                start=False):
+    """Returns a backend for an engine name: "auto", "pulp" (CBC), "bnb", "dp", "highs" or
+    any pulp solver name.
+
+    "auto" picks "dp" when model is given and has at most dp.AUTO_BITS shared
+    items and groups. Otherwise, when start says a starting solution will be
+    given, it picks "pulp" if pulp is installed, since CBC takes MIP starts
+    and HiGHS does not; else "highs" when scipy provides it, as it builds
+    no object per variable, and "pulp" without scipy.
+    """
+    if engine == "auto":
+        from dp import AUTO_BITS, SubsetDP
+        if model is not None and SubsetDP(model).supported(AUTO_BITS):
+            engine = "dp"
+        elif start and has_pulp():
+            engine = "pulp"
+        else:
+            engine = "highs" if has_highs() else "pulp"
+    if engine == "bnb":
+        return BranchAndBoundBackend(time_limit, gap, threads)
+    if engine == "dp":
+        return DPBackend(time_limit, gap, threads)
+    if engine == "highs" and has_highs():
+        return HighsBackend(time_limit, gap, threads)
+    if engine == "pulp":
+        engine = "PULP_CBC_CMD"
+    if engine not in installed_solvers():
+        raise ValueError("Engine must be one of %s." % ", ".join(available_backends()))
+    return PulpBackend(engine, time_limit, gap, threads)
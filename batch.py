@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+
+class BatchResult(object):
+    """Outcome of one bid in solve_many.
+
+    index is the position of the bid in the input, winners what its WDP
+    returned (None on failure), error the exception it raised (None on
+    success) and seconds the time its solve took inside the worker.
+    """
+
+    __slots__ = ('index', 'winners', 'error', 'seconds')
+
+    def __init__(self, index, winners, error, seconds):
+        self.index = index
+        self.winners = winners
+        self.error = error
+        self.seconds = seconds
+
+    def __repr__(self):
+        return "BatchResult(index=%r, error=%r, seconds=%r)" % (self.index, self.error, self.seconds)
+
+
+def in_process(engine):
+    """Whether engine solves in the Python process, holding the GIL, so that
+    solves only run side by side in processes. Only the pulp solvers run in
+    a subprocess of their own; "auto" picks "dp" or "highs" when it can."""
+    return engine in ("auto", "bnb", "dp", "highs")
+
+
+def _solve(index, bid, options):
+    """Runs one WDP, turning any exception into the result instead of raising it."""
+    start = time.perf_counter()
+    try:
+        winners = bid.WDP(**options)
+        error = None
+    except Exception as e:
+        winners = None
+        error = e
+    return BatchResult(index, winners, error, time.perf_counter() - start)
+
+
+def solve_many(bids, workers=1, max_in_flight=None, processes=False, **options):
+    """Solves many independent bids concurrently and yields a BatchResult per bid as it finishes.
+
+    bids may be any iterable, including a generator; at most max_in_flight
+    bids (default 2 * workers) are taken from it before earlier ones finish.
+    Threads are used by default, which suits the pulp engines since the
+    solver itself runs in a subprocess; pass processes=True for in-process
+    engines, see in_process. options are passed on to each bid's WDP.
+    """
+    if max_in_flight is None:
+        max_in_flight = 2 * workers
+    bids = iter(bids)
+    executor_type = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_type(max_workers=workers) as executor:
+        # each future with the index of its bid, for failures outside _solve
+        pending = {}
+        index = 0
+        exhausted = False
+        while True:
+            # keep the queue topped up without reading the whole input
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    bid = next(bids)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(_solve, index, bid, options)] = index
+                index += 1
+            if not pending:
+                return
+            done = wait(pending, return_when=FIRST_COMPLETED)[0]
+            for future in done:
+                # a bid that cannot be pickled, or a worker process that died,
+                # fails the future itself rather than the WDP
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = BatchResult(pending[future], None, e, 0.0)
+                del pending[future]
+                yield result
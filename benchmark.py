@@ -0,0 +1,204 @@
+import csv
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+from optparse import OptionParser, Values
+from simulation import make_bid
+
+LANGUAGES = ['OR', 'XOR', 'ORofXOR', 'XORofOR']
+ACTIONS = ['WDP', 'translate']
+PARAMETERS = ['num_items', 'num_bids', 'max_items', 'num_clauses']
+PERCENTILES = [50, 90, 99]
+STATS = ['min', 'mean', 'p50', 'p90', 'p99', 'max']
+
+
+def percentile(samples, p):
+    """Returns the p-th percentile of samples, interpolating between the closest ranks."""
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * p / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def cases(grid):
+    """Expands a grid {parameter: [values]} over languages and actions into case dicts.
+
+    OR bids are already in OR*, so they are not translated.
+    """
+    names = ['language', 'action'] + PARAMETERS
+    for values in itertools.product(*[grid[name] for name in names]):
+        case = dict(zip(names, values))
+        if case['language'] == 'OR' and case['action'] == 'translate':
+            continue
+        yield case
+
+
+def run_case(case, repeats=5, warmups=1, engine="auto", seed=0):
+    """Times one case and returns it with its timing statistics in seconds.
+
+    Every run gets a new bid from a seeded generator, so a case sees the
+    same bids on every machine. Generating the bid is not timed and warmup
+    runs are discarded.
+    """
+    rng = random.Random(seed)
+    samples = []
+    for run in range(warmups + repeats):
+        random.seed(rng.random())
+        bid = make_bid(Values(dict(case, max_value=20)), case['language'])
+        start = time.perf_counter()
+        if case['action'] == 'WDP':
+            bid.WDP(engine=engine)
+        else:
+            bid.to_OR()
+        elapsed = time.perf_counter() - start
+        if run >= warmups:
+            samples.append(elapsed)
+
+    result = dict(case)
+    result['engine'] = engine
+    result['repeats'] = repeats
+    result['min'] = min(samples)
+    result['mean'] = sum(samples) / len(samples)
+    for p in PERCENTILES:
+        result['p%d' % p] = percentile(samples, p)
+    result['max'] = max(samples)
+    return result
+
+
+def run(grid, repeats=5, warmups=1, engine="auto", seed=0, progress=None):
+    """Runs every case of the grid and returns the result dicts."""
+    results = []
+    for case in cases(grid):
+        results.append(run_case(case, repeats, warmups, engine, seed))
+        if progress is not None:
+            progress(results[-1])
+    return results
+
+
+def save_json(results, path):
+    """Writes results with a description of the machine they ran on."""
+    with open(path, 'w') as f:
+        json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                   "results": results}, f, indent=1)
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def save_csv(results, path):
+    fields = ['language', 'action'] + PARAMETERS + ['engine', 'repeats'] + STATS
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fields)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def _key(result):
+    return tuple(result[name] for name in ['language', 'action', 'engine'] + PARAMETERS)
+
+
+def compare(baseline, current, metric='p50', threshold=0.2, floor=1e-3):
+    """Lists the cases of current that got slower than in baseline.
+
+    A case regresses when its metric grew by more than threshold (a
+    fraction) and by more than floor seconds, so noise on very fast cases
+    is not reported. Returns (case, baseline value, current value) tuples.
+    """
+    before = dict((_key(result), result[metric]) for result in baseline)
+    regressions = []
+    for result in current:
+        old = before.get(_key(result))
+        if old is None:
+            continue
+        new = result[metric]
+        if new > old * (1 + threshold) and new - old > floor:
+            regressions.append((result, old, new))
+    return regressions
+
+
+def _ints(text):
+    return [int(x) for x in text.split(',')]
+
+
+def _names(text, allowed):
+    names = text.split(',')
+    for name in names:
+        if name not in allowed:
+            raise ValueError("%r must be one of %s." % (name, ", ".join(allowed)))
+    return names
+
+
+def main(args):
+    usage_msg = "Usage:  %prog [options] run | compare BASELINE CURRENT"
+    parser = OptionParser(usage=usage_msg)
+    parser.add_option("--languages", dest="languages", default=",".join(LANGUAGES),
+                      help="Comma separated languages to benchmark")
+    parser.add_option("--actions", dest="actions", default=",".join(ACTIONS),
+                      help="Comma separated actions: 'WDP', 'translate'")
+    parser.add_option("--num-items", dest="num_items", default="10,20",
+                      help="Comma separated numbers of items")
+    parser.add_option("--num-bids", dest="num_bids", default="10,50",
+                      help="Comma separated numbers of bids")
+    parser.add_option("--max-items", dest="max_items", default="5",
+                      help="Comma separated max numbers of items in an atom")
+    parser.add_option("--num-clauses", dest="num_clauses", default="5",
+                      help="Comma separated numbers of clauses")
+    parser.add_option("--repeats", dest="repeats", default=5, type="int",
+                      help="Timed runs per case")
+    parser.add_option("--warmups", dest="warmups", default=1, type="int",
+                      help="Untimed runs before the timed ones")
+    parser.add_option("--engine", dest="engine", default="auto",
+                      help="Set WDP engine, e.g. 'auto', 'pulp', 'bnb', 'dp' or 'highs'")
+    parser.add_option("--seed", dest="seed", default=0, type="int",
+                      help="Seed of the bid generator")
+    parser.add_option("--json", dest="json", default=None,
+                      help="Write results to this JSON file")
+    parser.add_option("--csv", dest="csv", default=None,
+                      help="Write results to this CSV file")
+    parser.add_option("--metric", dest="metric", default="p50",
+                      help="Statistic compared: " + ", ".join(STATS))
+    parser.add_option("--threshold", dest="threshold", default=0.2, type="float",
+                      help="Slowdown, as a fraction, that counts as a regression")
+    (options, args) = parser.parse_args(args[1:])
+
+    if args[:1] == ['compare']:
+        if len(args) != 3:
+            parser.error("compare needs a baseline and a current results file")
+        regressions = compare(load_json(args[1]), load_json(args[2]), options.metric,
+                              options.threshold)
+        for result, old, new in regressions:
+            case = " ".join("%s=%s" % (name, result[name])
+                            for name in ['language', 'action'] + PARAMETERS)
+            change = "%+.0f%%" % (100.0 * (new - old) / old) if old else "n/a"
+            print("REGRESSION %s: %s %.6fs -> %.6fs (%s)"
+                  % (case, options.metric, old, new, change))
+        print("%d regressions" % len(regressions))
+        return 1 if regressions else 0
+    if args != ['run']:
+        parser.error("expected run or compare")
+
+    grid = {'language': _names(options.languages, LANGUAGES),
+            'action': _names(options.actions, ACTIONS),
+            'num_items': _ints(options.num_items), 'num_bids': _ints(options.num_bids),
+            'max_items': _ints(options.max_items), 'num_clauses': _ints(options.num_clauses)}
+
+    def progress(result):
+        print("%-8s %-9s items=%-5d bids=%-6d max_items=%-3d clauses=%-3d p50=%.6fs p90=%.6fs"
+              % (result['language'], result['action'], result['num_items'], result['num_bids'],
+                 result['max_items'], result['num_clauses'], result['p50'], result['p90']))
+    results = run(grid, options.repeats, options.warmups, options.engine, options.seed, progress)
+    if options.json:
+        save_json(results, options.json)
+    if options.csv:
+        save_csv(results, options.csv)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
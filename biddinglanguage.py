@@ -1,6 +1,20 @@
 import abc
+import hashlib
+from array import array
+
+from backends import Winners
+from metrics import count, phase
+from itemuniverse import ItemUniverse, id_universe, pack_arrays, pack_atoms, pack_iter, used_items
+
 
 class BiddingLanguage(abc.ABC):
+    """Base of every bidding language.
+
+    Atoms are kept in CSR form over an ItemUniverse: the item ids of atom i
+    are item_ids[offsets[i]:offsets[i + 1]] and its value is values[i].
+    """
+
+    __slots__ = ('universe', 'item_ids', 'offsets', 'values', '_items', '_oracle')
 
     @abc.abstractmethod
     def __str__(self):
@@ -11,5 +25,270 @@ class BiddingLanguage(abc.ABC):
         pass
 
     @abc.abstractmethod
-    def WDP(self):
-        pass
\ No newline at end of file
+    def canonical(self):
+        pass
+
+    @abc.abstractmethod
+    def _translate(self, universe):
+        """Returns a generator of the OR* translation as (item ids, value) atoms,
+        interning dummy items into universe as they are first needed."""
+        pass
+
+    @classmethod
+    def _from_packed(cls, universe, item_ids, offsets, values):
+        """Builds a bid from already validated CSR arrays without copying them."""
+        bid = cls.__new__(cls)
+        bid.universe = universe
+        bid.item_ids = item_ids
+        bid.offsets = offsets
+        bid.values = values
+        bid._items = None
+        bid._oracle = None
+        return bid
+
+    @property
+    def size(self):
+        return len(self.values)
+
+    @property
+    def items(self):
+        """Names of the distinct items this bid refers to."""
+        if self._items is None:
+            self._items = used_items(self.universe, self.item_ids)
+        return self._items
+
+    def atom_ids(self, i):
+        """Returns the item ids of atom i."""
+        return self.item_ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def atom(self, i):
+        """Returns atom i as an (item names, value) tuple."""
+        return (self.universe.name_list(self.atom_ids(i)), self.values[i])
+
+    def winners(self, result):
+        """Turns a SolveResult into Winners: (winner index, winner items, winner value) tuples."""
+        return Winners([(i,) + self.atom(i) for i in result.selected], result)
+
+    def _translated(self, cls, **options):
+        """Builds the OR* translation as a cls bid, timing it and counting its dummy items."""
+        with phase("to_OR"):
+            universe = self.universe.copy()
+            translated = cls._from_stream(universe, self._translate(universe, **options))
+        count("dummy_items", len(universe) - len(self.universe))
+        return translated
+
+    def WDP(self, engine="auto", translate=False, **options):
+        """Solves the winner determination problem, timing every phase.
+
+        engine and options (time_limit, gap, threads) select and configure the
+        solver, see WDPModel.solve. With translate=True the bid is solved
+        through its OR* translation instead; an OR bid is its own translation.
+        Returns Winners: (winner index, winner items, winner value) tuples.
+        """
+        bid = self.to_OR() if translate else self
+        with phase("model"):
+            model = bid.model()
+        result = model.solve(engine, **options)
+        with phase("extract"):
+            return self.winners(result)
+
+    def iter_OR(self, **options):
+        """Returns an iterator over the atoms of the OR* translation as (item names, value).
+
+        No atom list is built, so a translation can be written out or
+        measured without holding it in memory. options are those of to_OR.
+        """
+        universe = self.universe.copy()
+        names = universe.names
+        atoms = self._translate(universe, **options)
+        return (([names[i] for i in ids], value) for ids, value in atoms)
+
+    def translation_size(self, **options):
+        """Returns the (atoms, item occurrences) of the OR* translation without building it."""
+        atoms = occurrences = 0
+        for ids, value in self._translate(self.universe.copy(), **options):
+            atoms += 1
+            occurrences += len(ids)
+        return atoms, occurrences
+
+    def value(self, bundle):
+        """Returns what the bid is worth for a bundle, an iterable of item names.
+
+        That is the best total value of atoms it may win together using
+        only items of the bundle; items the bid never mentions are ignored.
+        The first call builds an index of the atoms (see oracle.ValueOracle)
+        and answers are memoized per bundle, so a bid should not be changed
+        once it has been asked.
+        """
+        if isinstance(bundle, str):
+            raise TypeError("Bundle must be a collection of items, not a string.")
+        if self._oracle is None:
+            from oracle import ValueOracle
+            self._oracle = ValueOracle(self)
+        return self._oracle.value(bundle)
+
+    def fingerprint(self):
+        """Stable hex digest of the canonical form, equal across processes and runs."""
+        return hashlib.sha256(repr(self.canonical()).encode('utf-8')).hexdigest()
+
+    def _canonical_atom(self, i):
+        # items are sorted so their order inside the atom does not matter;
+        # 3 and 3.0 are the same value
+        names = self.universe.name_list(self.atom_ids(i))
+        return (tuple(sorted(names, key=repr)), float(self.values[i]))
+
+
+class AtomicBid(BiddingLanguage):
+    """Shared storage for the flat languages (OR, XOR)."""
+
+    __slots__ = ()
+
+    def __init__(self, bids, universe=None):
+        if universe is None:
+            universe = ItemUniverse()
+        self.item_ids, self.offsets, self.values = pack_atoms(bids, universe)
+        self.universe = universe
+        self._items = None
+        self._oracle = None
+
+    @classmethod
+    def from_iter(cls, bids, universe=None):
+        """Builds a bid from any iterable of (items, value) atoms, such as a
+        generator, reading it once with the same checks as the constructor."""
+        if universe is None:
+            universe = ItemUniverse()
+        return cls._from_packed(universe, *pack_iter(bids, universe))
+
+    @classmethod
+    def from_arrays(cls, item_ids, offsets, values, items=None, universe=None, trusted=False):
+        """Builds a bid from columnar CSR arrays, as numpy arrays, array buffers or lists.
+
+        The items of atom i are item_ids[offsets[i]:offsets[i + 1]] and its
+        value values[i]. Item ids index items, a list of distinct item names,
+        or universe; with neither the ids are the item names. The batch is
+        validated at once (see itemuniverse.pack_arrays) unless trusted.
+        """
+        if universe is None and items is None:
+            universe = id_universe(item_ids)
+        elif universe is None:
+            universe = ItemUniverse(items)
+            if not trusted and len(universe) != len(items):
+                raise ValueError("Item names must be distinct.")
+        return cls._from_packed(universe, *pack_arrays(item_ids, offsets, values, universe, trusted))
+
+    @classmethod
+    def _from_stream(cls, universe, atoms):
+        """Builds a bid in one pass from trusted (item ids, value) atoms over universe."""
+        item_ids = array('i')
+        offsets = array('q', [0])
+        values = []
+        for ids, value in atoms:
+            item_ids.extend(ids)
+            offsets.append(len(item_ids))
+            values.append(value)
+        return cls._from_packed(universe, item_ids, offsets, values)
+
+    @property
+    def bids(self):
+        """Atoms as a list of (item names, value) tuples."""
+        return [self.atom(i) for i in range(self.size)]
+
+    def canonical(self):
+        """Returns the bid as nested tuples that ignore the order of items within atoms.
+
+        Atom order is kept since winners are reported by atom index.
+        """
+        return (type(self).__name__, tuple(self._canonical_atom(i) for i in range(self.size)))
+
+    def __str__(self):
+        sep = " " + self.join + " "
+        return sep.join(str(self.atom(i)) for i in range(self.size))
+
+
+class ClauseBid(BiddingLanguage):
+    """Shared storage for the nested languages (ORofXOR, XORofOR).
+
+    All atoms of all clauses are flattened into one CSR block, so atom
+    indexes count across all clauses; the atoms of clause c are those with
+    index in [clause_offsets[c], clause_offsets[c + 1]).
+    """
+
+    __slots__ = ('clause_offsets',)
+
+    def __init__(self, bids, universe=None):
+
+        # Verify that bids are represented as a list
+        if type(bids) != list:
+            raise TypeError("Bids must be a list.")
+
+        # Check that each bid is a clause of the inner language
+        for bid in bids:
+            if type(bid) != self.clause_type:
+                raise TypeError("Each bid must be of type %s." % self.clause_type.join)
+
+        # Share the clauses' universe when they agree on one, otherwise re-intern
+        if universe is None:
+            shared = set(id(bid.universe) for bid in bids)
+            universe = bids[0].universe if len(shared) == 1 else ItemUniverse()
+
+        item_ids = array('i')
+        offsets = array('q', [0])
+        values = []
+        clause_offsets = array('q', [0])
+        for bid in bids:
+            if bid.universe is universe:
+                item_ids.extend(bid.item_ids)
+            else:
+                names = bid.universe.names
+                item_ids.extend(universe.intern(names[i]) for i in bid.item_ids)
+            base = offsets[-1]
+            offsets.extend(base + k for k in bid.offsets[1:])
+            values.extend(bid.values)
+            clause_offsets.append(len(values))
+
+        # instantiate fields
+        self.universe = universe
+        self.item_ids = item_ids
+        self.offsets = offsets
+        self.values = values
+        self.clause_offsets = clause_offsets
+        self._items = None
+        self._oracle = None
+
+    @classmethod
+    def _from_packed(cls, universe, item_ids, offsets, values, clause_offsets):
+        """Builds a bid from already validated CSR arrays without copying them."""
+        bid = super(ClauseBid, cls)._from_packed(universe, item_ids, offsets, values)
+        bid.clause_offsets = clause_offsets
+        return bid
+
+    @property
+    def num_clauses(self):
+        return len(self.clause_offsets) - 1
+
+    def clause(self, c):
+        """Returns clause c as a bid of the inner language sharing this universe."""
+        first, last = self.clause_offsets[c], self.clause_offsets[c + 1]
+        start = self.offsets[first]
+        offsets = self.offsets[first:last + 1]
+        for k in range(len(offsets)):
+            offsets[k] -= start
+        return self.clause_type._from_packed(
+            self.universe, self.item_ids[start:self.offsets[last]], offsets, self.values[first:last])
+
+    @property
+    def bids(self):
+        """Clauses as a list of bids of the inner language."""
+        return [self.clause(c) for c in range(self.num_clauses)]
+
+    def canonical(self):
+        """Returns the bid as nested tuples, one per clause, that ignore the order
+        of items within atoms."""
+        clauses = self.clause_offsets
+        return (type(self).__name__, tuple(
+            tuple(self._canonical_atom(i) for i in range(clauses[c], clauses[c + 1]))
+            for c in range(self.num_clauses)))
+
+    def __str__(self):
+        sep = " " + self.join + " "
+        return sep.join("(" + str(self.clause(c)) + ")" for c in range(self.num_clauses))
@@ -1,22 +1,35 @@
 from __future__ import print_function, unicode_literals
-from docopt import docopt
-from PyInquirer import style_from_dict, Token, prompt, Separator
+import json
+import sys
+from optparse import OptionParser
+from cache import BidCache
 from orlanguage import OR
 from orofxorlanguage import ORofXOR
 from xorlanguage import XOR
 from xoroforlanguage import XORofOR
 import time
 
-# Global style setup for PyInquirer
-style = style_from_dict({
-        Token.Separator: '#cc5454',
-        Token.QuestionMark: '#673ab7 bold',
-        Token.Selected: '#cc5454',  # default
-        Token.Pointer: '#673ab7 bold',
-        Token.Instruction: '',  # default
-        Token.Answer: '#f44336 bold',
-        Token.Question: '',
-    })
+# PyInquirer is only needed for the interactive mode, so it is imported on first prompt
+_style = []
+
+def prompt(questions):
+    """Asks questions through PyInquirer with the interpreter's style."""
+    from PyInquirer import style_from_dict, Token, prompt as inquire
+    if not _style:
+        # Global style setup for PyInquirer
+        _style.append(style_from_dict({
+                Token.Separator: '#cc5454',
+                Token.QuestionMark: '#673ab7 bold',
+                Token.Selected: '#cc5454',  # default
+                Token.Pointer: '#673ab7 bold',
+                Token.Instruction: '',  # default
+                Token.Answer: '#f44336 bold',
+                Token.Question: '',
+            }))
+    return inquire(questions, style=_style[0])
+
+# Translations and WDP results of bids solved in this session
+cache = BidCache()
 
 def create_bid(current_bids):
     """Prompts user for the creation of a bid."""
@@ -51,7 +64,7 @@ def create_bid(current_bids):
 
     # Keep prompting for a variable name until it is valid (alphanumeric and not already in use)
     while True:
-        response = prompt(var_name, style=style)
+        response = prompt(var_name)
         var = response['var']
         # validate variable
         if not var.isalnum():
@@ -61,7 +74,7 @@ def create_bid(current_bids):
         else:
             break
     
-    language = prompt(language_question, style=style)['language']
+    language = prompt(language_question)['language']
 
     # Create bid based on given language
     if language == 'OR' or language == 'XOR':
@@ -98,12 +111,12 @@ def make_simple_bid():
                 'name': 'items'
             }
         ]
-        response = prompt(question, style=style)
+        response = prompt(question)
         items = [x.strip() for x in response['items'].split(',')]
 
         # Keep prompting for a value until it is valid
         while True:
-            response = prompt(val_question, style=style)
+            response = prompt(val_question)
             value = response['value']
             try:
                 value = float(value)
@@ -124,7 +137,7 @@ def make_simple_bid():
                 'name': 'confirm'
             },
         ]
-        response = prompt(question, style=style)
+        response = prompt(question)
         if not response['confirm']:
             break
     return bids
@@ -150,7 +163,7 @@ def make_orofxor_bid():
                 'name': 'confirm'
             },
         ]
-        response = prompt(question, style=style)
+        response = prompt(question)
         if not response['confirm']:
             break
     return ORofXOR(clauses)
@@ -176,7 +189,7 @@ def make_xorofor_bid():
                 'name': 'confirm'
             },
         ]
-        response = prompt(question, style=style)
+        response = prompt(question)
         if not response['confirm']:
             break
     return XORofOR(clauses)
@@ -197,13 +210,13 @@ def solve_bid(current_bids):
             },
             
     ]
-    bid_name = prompt(question, style=style)['bid']
+    bid_name = prompt(question)['bid']
 
-    # Retrieve bid by variable name and solve
+    # Retrieve bid by variable name and solve it as it is; WDP models every
+    # language directly, so no OR* translation is built
     bid = current_bids[bid_name]
-    bid = bid.to_OR()
     start_time = time.time()
-    winners = bid.WDP()
+    winners = cache.WDP(bid)
     duration = time.time() - start_time
 
     # Print winners and time
@@ -227,17 +240,17 @@ def translate_bid(current_bids):
                     if len(answer) == 0 else True
             },      
     ]
-    bid_name = prompt(question, style=style)['bid']
+    bid_name = prompt(question)['bid']
     new_name = bid_name + "_as_OR"
     bid = current_bids[bid_name]
-    new_bid = bid.to_OR()
+    new_bid = cache.to_OR(bid)
 
     # Add new translated bid to bids list
     current_bids[new_name] = new_bid
     print("%s = %s" % (new_name, new_bid))
     return current_bids
 
-def main():
+def interactive():
     print("Welcome to the Bidding Languages Interpreter.")
 
     current_bids = {}
@@ -267,7 +280,7 @@ def main():
             'validate': lambda answer: 'You must choose one action.' \
                 if len(answer) == 0 else True}]
         
-        operation = prompt(question, style=style)['operation']
+        operation = prompt(question)['operation']
         if operation == 'See bids':
             if not current_bids:
                 print("There are no bids.")
@@ -278,10 +291,94 @@ def main():
             current_bids = create_bid(current_bids)
         elif operation == 'Solve bid':
             solve_bid(current_bids)
-        elif operation == 'Translate bid':
+        elif operation == 'Translate bid to OR':
             current_bids = translate_bid(current_bids)
         else:
             return
 
+LANGUAGES = {'OR': OR, 'XOR': XOR, 'ORofXOR': ORofXOR, 'XORofOR': XORofOR}
+
+def make_bid(command):
+    """Builds a bid from a script command with "atoms", or "clauses" for nested languages."""
+    language = LANGUAGES.get(command.get('language'))
+    if language is None:
+        raise ValueError("Language must be one of %s." % ", ".join(sorted(LANGUAGES)))
+
+    # JSON has no tuples, so atoms arrive as [items, value] lists
+    def atoms(raw):
+        return [tuple(atom) if type(atom) == list else atom for atom in raw]
+    if language in (OR, XOR):
+        return language(atoms(command['atoms']))
+    inner = language.clause_type
+    return language([inner(atoms(clause)) for clause in command['clauses']])
+
+def run_command(command, current_bids):
+    """Runs one script command and returns its JSON-ready result."""
+    op = command.get('op')
+    name = command.get('name')
+    if op == 'bid':
+        if not str(name).isalnum():
+            raise ValueError("Variable name must only contain of alphanumeric characters.")
+        current_bids[name] = make_bid(command)
+        return {'op': op, 'name': name, 'bid': str(current_bids[name])}
+    if op == 'show':
+        return {'op': op, 'bids': dict((var, str(bid)) for var, bid in current_bids.items())}
+    if name not in current_bids:
+        raise ValueError("There is no bid named %r." % (name,))
+    if op == 'solve':
+        options = dict((k, v) for k, v in command.items() if k not in ('op', 'name'))
+        start_time = time.perf_counter()
+        winners = cache.WDP(current_bids[name], **options)
+        result = {'op': op, 'name': name}
+        result.update(winners.as_dict())
+        result['seconds'] = time.perf_counter() - start_time
+        return result
+    if op == 'translate':
+        new_name = command.get('as', name + "_as_OR")
+        current_bids[new_name] = cache.to_OR(current_bids[name])
+        return {'op': op, 'name': name, 'as': new_name, 'bid': str(current_bids[new_name])}
+    raise ValueError("Unknown operation %r, expected bid, solve, translate or show." % (op,))
+
+def run_script(lines, out):
+    """Runs script commands, one JSON object per line, and writes one JSON result per line.
+
+    Blank lines and lines starting with # are skipped. A failing command
+    writes {"op": ..., "line": n, "error": message} and the script goes on;
+    the number of failed commands is returned.
+    """
+    current_bids = {}
+    errors = 0
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        command = None
+        try:
+            command = json.loads(line)
+            result = run_command(command, current_bids)
+        except Exception as e:
+            errors += 1
+            op = command.get('op') if isinstance(command, dict) else None
+            result = {'op': op, 'line': number, 'error': "%s: %s" % (type(e).__name__, e)}
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+    return errors
+
+def main(args):
+    usage_msg = "Usage:  %prog [--script FILE]"
+    parser = OptionParser(usage=usage_msg)
+    parser.add_option("--script",
+                      dest="script", default=None,
+                      help="Run JSON commands from FILE ('-' for stdin) instead of prompting")
+    (options, args) = parser.parse_args(args[1:])
+
+    if options.script is None:
+        interactive()
+        return 0
+    if options.script == '-':
+        return 1 if run_script(sys.stdin, sys.stdout) else 0
+    with open(options.script) as f:
+        return 1 if run_script(f, sys.stdout) else 0
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main(sys.argv))
\ No newline at end of file
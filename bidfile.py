@@ -0,0 +1,351 @@
+"""Binary and JSONL files of bids, and a command line to solve or translate them.
+
+Binary format (version 1, little-endian, every section starts on an
+8-byte boundary and is zero padded to one):
+
+    header      magic b"BIDF", uint32 version, uint32 language
+                (0 OR, 1 XOR, 2 ORofXOR, 3 XORofOR), uint32 value kind
+                (0 int64, 1 float64, 2 mixed), then uint64 num_items,
+                num_atoms, nnz and num_clauses (0 for OR and XOR)
+    item table  uint64[num_items + 1] byte offsets into the UTF-8 blob of
+                item names that follows; item id k is the k-th name
+    item_ids    int32[nnz], the items of every atom back to back
+    offsets     int64[num_atoms + 1], atom i is item_ids[offsets[i]:offsets[i + 1]]
+    values      int64 or float64[num_atoms]; mixed values are float64
+    kinds       only for mixed values, uint8[num_atoms], 1 where the
+                value is an int
+    clauses     only for ORofXOR and XORofOR, int64[num_clauses + 1],
+                clause c holds the atoms clause_offsets[c] to
+                clause_offsets[c + 1]
+
+These are the CSR arrays the bids keep in memory, so a file is memory
+mapped and its sections used in place. An XOR bid is one exclusive group
+over all its atoms; clauses are XOR groups in ORofXOR and OR groups in
+XORofOR.
+
+JSONL format: a first line {"language": "XORofOR", "clauses": 2} (the
+number of clauses only for ORofXOR and XORofOR), then one line per atom,
+{"items": [...], "value": 3}, with "clause": c (counting from 0, in
+order) for ORofXOR and XORofOR.
+
+Only the four fixed languages have a file form; saving a BidTree raises
+TypeError.
+"""
+import io
+import json
+import mmap
+import struct
+import sys
+from optparse import OptionParser
+
+import numpy
+
+from itemuniverse import ItemUniverse, as_array, pack_arrays, pack_iter
+from orlanguage import OR
+from orofxorlanguage import ORofXOR
+from xorlanguage import XOR
+from xoroforlanguage import XORofOR
+
+MAGIC = b"BIDF"
+VERSION = 1
+LANGUAGES = [OR, XOR, ORofXOR, XORofOR]
+_HEADER = struct.Struct('<4sIIIQQQQ')
+
+
+def _pad(n):
+    return -n % 8
+
+
+class BidFile(object):
+    """A memory-mapped bid file.
+
+    item_ids, offsets, values and clause_offsets are read-only numpy views
+    of the file; nothing is parsed until bid() builds the bid object, which
+    copies the arrays in bulk.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # empty files and pipes cannot be mapped
+            self._map = self._file.read()
+        self._parse(path)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Reads a bid file held in memory, such as one received over a socket."""
+        f = cls.__new__(cls)
+        f._file = None
+        f._map = data
+        f._parse("data")
+        return f
+
+    def _parse(self, name):
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError("%s is not a bid file." % name)
+        (magic, version, language, value_kind, num_items, num_atoms, nnz,
+         num_clauses) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or language >= len(LANGUAGES):
+            self.close()
+            raise ValueError("%s is not a version %d bid file." % (name, VERSION))
+        self.language = LANGUAGES[language]
+
+        position = [_HEADER.size]
+
+        def section(dtype, count):
+            view = numpy.frombuffer(self._map, dtype=dtype, count=count, offset=position[0])
+            position[0] += view.nbytes + _pad(view.nbytes)
+            return view
+
+        # a truncated file fails here rather than when a section is used
+        try:
+            self._name_offsets = section('<u8', num_items + 1)
+            self._names_at = position[0]
+            position[0] += int(self._name_offsets[-1]) + _pad(int(self._name_offsets[-1]))
+            self.item_ids = section('<i4', nnz)
+            self.offsets = section('<i8', num_atoms + 1)
+            self.values = section('<i8' if value_kind == 0 else '<f8', num_atoms)
+            self._kinds = section('u1', num_atoms) if value_kind == 2 else None
+            nested = self.language in (ORofXOR, XORofOR)
+            self.clause_offsets = section('<i8', num_clauses + 1) if nested else None
+        except ValueError:
+            self.close()
+            raise ValueError("%s is a truncated bid file." % name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # views into the map must be gone before it can close
+        self.item_ids = self.offsets = self.values = self.clause_offsets = None
+        self._name_offsets = self._kinds = None
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+    def names(self):
+        """Decodes the item table."""
+        bounds = self._name_offsets.tolist()
+        if any(bounds[k] > bounds[k + 1] for k in range(len(bounds) - 1)):
+            raise ValueError("Item name offsets must not decrease.")
+        blob = self._map[self._names_at:self._names_at + bounds[-1]]
+        return [blob[bounds[k]:bounds[k + 1]].decode('utf-8') for k in range(len(bounds) - 1)]
+
+    def bid(self):
+        """Builds the bid stored in the file.
+
+        Files may come from anywhere, over a socket too, so the arrays are
+        checked as pack_arrays checks them and the clause offsets must run
+        from 0 to the number of atoms without decreasing; a file that breaks
+        these rules raises ValueError.
+        """
+        names = self.names()
+        universe = ItemUniverse(names)
+        if len(universe) != len(names):
+            raise ValueError("Item names must be distinct.")
+        item_ids, offsets, values = pack_arrays(self.item_ids, self.offsets, self.values, universe)
+        if self._kinds is not None:
+            values = [int(v) if kind else v for v, kind in zip(values, self._kinds.tolist())]
+        if self.clause_offsets is None:
+            return self.language._from_packed(universe, item_ids, offsets, values)
+        clauses = self.clause_offsets
+        if clauses[0] != 0 or clauses[-1] != len(values) or (numpy.diff(clauses) < 0).any():
+            raise ValueError("Clause offsets must run from 0 to the number of atoms without decreasing.")
+        return self.language._from_packed(universe, item_ids, offsets, values,
+                                          as_array('q', clauses))
+
+
+def load(path):
+    """Reads the bid stored in a binary bid file."""
+    with BidFile(path) as f:
+        return f.bid()
+
+
+def loads(data):
+    """Reads a bid from the bytes of a binary bid file."""
+    with BidFile.from_bytes(data) as f:
+        return f.bid()
+
+
+def save(bid, path):
+    """Writes a bid to a binary bid file. Item names must be strings."""
+    with open(path, 'wb') as f:
+        _dump(bid, f)
+
+
+def dumps(bid):
+    """Returns the bytes of the binary bid file of a bid."""
+    f = io.BytesIO()
+    _dump(bid, f)
+    return f.getvalue()
+
+
+def _check_language(bid):
+    if type(bid) not in LANGUAGES:
+        raise TypeError("%s bids cannot be serialized." % type(bid).__name__)
+
+
+def _dump(bid, f):
+    _check_language(bid)
+    names = bid.universe.names
+    if any(type(name) != str for name in names):
+        raise TypeError("Only bids on items named by strings can be saved.")
+    encoded = [name.encode('utf-8') for name in names]
+    name_offsets = numpy.zeros(len(encoded) + 1, dtype='<u8')
+    numpy.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+    values = bid.values
+    kinds = numpy.array([type(v) == int for v in values], dtype='u1')
+    if kinds.all():
+        value_kind = 0
+    elif kinds.any():
+        value_kind = 2
+    else:
+        value_kind = 1
+    clause_offsets = getattr(bid, 'clause_offsets', None)
+    num_clauses = len(clause_offsets) - 1 if clause_offsets is not None else 0
+
+    def write(data):
+        f.write(data)
+        f.write(b"\0" * _pad(len(data)))
+
+    f.write(_HEADER.pack(MAGIC, VERSION, LANGUAGES.index(type(bid)), value_kind,
+                         len(names), bid.size, len(bid.item_ids), num_clauses))
+    write(name_offsets.tobytes())
+    write(b"".join(encoded))
+    write(numpy.asarray(bid.item_ids, dtype='<i4').tobytes())
+    write(numpy.asarray(bid.offsets, dtype='<i8').tobytes())
+    write(numpy.asarray(values, dtype='<i8' if value_kind == 0 else '<f8').tobytes())
+    if value_kind == 2:
+        write(kinds.tobytes())
+    if clause_offsets is not None:
+        write(numpy.asarray(clause_offsets, dtype='<i8').tobytes())
+
+
+def export_jsonl(bid, f):
+    """Writes a bid to an open text file as JSONL, one atom per line."""
+    for record in to_records(bid):
+        f.write(json.dumps(record) + "\n")
+
+
+def to_records(bid):
+    """Yields the lines of the JSONL form of a bid as dicts, the header first."""
+    _check_language(bid)
+    header = {"language": type(bid).__name__}
+    clause_offsets = getattr(bid, 'clause_offsets', None)
+    if clause_offsets is not None:
+        header["clauses"] = len(clause_offsets) - 1
+    yield header
+    c = 0
+    for i in range(bid.size):
+        items, value = bid.atom(i)
+        line = {"items": items, "value": value}
+        if clause_offsets is not None:
+            while clause_offsets[c + 1] <= i:
+                c += 1
+            line["clause"] = c
+        yield line
+
+
+def import_jsonl(f):
+    """Reads a bid from an open JSONL file in one pass over its lines."""
+    return from_records(json.loads(line) for line in f if line.strip())
+
+
+def from_records(records):
+    """Builds a bid from the lines of its JSONL form as dicts, see to_records."""
+    records = iter(records)
+    header = next(records, {})
+    names = dict((cls.__name__, cls) for cls in LANGUAGES)
+    if header.get("language") not in names:
+        raise ValueError("Language must be one of %s." % ", ".join(names))
+    cls = names[header["language"]]
+    nested = cls in (ORofXOR, XORofOR)
+    clause_offsets = as_array('q', [0])
+
+    def atoms():
+        count = 0
+        for atom in records:
+            if nested:
+                # clauses come in order, possibly skipping empty ones
+                c = atom.get("clause")
+                if type(c) != int or c < len(clause_offsets) - 1:
+                    raise ValueError("Atoms must list their clause in order.")
+                while len(clause_offsets) - 1 < c:
+                    clause_offsets.append(count)
+            count += 1
+            yield (atom["items"], atom["value"])
+        if nested:
+            # close the last clause and any empty clauses after it
+            total = max(header.get("clauses", 0), len(clause_offsets) - (0 if count else 1))
+            while len(clause_offsets) - 1 < total:
+                clause_offsets.append(count)
+
+    universe = ItemUniverse()
+    item_ids, offsets, values = pack_iter(atoms(), universe)
+    if not nested:
+        return cls._from_packed(universe, item_ids, offsets, values)
+    return cls._from_packed(universe, item_ids, offsets, values, clause_offsets)
+
+
+def read(path):
+    """Reads a bid from a binary file or, for names ending in .jsonl, a JSONL file."""
+    if path.endswith(".jsonl"):
+        with open(path) as f:
+            return import_jsonl(f)
+    return load(path)
+
+
+def write(bid, path):
+    """Writes a bid to a binary file or, for names ending in .jsonl, a JSONL file."""
+    if path.endswith(".jsonl"):
+        with open(path, 'w') as f:
+            export_jsonl(bid, f)
+    else:
+        save(bid, path)
+
+
+def main(args):
+    usage_msg = "Usage:  %prog [options] solve|translate|convert FILE [OUTPUT]"
+    parser = OptionParser(usage=usage_msg)
+    parser.add_option("--engine",
+                      dest="engine", default="auto",
+                      help="Set WDP engine, e.g. 'auto', 'pulp', 'bnb', 'dp' or 'highs'")
+    parser.add_option("--time-limit",
+                      dest="time_limit", default=None, type="float",
+                      help="Stop the solver after this many seconds")
+    parser.add_option("--translate",
+                      dest="translate", action="store_true", default=False,
+                      help="Solve through the OR* translation")
+    (options, args) = parser.parse_args(args[1:])
+
+    if len(args) < 2 or args[0] not in ("solve", "translate", "convert"):
+        parser.error("expected solve, translate or convert and a file")
+    command, path = args[0], args[1]
+    output = args[2] if len(args) > 2 else None
+    if command == "convert" and output is None:
+        parser.error("convert needs an output file")
+    bid = read(path)
+
+    if command == "solve":
+        winners = bid.WDP(engine=options.engine, time_limit=options.time_limit,
+                          translate=options.translate)
+        json.dump(winners.as_dict(), sys.stdout)
+        sys.stdout.write("\n")
+    else:
+        if command == "translate":
+            bid = bid.to_OR()
+        if output is None:
+            export_jsonl(bid, sys.stdout)
+        else:
+            write(bid, output)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,281 @@
+from array import array
+from biddinglanguage import AtomicBid
+from itemuniverse import DummyAllocator, ItemUniverse, pack_iter
+from orlanguage import OR
+from orofxorlanguage import ORofXOR
+from wdpmodel import WDPModel
+from xorlanguage import XOR
+from xoroforlanguage import XORofOR
+
+# node kinds
+_OR = 0
+_XOR = 1
+
+# marks the end of a node's children, which may themselves be None
+_END = object()
+
+
+class ORNode(object):
+    """Node of a bid tree whose children may all win, on disjoint items."""
+
+    __slots__ = ('children',)
+    join = "OR"
+    kind = _OR
+
+    def __init__(self, children):
+        if type(children) != list:
+            raise TypeError("Children must be a list.")
+        self.children = children
+
+
+class XORNode(ORNode):
+    """Node of a bid tree of which at most one child may win."""
+
+    __slots__ = ()
+    join = "XOR"
+    kind = _XOR
+
+
+def _as_node(child):
+    """Turns a bid of the fixed languages into the equivalent node; other children pass through."""
+    if type(child) == OR:
+        return ORNode(child.bids)
+    if type(child) == XOR:
+        return XORNode(child.bids)
+    if type(child) == ORofXOR:
+        return ORNode([XORNode(clause.bids) for clause in child.bids])
+    if type(child) == XORofOR:
+        return XORNode([ORNode(clause.bids) for clause in child.bids])
+    return child
+
+
+class BidTree(AtomicBid):
+    """Class implementing bids nested to any depth: OR and XOR nodes over atoms.
+
+    BidTree(XORNode([ORNode([(['A'], 3), XORNode([(['B'], 2), (['C'], 4)])]),
+                     (['A', 'B'], 6)]))
+
+    Children of a node are (items, value) atoms, ORNode and XORNode objects
+    or bids of the four fixed languages. The atoms are stored in CSR form,
+    numbered depth first, as in AtomicBid. The tree is kept in flat arrays:
+    sequence lists the children of every node in preorder (an atom i as i,
+    node v as ~v), kinds gives the kind of every node and parents its parent
+    (-1 for the root). Atom i sits under node atom_parents[i].
+    """
+
+    __slots__ = ('sequence', 'kinds', 'parents', 'atom_parents')
+
+    def __init__(self, root, universe=None):
+        root = _as_node(root)
+        if not isinstance(root, ORNode):
+            raise TypeError("The root of a bid tree must be an ORNode or an XORNode.")
+        if universe is None:
+            universe = ItemUniverse()
+        sequence = array('i')
+        kinds = array('b', [root.kind])
+        parents = array('i', [-1])
+        atom_parents = array('i')
+        atoms = []
+
+        # depth first with an explicit stack of (node index, remaining children)
+        stack = [(0, iter(root.children))]
+        while stack:
+            v, children = stack[-1]
+            child = next(children, _END)
+            if child is _END:
+                stack.pop()
+                continue
+            child = _as_node(child)
+            if isinstance(child, ORNode):
+                w = len(kinds)
+                kinds.append(child.kind)
+                parents.append(v)
+                sequence.append(~w)
+                stack.append((w, iter(child.children)))
+            else:
+                sequence.append(len(atoms))
+                atom_parents.append(v)
+                atoms.append(child)
+
+        self.item_ids, self.offsets, self.values = pack_iter(atoms, universe)
+        self.universe = universe
+        self._items = None
+        self._oracle = None
+        self.sequence = sequence
+        self.kinds = kinds
+        self.parents = parents
+        self.atom_parents = atom_parents
+
+    @classmethod
+    def _from_packed(cls, universe, item_ids, offsets, values, sequence, kinds, parents,
+                     atom_parents):
+        """Builds a bid from already validated arrays without copying them."""
+        bid = super(BidTree, cls)._from_packed(universe, item_ids, offsets, values)
+        bid.sequence = sequence
+        bid.kinds = kinds
+        bid.parents = parents
+        bid.atom_parents = atom_parents
+        return bid
+
+    @classmethod
+    def from_iter(cls, bids, universe=None):
+        """Flat atoms carry no tree; build one with BidTree(ORNode(...)) instead."""
+        raise ValueError("A BidTree cannot be built from flat atoms, "
+                         "use BidTree(ORNode(atoms)) or BidTree(XORNode(atoms)).")
+
+    @classmethod
+    def from_arrays(cls, item_ids, offsets, values, items=None, universe=None, trusted=False):
+        """Flat arrays carry no tree; see from_iter."""
+        raise ValueError("A BidTree cannot be built from flat CSR arrays, "
+                         "use BidTree(ORNode(atoms)) or BidTree(XORNode(atoms)).")
+
+    @property
+    def num_nodes(self):
+        return len(self.kinds)
+
+    def children(self):
+        """Returns the children of every node, in order, as entries of sequence."""
+        result = [[] for v in range(self.num_nodes)]
+        parents, atom_parents = self.parents, self.atom_parents
+        for entry in self.sequence:
+            result[atom_parents[entry] if entry >= 0 else parents[~entry]].append(entry)
+        return result
+
+    def _rows(self):
+        """Flattens the tree into its "at most one" rows.
+
+        An XOR child of an XOR node, or an OR child of an OR node, merges
+        into its parent. Returns (rows, link, first, end): rows is a list
+        of [members, parent node] pairs, one per remaining XOR node, whose
+        members are atoms i and OR nodes ~v; link[v] is the node whose
+        indicator the atoms under node v switch on (-1 for none); atoms
+        first[v] to end[v] are those under node v.
+        """
+        n = self.size
+        kinds, parents = self.kinds, self.parents
+        link = array('i', [-1]) * self.num_nodes
+        row = array('i', [-1]) * self.num_nodes
+        first = array('q', [n]) * self.num_nodes
+        end = array('q', [0]) * self.num_nodes
+        rows = []
+        if kinds[0] == _XOR:
+            row[0] = 0
+            rows.append([[], -1])
+
+        # nodes come in preorder, so parents are settled before their children
+        for entry in self.sequence:
+            if entry >= 0:
+                v = self.atom_parents[entry]
+                if kinds[v] == _XOR:
+                    rows[row[v]][0].append(entry)
+                continue
+            v = ~entry
+            p = parents[v]
+            if kinds[p] == _OR:
+                link[v] = link[p]
+                if kinds[v] == _XOR:
+                    row[v] = len(rows)
+                    rows.append([[], link[v]])
+            elif kinds[v] == _XOR:
+                row[v] = row[p]
+            else:
+                # an OR node competing in an XOR row gets its own indicator
+                rows[row[p]][0].append(entry)
+                link[v] = v
+
+        # atom ranges, children before parents
+        for i in range(n):
+            v = self.atom_parents[i]
+            first[v] = min(first[v], i)
+            end[v] = max(end[v], i + 1)
+        for v in range(self.num_nodes - 1, 0, -1):
+            p = parents[v]
+            first[p] = min(first[p], first[v])
+            end[p] = max(end[p], end[v])
+        return rows, link, first, end
+
+    def model(self):
+        """Builds the WDP model without dummy items.
+
+        Every XOR node left after merging is one "at most one" row. An OR
+        node inside such a row gets an indicator variable: its atoms, and
+        the rows of XOR nodes below it, are bounded by that indicator. The
+        model grows linearly with the tree.
+        """
+        n = self.size
+        rows, link, first, end = self._rows()
+        indicator = {}
+
+        def variable(v):
+            if v not in indicator:
+                indicator[v] = n + len(indicator)
+            return indicator[v]
+
+        groups = []
+        for members, parent in rows:
+            groups.append(([m if m >= 0 else variable(~m) for m in members],
+                           None if parent < 0 else variable(parent)))
+        for i in range(n):
+            v = link[self.atom_parents[i]]
+            if v >= 0 and self.kinds[self.atom_parents[i]] == _OR:
+                groups.append(([i], variable(v)))
+        return WDPModel(self.item_ids, self.offsets, self.values, groups, len(indicator))
+
+    def to_OR(self):
+        """Translates the bid tree to the OR* bidding language.
+
+        The atoms of two different children of an XOR node must share a
+        dummy item. Children that are single atoms share one dummy; any
+        other pair of atoms gets a dummy of its own, so the translation can
+        grow quadratically. WDP does not go through it.
+        """
+        return self._translated(OR)
+
+    def _translate(self, universe):
+        rows, link, first, end = self._rows()
+        dummies = DummyAllocator(universe)
+        extra = {}
+        for members, parent in rows:
+            ranges = [(m, m + 1) if m >= 0 else (first[~m], end[~m]) for m in members]
+            ranges = [r for r in ranges if r[0] < r[1]]
+            singles = [r[0] for r in ranges if r[1] - r[0] == 1]
+            if len(singles) > 1:
+                dummy = dummies.new()
+                for i in singles:
+                    extra.setdefault(i, []).append(dummy)
+            for j in range(len(ranges)):
+                for k in range(j):
+                    a, b = ranges[k], ranges[j]
+                    if a[1] - a[0] == 1 and b[1] - b[0] == 1:
+                        continue
+                    for x in range(*a):
+                        for y in range(*b):
+                            dummy = dummies.new()
+                            extra.setdefault(x, []).append(dummy)
+                            extra.setdefault(y, []).append(dummy)
+        for i in range(self.size):
+            ids = self.atom_ids(i)
+            ids.extend(extra.get(i, ()))
+            yield ids, self.values[i]
+
+    def canonical(self):
+        """Returns the tree as nested (kind, children) tuples that ignore the
+        order of items within atoms."""
+        # nodes are numbered in preorder, so building them backwards finds
+        # every child node already built
+        children = self.children()
+        joins = ("OR", "XOR")
+        built = [None] * self.num_nodes
+        for v in range(self.num_nodes - 1, -1, -1):
+            built[v] = (joins[self.kinds[v]], tuple(self._canonical_atom(e) if e >= 0 else built[~e]
+                                                    for e in children[v]))
+        return (type(self).__name__, built[0])
+
+    def __str__(self):
+        children = self.children()
+        joins = (" OR ", " XOR ")
+        built = [None] * self.num_nodes
+        for v in range(self.num_nodes - 1, -1, -1):
+            built[v] = joins[self.kinds[v]].join(
+                str(self.atom(e)) if e >= 0 else "(" + built[~e] + ")" for e in children[v])
+        return built[0]
@@ -0,0 +1,267 @@
+import time
+
+
+def _popcount(x):
+    return bin(x).count('1')
+
+
+class _Timeout(Exception):
+    pass
+
+
+class Chains(object):
+    """Chain of (group, member) pairs a variable activates when selected.
+
+    Selecting a variable uses each group it is a member of through itself,
+    and switches on the parents of those groups, which use their own
+    groups in turn. Only the groups listed in groups (indexes into
+    model.groups, all by default) are followed. Chains are built the first
+    time they are asked for; indicators may nest deeply, so parents are
+    resolved on a stack.
+    """
+
+    def __init__(self, model, groups=None):
+        self.model = model
+        self.member_of = {}
+        if groups is None:
+            groups = range(len(model.groups))
+        for g in groups:
+            for m in model.groups[g][0]:
+                self.member_of.setdefault(m, []).append(g)
+        self.chains = {}
+
+    def __getitem__(self, var):
+        chains, member_of, groups = self.chains, self.member_of, self.model.groups
+        result = chains.get(var)
+        if result is not None:
+            return result
+        stack = [var]
+        while stack:
+            v = stack[-1]
+            if v in chains:
+                stack.pop()
+                continue
+            parents = [groups[g][1] for g in member_of.get(v, ())]
+            pending = [p for p in parents if p is not None and p not in chains]
+            if pending:
+                stack.extend(pending)
+                continue
+            result = []
+            for g, parent in zip(member_of.get(v, ()), parents):
+                result.append((g, v))
+                if parent is not None:
+                    result.extend(chains[parent])
+            chains[v] = result
+            stack.pop()
+        return chains[var]
+
+
+class BranchAndBound(object):
+    """In-process combinatorial branch and bound for a WDPModel.
+
+    Items, and "at most one" groups made only of atoms, become bits of a
+    mask so a conflict test is a single AND. Groups involving indicator
+    variables are tracked through each atom's chain of (group, member)
+    pairs: a group may have several selected descendants, but only through
+    one member at a time.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        n = model.num_atoms
+        bit_of = {}
+        masks = [0] * n
+        item_ids, offsets = model.item_ids, model.offsets
+
+        # give every item a bit
+        for i in range(n):
+            mask = 0
+            for k in range(offsets[i], offsets[i + 1]):
+                bit = bit_of.setdefault(item_ids[k], len(bit_of))
+                mask |= 1 << bit
+            masks[i] = mask
+
+        # atom-only groups without a parent behave exactly like a shared item
+        kept = []
+        nbits = len(bit_of)
+        for g, (members, parent) in enumerate(model.groups):
+            if parent is None and all(m < n for m in members):
+                if len(members) > 1:
+                    for m in members:
+                        masks[m] |= 1 << nbits
+                    nbits += 1
+            else:
+                kept.append(g)
+
+        chains = Chains(model, kept)
+        self.masks = masks
+        self.chains = [chains[i] for i in range(n)]
+
+    def density(self, i):
+        """Value per item (and group bit) of atom i; atoms without bits come first."""
+        size = _popcount(self.masks[i])
+        return self.model.values[i] / size if size else float('inf')
+
+    def upper_bound(self):
+        """Bound on the optimum: every item is worth at most the best value per
+        item among the atoms holding it."""
+        values = self.model.values
+        bound = 0.0
+        claimed = 0
+        positive = [i for i in range(len(values)) if values[i] > 0]
+        for i in sorted(positive, key=self.density, reverse=True):
+            m = self.masks[i]
+            if not m:
+                bound += values[i]
+                continue
+            new = m & ~claimed
+            if new:
+                bound += self.density(i) * _popcount(new)
+                claimed |= new
+        return bound
+
+    def solve(self, incumbent=None, time_limit=None, gap=None):
+        """Returns the sorted indexes of an optimal set of atoms.
+
+        incumbent is an optional feasible set of atom indexes whose value the
+        search has to beat, such as the winners of a previous solve. The
+        search stops after time_limit seconds, and with a relative gap it
+        skips nodes that cannot beat the incumbent by more than that gap.
+        Afterwards complete tells whether the search ran to the end, bound
+        is an upper bound on the optimum and nodes counts the nodes visited.
+        """
+
+        values = self.model.values
+        masks, chains = self.masks, self.chains
+        num_atoms = self.model.num_atoms
+        eps = 1e-9
+        keep = 1.0 - (gap or 0.0)
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        self.nodes = 0
+        self.complete = True
+        root = [None]
+
+        # atoms that conflict with nothing are always taken
+        base = []
+        candidates = []
+        for i in range(len(values)):
+            if values[i] <= 0:
+                continue
+            if not masks[i] and not chains[i]:
+                base.append(i)
+            else:
+                candidates.append(i)
+
+        # order by value per item so good incumbents are found first
+        density = self.density
+        order = sorted(candidates, key=density, reverse=True)
+        vals = [values[i] for i in order]
+        ms = [masks[i] for i in order]
+        dens = [density(i) for i in order]
+        chs = [chains[i] for i in order]
+        n = len(order)
+        suffix = [0.0] * (n + 1)
+        for j in range(n - 1, -1, -1):
+            suffix[j] = suffix[j + 1] + vals[j]
+
+        active = {}
+        count = {}
+        chosen = []
+        best = [0.0, []]
+        if incumbent:
+            taken = set(base)
+            start = [i for i in incumbent if i not in taken and values[i] > 0]
+            best = [sum(values[i] for i in start), start]
+
+        def enter(start, used, value):
+            """Counts a node and returns whether its bound can beat the incumbent."""
+            self.nodes += 1
+            if deadline is not None and not self.nodes % 64 and time.perf_counter() > deadline:
+                raise _Timeout()
+
+            # upper bound: each free bit is worth at most the density of the
+            # first compatible atom (in density order) that covers it
+            bound = value
+            claimed = used
+            for j in range(start, n):
+                m = ms[j]
+                if m & used:
+                    continue
+                if not m:
+                    bound += vals[j]
+                    continue
+                new = m & ~claimed
+                if new:
+                    bound += dens[j] * _popcount(new)
+                    claimed |= new
+            if root[0] is None:
+                root[0] = bound
+            return bound * keep > best[0] + eps
+
+        def unselect():
+            for g, member in chs[chosen.pop()]:
+                count[g] -= 1
+                if not count[g]:
+                    del active[g]
+
+        # depth first with an explicit stack of [next atom, used bits, value]
+        # frames, one per selected atom plus the root, so deep branches do not
+        # hit the recursion limit
+        def search():
+            stack = [[0, 0, 0.0]] if enter(0, 0, 0.0) else []
+            while stack:
+                frame = stack[-1]
+                j, used, value = frame
+                while j < n:
+                    if (value + suffix[j]) * keep <= best[0] + eps:
+                        j = n
+                        break
+                    if not ms[j] & used:
+                        # a group already in use only admits more atoms through
+                        # the same indicator, never a second atom member
+                        for g, member in chs[j]:
+                            a = active.get(g)
+                            if a is not None and (a != member or member < num_atoms):
+                                break
+                        else:
+                            break
+                    j += 1
+                if j >= n:
+                    # every branch of this node is done
+                    stack.pop()
+                    if stack:
+                        unselect()
+                    continue
+
+                # select atom j
+                frame[0] = j + 1
+                for g, member in chs[j]:
+                    active[g] = member
+                    count[g] = count.get(g, 0) + 1
+                chosen.append(j)
+                v = value + vals[j]
+                if v > best[0] + eps:
+                    best[0] = v
+                    best[1] = [order[k] for k in chosen]
+                if enter(j + 1, used | ms[j], v):
+                    stack.append([j + 1, used | ms[j], v])
+                else:
+                    unselect()
+
+        try:
+            search()
+        except _Timeout:
+            self.complete = False
+
+        # nodes pruned on the gap were worth at most best / keep
+        base_value = sum(values[i] for i in base)
+        if self.complete:
+            self.bound = base_value + best[0] / keep
+        else:
+            self.bound = base_value + max(root[0], best[0])
+        return sorted(base + best[1])
+
+
+def solve_bnb(model, incumbent=None):
+    """Solves a WDPModel with BranchAndBound and returns the winning atom indexes."""
+    return BranchAndBound(model).solve(incumbent)
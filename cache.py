@@ -0,0 +1,191 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+from backends import OPTIMAL
+
+# bump when the pickled results change shape so old disk entries are ignored
+CACHE_VERSION = 1
+
+
+class BidCache(object):
+    """Caches OR translations and WDP results under the fingerprint of a bid.
+
+    Bids with the same canonical form (see BiddingLanguage.canonical) share
+    WDP entries, so a bid listing the items of its atoms in another order
+    hits the cache too. Translations list items in the order of the bid
+    they came from, so they are only shared by bids written the same way.
+    Only optimal WDP results are cached, since a solve stopped on a limit
+    could do better on the next try. Entries are stored pickled: what the cache returns is
+    always a fresh copy, and changing it cannot corrupt the cache.
+
+    The in-memory cache is an LRU holding at most max_entries entries and
+    max_bytes pickled bytes. With a path, entries are also written to that
+    directory and survive the process; max_disk_bytes (None for no limit)
+    bounds the directory, dropping the least recently used files first.
+    hits, disk_hits, misses and evictions count what happened so far.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 << 20, path=None, max_disk_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if path is not None and not os.path.isdir(path):
+            os.makedirs(path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(bid, operation, options):
+        """Returns the cache key of an operation on a bid with the given options."""
+        detail = repr((CACHE_VERSION, operation, sorted(options.items())))
+        return bid.fingerprint() + "-" + hashlib.sha256(detail.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _layout(bid):
+        """Short digest of what canonical ignores: item order and value types."""
+        atoms = [bid.atom(i) for i in range(bid.size)]
+        clauses = list(getattr(bid, 'clause_offsets', ()))
+        return hashlib.sha256(repr((atoms, clauses)).encode('utf-8')).hexdigest()[:16]
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".pickle")
+
+    def get(self, key):
+        """Returns the value stored under key, or None when it is not cached."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if data is None and self.path is not None:
+            data = self._read(key)
+            if data is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, data)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return pickle.loads(data)
+
+    def put(self, key, value):
+        """Stores value under key."""
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._remember(key, data)
+        if self.path is not None:
+            self._write(key, data)
+
+    def _remember(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self._entries[key] = data
+            self.nbytes += len(data)
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                key, old = self._entries.popitem(last=False)
+                self.nbytes -= len(old)
+                self.evictions += 1
+
+    def _read(self, key):
+        name = self._file(key)
+        try:
+            with open(name, 'rb') as f:
+                data = f.read()
+            pickle.loads(data)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # a truncated or foreign file is treated as a miss and dropped
+            self._unlink(name)
+            return None
+        os.utime(name)
+        return data
+
+    def _write(self, key, data):
+        # write to a temporary file first so readers never see half an entry
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self._file(key))
+        except Exception:
+            self._unlink(tmp)
+            raise
+        if self.max_disk_bytes is not None:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        files = []
+        total = 0
+        for name in os.listdir(self.path):
+            if name.endswith(".pickle"):
+                try:
+                    st = os.stat(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, name))
+                total += st.st_size
+        for mtime, size, name in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            self._unlink(os.path.join(self.path, name))
+            total -= size
+
+    @staticmethod
+    def _unlink(name):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+    def invalidate(self, bid=None):
+        """Drops every entry of bid, or the whole cache (memory and disk) when bid is None."""
+        prefix = None if bid is None else bid.fingerprint() + "-"
+        with self._lock:
+            for key in list(self._entries):
+                if prefix is None or key.startswith(prefix):
+                    self.nbytes -= len(self._entries.pop(key))
+        if self.path is not None:
+            for name in os.listdir(self.path):
+                if name.endswith(".pickle") and (prefix is None or name.startswith(prefix)):
+                    self._unlink(os.path.join(self.path, name))
+
+    def to_OR(self, bid, **options):
+        """Returns bid.to_OR(**options), translating only on a cache miss."""
+        key = self.key(bid, "to_OR", dict(options, _layout=self._layout(bid)))
+        translated = self.get(key)
+        if translated is None:
+            translated = bid.to_OR(**options)
+            self.put(key, translated)
+        return translated
+
+    def WDP(self, bid, **options):
+        """Returns bid.WDP(**options), solving only on a cache miss.
+
+        The SolveResult is cached when it is optimal, and the winners are
+        rebuilt from bid so they list its items in its own order.
+        """
+        key = self.key(bid, "WDP", options)
+        result = self.get(key)
+        if result is None:
+            result = bid.WDP(**options).result
+            if result.status == OPTIMAL:
+                self.put(key, result)
+        return bid.winners(result)
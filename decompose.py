@@ -0,0 +1,160 @@
+import copy
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from backends import FEASIBLE, NOT_SOLVED, OPTIMAL, BranchAndBoundBackend, SolveResult
+
+# components with at most this many atoms are solved inline by branch and bound
+INLINE_ATOMS = 16
+
+_pools = {}
+
+
+def _pool(workers):
+    """Returns a process pool with the given number of workers, reused across solves."""
+    if workers not in _pools:
+        _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+    return _pools[workers]
+
+
+def components(model):
+    """Splits a model into independent parts.
+
+    Atoms sharing an item or a group row end up in the same part. Returns a
+    list of (atoms, indicators) pairs of variable indexes, in order of their
+    smallest variable.
+    """
+    n = model.num_atoms
+    parent = list(range(n + model.num_indicators))
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    def union(u, v):
+        u, v = find(u), find(v)
+        if u != v:
+            parent[max(u, v)] = min(u, v)
+
+    # item -> atoms inverted index, each row joins its atoms
+    for atoms in model.item_rows().values():
+        for a in atoms[1:]:
+            union(atoms[0], a)
+    for members, group_parent in model.groups:
+        first = group_parent
+        for m in members:
+            if first is None:
+                first = m
+            else:
+                union(first, m)
+
+    parts = {}
+    for v in range(len(parent)):
+        atoms, indicators = parts.setdefault(find(v), ([], []))
+        (atoms if v < n else indicators).append(v)
+    return [parts[root] for root in sorted(parts)]
+
+
+def submodel(model, atoms, indicators, groups=None):
+    """Builds the model of one part; atoms and indicators are renumbered in order.
+
+    groups may list the groups of model that belong to the part; by default
+    they are looked up among all groups.
+    """
+    number = dict((v, k) for k, v in enumerate(atoms))
+    number.update((v, len(atoms) + k) for k, v in enumerate(indicators))
+
+    item_ids = array('i')
+    offsets = array('q', [0])
+    values = []
+    for a in atoms:
+        item_ids.extend(model.item_ids[model.offsets[a]:model.offsets[a + 1]])
+        offsets.append(len(item_ids))
+        values.append(model.values[a])
+
+    if groups is None:
+        groups = [group for group in model.groups if _first(group) in number]
+    groups = [([number[m] for m in members], None if parent is None else number[parent])
+              for members, parent in groups]
+    return type(model)(item_ids, offsets, values, groups, len(indicators))
+
+
+def _first(group):
+    members, parent = group
+    return members[0] if len(members) else parent
+
+
+def _limited(backend, deadline):
+    """Returns backend with its time limit cut to what is left until deadline (a time.time())."""
+    if deadline is None:
+        return backend
+    limited = copy.copy(backend)
+    limited.time_limit = max(0.0, deadline - time.time())
+    return limited
+
+
+def _solve(backend, model, incumbent, deadline=None):
+    return _limited(backend, deadline).solve(model, incumbent)
+
+
+def solve_components(model, backend, incumbent=None, workers=1, deadline=None,
+                     inline_atoms=INLINE_ATOMS):
+    """Solves every independent part of model separately and combines the results.
+
+    Parts with at most inline_atoms atoms are solved in this process by
+    branch and bound; larger parts use backend, on a pool of workers
+    processes when workers > 1. The inline parts are small enough to be
+    solved to optimality, so they ignore the time_limit and gap of backend.
+
+    Every part gets only the time left until one shared deadline, a
+    time.time(); by default backend.time_limit from when the call starts.
+    """
+    start = time.perf_counter()
+    if deadline is None and backend.time_limit is not None:
+        deadline = time.time() + backend.time_limit
+    parts = [part for part in components(model) if part[0]]
+    if len(parts) <= 1:
+        return _solve(backend, model, incumbent, deadline)
+
+    # hand every group to the part holding its variables
+    part_of = {}
+    for p, (atoms, indicators) in enumerate(parts):
+        part_of.update((v, p) for v in atoms)
+        part_of.update((v, p) for v in indicators)
+    part_groups = [[] for part in parts]
+    for group in model.groups:
+        p = part_of.get(_first(group))
+        if p is not None:
+            part_groups[p].append(group)
+
+    chosen = set(incumbent or ())
+    results = []
+    futures = []
+    inline = BranchAndBoundBackend()
+    for (atoms, indicators), groups in zip(parts, part_groups):
+        sub = submodel(model, atoms, indicators, groups)
+        sub_incumbent = [k for k, a in enumerate(atoms) if a in chosen] if incumbent is not None else None
+        if len(atoms) <= inline_atoms:
+            results.append((atoms, inline.solve(sub, sub_incumbent)))
+        elif workers > 1:
+            futures.append((atoms, _pool(workers).submit(_solve, backend, sub, sub_incumbent,
+                                                          deadline)))
+        else:
+            results.append((atoms, _solve(backend, sub, sub_incumbent, deadline)))
+    results.extend((atoms, future.result()) for atoms, future in futures)
+
+    # the whole solution is only as good as its weakest part
+    selected = sorted(atoms[k] for atoms, result in results for k in result.selected)
+    statuses = set(result.status for atoms, result in results)
+    if statuses == set([OPTIMAL]):
+        status = OPTIMAL
+    elif statuses == set([NOT_SOLVED]):
+        status = NOT_SOLVED
+    else:
+        status = FEASIBLE
+    bounds = [result.bound for atoms, result in results]
+    bound = None if None in bounds else sum(bounds)
+    return SolveResult(selected, sum(model.values[a] for a in selected), bound, status,
+                       backend.name, time.perf_counter() - start)
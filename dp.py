@@ -0,0 +1,178 @@
+# most bits the "dp" engine takes: best and last use 12 bytes per mask
+MAX_BITS = 22
+
+# engine="auto" picks "dp" for models of at most this many bits, "highs" or "pulp" otherwise
+AUTO_BITS = 16
+
+
+class SubsetDP(object):
+    """Exact winner determination by dynamic programming over bitmasks, for
+    models with few items.
+
+    Items held by several atoms, and "at most one" groups made only of
+    atoms, become bits; an item of a single atom conflicts with nothing and
+    needs none. Atoms with the same bits collapse into the most valuable
+    one. best[m] is the best value of atoms packed into the bits of m, kept
+    for all 2 ** bits masks in one numpy array, seen as one axis of length 2
+    per bit: atoms are added one at a time, each raising best on all the
+    supersets of its bits at once through a view of the array, and
+    last[m] remembers which atom raised m last, so the winners are read
+    back from the full mask.
+
+    Indicators are handled in the shape XORofOR gives them: one row over
+    all the indicators and atoms each linked to at most one of them. Each
+    indicator is then a part of its atoms and the unlinked ones, solved on
+    its own, and the best part wins. parts is None for any other model.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.parts = None
+        n = model.num_atoms
+        link = [None] * n
+        exclusive = []
+        top = None
+        for members, parent in model.groups:
+            atoms = [m for m in members if m < n]
+            if len(atoms) < len(members):
+                # only the row over every indicator may hold them
+                if parent is not None or atoms or top is not None:
+                    return
+                top = members
+            elif parent is not None and all(link[m] is None for m in atoms):
+                for m in atoms:
+                    link[m] = parent
+                if len(atoms) > 1:
+                    exclusive.append(atoms)
+            elif parent is None:
+                if len(atoms) > 1:
+                    exclusive.append(atoms)
+            else:
+                return
+        self.exclusive = exclusive
+
+        if not model.num_indicators:
+            self.parts = [list(range(n))]
+        elif top is not None and len(set(top)) == model.num_indicators:
+            free = []
+            linked = {}
+            for i in range(n):
+                if link[i] is None:
+                    free.append(i)
+                else:
+                    linked.setdefault(link[i], []).append(i)
+            self.parts = [sorted(free + linked.get(v, [])) for v in sorted(set(top))]
+
+    def masks(self, atoms):
+        """Returns the bitmasks of atoms (a list of atom indexes) and the number of bits they use."""
+        values = self.model.values
+        item_ids, offsets = self.model.item_ids, self.model.offsets
+        positive = [i for i in atoms if values[i] > 0]
+        uses = {}
+        for i in positive:
+            for k in range(offsets[i], offsets[i + 1]):
+                uses[item_ids[k]] = uses.get(item_ids[k], 0) + 1
+
+        bit_of = {}
+        for item in sorted(uses):
+            if uses[item] > 1:
+                bit_of[item] = len(bit_of)
+        masks = dict((i, 0) for i in atoms)
+        for i in positive:
+            mask = 0
+            for k in range(offsets[i], offsets[i + 1]):
+                bit = bit_of.get(item_ids[k])
+                if bit is not None:
+                    mask |= 1 << bit
+            masks[i] = mask
+        num_bits = len(bit_of)
+        for members in self.exclusive:
+            members = [m for m in members if m in masks and values[m] > 0]
+            if len(members) > 1:
+                for m in members:
+                    masks[m] |= 1 << num_bits
+                num_bits += 1
+        return [masks[i] for i in atoms], num_bits
+
+    def _shared_over(self, atoms, max_bits):
+        """Whether more than max_bits items are shared among atoms, stopping as
+        soon as they are, so large models are turned down quickly."""
+        values = self.model.values
+        item_ids, offsets = self.model.item_ids, self.model.offsets
+        seen = set()
+        shared = set()
+        for i in atoms:
+            if values[i] > 0:
+                for k in range(offsets[i], offsets[i + 1]):
+                    item = item_ids[k]
+                    if item in seen:
+                        shared.add(item)
+                        if len(shared) > max_bits:
+                            return True
+                    seen.add(item)
+        return False
+
+    def supported(self, max_bits=MAX_BITS):
+        """Whether the model has a shape SubsetDP handles and its parts together
+        need no more work than one part of max_bits bits."""
+        if self.parts is None:
+            return False
+        if any(self._shared_over(part, max_bits) for part in self.parts):
+            return False
+        work = sum(1 << self.masks(part)[1] for part in self.parts)
+        return work <= 1 << max_bits
+
+    def solve(self):
+        """Returns the sorted indexes of an optimal set of atoms."""
+        values = self.model.values
+        best_value = None
+        best = []
+        for part in self.parts:
+            chosen = self._solve_part(part)
+            value = sum(values[i] for i in chosen)
+            if best_value is None or value > best_value:
+                best_value, best = value, chosen
+        return sorted(best)
+
+    def _solve_part(self, atoms):
+        import numpy
+        values = self.model.values
+        masks, num_bits = self.masks(atoms)
+
+        # atoms without bits always win; the others collapse per mask
+        chosen = []
+        collapsed = {}
+        for i, mask in zip(atoms, masks):
+            if values[i] <= 0:
+                continue
+            if not mask:
+                chosen.append(i)
+            elif mask not in collapsed or values[i] > values[collapsed[mask]]:
+                collapsed[mask] = i
+        order = list(collapsed.items())
+
+        # bit b is axis num_bits - 1 - b; fixing the atom's axes to 1 views
+        # the supersets of its bits, fixing them to 0 the masks left beside
+        # it, which the atom never raises, so the step reads no mask it writes
+        best = numpy.zeros(1 << num_bits)
+        last = numpy.full(1 << num_bits, -1, dtype=numpy.int32)
+        shape = (2,) * num_bits
+        grid, last_grid = best.reshape(shape), last.reshape(shape)
+        every = slice(None)
+        for k, (mask, i) in enumerate(order):
+            held = [mask >> (num_bits - 1 - axis) & 1 for axis in range(num_bits)]
+            # the Ellipsis keeps a 0-d view when the atom holds every bit
+            inside = tuple(1 if h else every for h in held) + (Ellipsis,)
+            beside = tuple(0 if h else every for h in held) + (Ellipsis,)
+            target = grid[inside]
+            candidate = grid[beside] + values[i]
+            raised = candidate > target
+            target[raised] = candidate[raised]
+            last_grid[inside][raised] = k
+
+        m = (1 << num_bits) - 1
+        while last[m] >= 0:
+            mask, i = order[last[m]]
+            chosen.append(i)
+            m ^= mask
+        return chosen
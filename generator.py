@@ -0,0 +1,201 @@
+import sys
+from optparse import OptionParser
+
+import numpy
+
+from itemuniverse import ItemUniverse, drop_repeats, as_array
+from orlanguage import OR
+from orofxorlanguage import ORofXOR
+from simulation import create_items
+from xorlanguage import XOR
+from xoroforlanguage import XORofOR
+
+LANGUAGES = {'OR': OR, 'XOR': XOR, 'ORofXOR': ORofXOR, 'XORofOR': XORofOR}
+DISTRIBUTIONS = ['uniform', 'regions', 'arbitrary', 'paths', 'scheduling']
+
+
+class InstanceGenerator(object):
+    """Seeded generator of random bids, built a whole batch of atoms at a time with numpy.
+
+    Bundles follow one of the CATS distributions (Leyton-Brown et al.):
+
+    * "uniform": items drawn uniformly, as simulation.py always did;
+    * "regions": items are cells of a square map and a bundle is a random
+      walk over adjacent cells;
+    * "arbitrary": every item has a few related items with random weights
+      and a bundle follows those relations from a random first item;
+    * "paths": items are the roads of a grid of cities and a bundle is a
+      route, worth more the farther it gets;
+    * "scheduling": items are time slots and a bundle is a job occupying
+      consecutive slots, worth more the earlier it ends.
+
+    Bundle sizes are uniform in 1..max_items before repeated items are
+    dropped. Values are whole numbers: the mean common value of the items
+    (uniform in 1..max_value), scaled superadditively by the bundle size
+    and by a private factor per atom. The same seed always gives the same
+    bids.
+    """
+
+    def __init__(self, seed=None):
+        self.rng = numpy.random.default_rng(seed)
+        self._names = []
+
+    def atoms(self, distribution, num_items, num_atoms, max_items, max_value=20):
+        """Returns CSR arrays (item_ids, offsets, values) of num_atoms random atoms."""
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError("Distribution must be one of %s." % ", ".join(DISTRIBUTIONS))
+        rng = self.rng
+        max_items = max(1, min(max_items, num_items))
+        sizes = rng.integers(1, max_items + 1, num_atoms)
+        candidates, worth = getattr(self, '_' + distribution)(num_items, num_atoms, max_items, sizes)
+
+        # keep the first size candidates of every atom, then drop repeats
+        keep = numpy.arange(max_items)[None, :] < sizes[:, None]
+        offsets = numpy.zeros(num_atoms + 1, dtype=numpy.int64)
+        numpy.cumsum(sizes, out=offsets[1:])
+        item_ids, offsets = drop_repeats(as_array('i', candidates[keep]), as_array('q', offsets),
+                                          num_items)
+
+        # superadditive values from common item values and a private factor
+        ids = numpy.frombuffer(item_ids, dtype=numpy.intc)
+        starts = numpy.frombuffer(offsets, dtype=numpy.int64)
+        counts = numpy.diff(starts)
+        common = rng.uniform(1, max_value, num_items)
+        mean = numpy.add.reduceat(common[ids], starts[:-1]) / counts if num_atoms else common[:0]
+        if worth is None:
+            worth = 1.0
+        values = mean * counts ** 1.2 * worth * rng.uniform(0.8, 1.2, num_atoms)
+        values = numpy.maximum(1, numpy.rint(values)).astype(numpy.int64)
+        return item_ids, offsets, values.tolist()
+
+    def bid(self, language, distribution, num_items, num_atoms, max_items, num_clauses=1,
+            max_value=20):
+        """Returns a random bid of a language; nested languages split the atoms evenly into
+        num_clauses clauses, at least one. The bid's universe holds only the
+        items it uses."""
+        if language not in LANGUAGES:
+            raise ValueError("Language must be one of %s." % ", ".join(sorted(LANGUAGES)))
+        cls = LANGUAGES[language]
+        nested = cls not in (OR, XOR)
+        if nested and num_clauses < 1:
+            raise ValueError("Nested languages need at least one clause.")
+        item_ids, offsets, values = self.atoms(distribution, num_items, num_atoms, max_items,
+                                               max_value)
+
+        # the universe holds only the items the bid uses, renumbered in order
+        if len(self._names) < num_items:
+            self._names = create_items(num_items)
+        ids = numpy.frombuffer(item_ids, dtype=numpy.intc)
+        mask = numpy.bincount(ids, minlength=num_items) > 0
+        used = numpy.flatnonzero(mask)
+        item_ids = as_array('i', (numpy.cumsum(mask) - 1)[ids])
+        universe = ItemUniverse([self._names[i] for i in used.tolist()])
+        if not nested:
+            return cls._from_packed(universe, item_ids, offsets, values)
+        clause_offsets = numpy.linspace(0, num_atoms, num_clauses + 1).astype(numpy.int64)
+        return cls._from_packed(universe, item_ids, offsets, values,
+                                as_array('q', clause_offsets))
+
+    # candidate bundles: one row of max_items item ids per atom, and a
+    # factor on the value of each atom (None for 1)
+
+    def _uniform(self, num_items, num_atoms, max_items, sizes):
+        return self.rng.integers(0, num_items, (num_atoms, max_items)), None
+
+    def _regions(self, num_items, num_atoms, max_items, sizes):
+        rng = self.rng
+        width = int(numpy.ceil(numpy.sqrt(num_items)))
+        cells = numpy.empty((num_atoms, max_items), dtype=numpy.int64)
+        cells[:, 0] = rng.integers(0, num_items, num_atoms)
+        moves = numpy.array([1, -1, width, -width])
+        for k in range(1, max_items):
+            step = moves[rng.integers(0, 4, num_atoms)]
+            here = cells[:, k - 1]
+            there = here + step
+            # stay put rather than leave the map or wrap around a row
+            outside = (there < 0) | (there >= num_items) | \
+                      ((numpy.abs(step) == 1) & (there // width != here // width))
+            cells[:, k] = numpy.where(outside, here, there)
+        return cells, None
+
+    def _arbitrary(self, num_items, num_atoms, max_items, sizes):
+        rng = self.rng
+        related = min(num_items, 8)
+        neighbours = rng.integers(0, num_items, (num_items, related))
+        weights = numpy.cumsum(rng.dirichlet(numpy.ones(related), num_items), axis=1)
+        items = numpy.empty((num_atoms, max_items), dtype=numpy.int64)
+        items[:, 0] = rng.integers(0, num_items, num_atoms)
+        for k in range(1, max_items):
+            previous = items[:, k - 1]
+            draw = rng.random(num_atoms)[:, None]
+            choice = numpy.minimum((weights[previous] < draw).sum(axis=1), related - 1)
+            items[:, k] = neighbours[previous, choice]
+        return items, None
+
+    def _paths(self, num_items, num_atoms, max_items, sizes):
+        # a width x width grid of cities has width * (width - 1) roads each
+        # way; horizontal roads come first, both numbered by their lower city
+        rng = self.rng
+        width = 2
+        while 2 * (width + 1) * width <= num_items:
+            width += 1
+        horizontal = width * (width - 1)
+        start = cities = rng.integers(0, width * width, num_atoms)
+        roads = numpy.empty((num_atoms, max_items), dtype=numpy.int64)
+        ends = numpy.empty((num_atoms, max_items), dtype=numpy.int64)
+        for k in range(max_items):
+            row, col = cities // width, cities % width
+            vertical = rng.random(num_atoms) < 0.5
+            position = numpy.where(vertical, row, col)
+            # move forward or back along the road, turning back at the border
+            forward = numpy.where(position == 0, True,
+                                  numpy.where(position == width - 1, False, rng.random(num_atoms) < 0.5))
+            nxt = cities + numpy.where(vertical, width, 1) * numpy.where(forward, 1, -1)
+            low = numpy.minimum(cities, nxt)
+            roads[:, k] = numpy.where(vertical, horizontal + low, low // width * (width - 1) + low % width)
+            ends[:, k] = cities = nxt
+
+        # a route is worth more the farther from its start it ends
+        last = ends[numpy.arange(num_atoms), sizes - 1]
+        distance = numpy.abs(last // width - start // width) + numpy.abs(last % width - start % width)
+        return numpy.minimum(roads, num_items - 1), 1.0 + distance / float(max_items)
+
+    def _scheduling(self, num_items, num_atoms, max_items, sizes):
+        # the start slot leaves room for the longest job; shorter jobs are cut by the sizes
+        start = self.rng.integers(0, num_items - max_items + 1, num_atoms)
+        worth = 1.5 - (start + sizes) / float(num_items)
+        return start[:, None] + numpy.arange(max_items)[None, :], worth
+
+
+def main(args):
+    usage_msg = "Usage:  %prog [options] OUTPUT"
+    parser = OptionParser(usage=usage_msg)
+    parser.add_option("--language", dest="language", default="OR",
+                      help="Set language: 'OR', 'XOR', 'ORofXOR' or 'XORofOR'")
+    parser.add_option("--distribution", dest="distribution", default="uniform",
+                      help="Set distribution: " + ", ".join(DISTRIBUTIONS))
+    parser.add_option("--num-items", dest="num_items", default=10, type="int",
+                      help="Set number of items")
+    parser.add_option("--num-bids", dest="num_bids", default=10, type="int",
+                      help="Set number of atoms")
+    parser.add_option("--num-clauses", dest="num_clauses", default=5, type="int",
+                      help="Set number of clauses of nested languages")
+    parser.add_option("--max-items", dest="max_items", default=5, type="int",
+                      help="Set max number of items allowed in an atom")
+    parser.add_option("--max-value", dest="max_value", default=20, type="int",
+                      help="Set max common value of an item")
+    parser.add_option("--seed", dest="seed", default=None, type="int",
+                      help="Seed of the generator")
+    (options, args) = parser.parse_args(args[1:])
+    if len(args) != 1:
+        parser.error("expected one output file (.bids, or .jsonl)")
+
+    from bidfile import write
+    bid = InstanceGenerator(options.seed).bid(
+        options.language, options.distribution, options.num_items, options.num_bids,
+        options.max_items, options.num_clauses, options.max_value)
+    write(bid, args[0])
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,235 @@
+from array import array
+
+
+
+def _numpy():
+    """Imports numpy when it is first needed; None when it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class ItemUniverse(object):
+    """Maps item names to dense integer ids so bids can share one item table."""
+
+    __slots__ = ('names', 'ids')
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def intern(self, name):
+        """Returns the id of an item name, adding it to the universe if it is new."""
+        i = self.ids.get(name)
+        if i is None:
+            i = len(self.names)
+            self.ids[name] = i
+            self.names.append(name)
+        return i
+
+    def name_list(self, item_ids):
+        """Returns the item names for a sequence of item ids."""
+        names = self.names
+        return [names[i] for i in item_ids]
+
+    def copy(self):
+        """Returns an independent copy of the universe with the same ids."""
+        new = ItemUniverse()
+        new.names = list(self.names)
+        new.ids = dict(self.ids)
+        return new
+
+
+def pack_atoms(bids, universe):
+    """Validates a list of (items, value) atoms and packs them into CSR arrays.
+
+    Returns (item_ids, offsets, values): the ids of atom i are
+    item_ids[offsets[i]:offsets[i + 1]], in the order they were given.
+    """
+
+    # Verify that bids are represented as a list
+    if type(bids) != list:
+        raise TypeError("Bids must be a list.")
+    return pack_iter(bids, universe)
+
+
+def pack_iter(bids, universe):
+    """Like pack_atoms, but reads atoms from any iterable in a single pass."""
+
+    item_ids = array('i')
+    offsets = array('q', [0])
+    values = []
+    intern = universe.intern
+
+    # Check that each bid is a tuple of an items list and a corresponding numeric value
+    for bid in bids:
+        if type(bid) != tuple:
+            raise TypeError("Each bid must be a tuple.")
+        if len(bid) != 2:
+            raise TypeError("Each bid must be made of two items: an item list and a value.")
+        items, value = bid
+        if type(value) != float and type(value) != int:
+            raise TypeError("Value must be of a numeric type.")
+        if type(items) != list:
+            raise TypeError("Items must be in a list.")
+
+        # intern items, dropping repeats inside the atom but keeping their order
+        ids = [intern(item) for item in items]
+        if len(set(ids)) != len(ids):
+            ids = list(dict.fromkeys(ids))
+        item_ids.extend(ids)
+        offsets.append(len(item_ids))
+        values.append(value)
+
+    return item_ids, offsets, values
+
+
+def as_array(typecode, data):
+    """Returns data as an array of typecode, without copying when it already is one."""
+    if type(data) == array and data.typecode == typecode:
+        return data
+    result = array(typecode)
+    numpy = None if isinstance(data, list) else _numpy()
+    if numpy is not None:
+        dtype = numpy.intc if typecode == 'i' else numpy.int64
+        result.frombytes(numpy.ascontiguousarray(data, dtype=dtype).tobytes())
+    else:
+        result.extend(data)
+    return result
+
+
+def id_universe(item_ids):
+    """Returns a universe in which every id up to the largest of item_ids names itself."""
+    if not len(item_ids):
+        return ItemUniverse()
+    numpy = None if isinstance(item_ids, list) else _numpy()
+    top = numpy.max(item_ids) if numpy is not None else max(item_ids)
+    return ItemUniverse(range(int(top) + 1))
+
+
+def pack_arrays(item_ids, offsets, values, universe, trusted=False):
+    """Packs CSR arrays of item ids, offsets and values into the form of pack_atoms.
+
+    The arrays may be numpy arrays, array.array buffers or lists, and the
+    item ids refer to universe. Unless trusted is True the batch is
+    checked as a whole: offsets must run from 0 to len(item_ids) without
+    decreasing, ids must exist in universe and values must be numbers.
+    Items repeated inside an atom are dropped as in pack_atoms. Trusted
+    arrays are taken as they are.
+    """
+    numpy = _numpy()
+    if not trusted:
+        if numpy is not None:
+            _check_arrays_numpy(item_ids, offsets, values, len(universe))
+        else:
+            _check_arrays(item_ids, offsets, values, len(universe))
+    item_ids = as_array('i', item_ids)
+    offsets = as_array('q', offsets)
+    values = values.tolist() if numpy is not None and isinstance(values, numpy.ndarray) else list(values)
+    if not trusted:
+        item_ids, offsets = drop_repeats(item_ids, offsets, len(universe))
+    return item_ids, offsets, values
+
+
+def _check_arrays_numpy(item_ids, offsets, values, num_items):
+    numpy = _numpy()
+    item_ids = numpy.asarray(item_ids)
+    offsets = numpy.asarray(offsets)
+    values = numpy.asarray(values)
+    if (item_ids.size and item_ids.dtype.kind not in 'iu') or offsets.dtype.kind not in 'iu':
+        raise TypeError("Item ids and offsets must be integers.")
+    if values.size and values.dtype.kind not in 'iuf':
+        raise TypeError("Value must be of a numeric type.")
+    if item_ids.ndim != 1 or offsets.ndim != 1 or values.ndim != 1:
+        raise ValueError("Item ids, offsets and values must be one-dimensional.")
+    if len(offsets) != len(values) + 1 or offsets[0] != 0 or offsets[-1] != len(item_ids):
+        raise ValueError("Offsets must run from 0 to the number of item ids, one more than the values.")
+    if (numpy.diff(offsets) < 0).any():
+        raise ValueError("Offsets must not decrease.")
+    if item_ids.size and (item_ids.min() < 0 or item_ids.max() >= num_items):
+        raise ValueError("Item ids must refer to items of the universe.")
+
+
+def _check_arrays(item_ids, offsets, values, num_items):
+    if any(type(x) != int for x in item_ids) or any(type(x) != int for x in offsets):
+        raise TypeError("Item ids and offsets must be integers.")
+    if any(type(v) != float and type(v) != int for v in values):
+        raise TypeError("Value must be of a numeric type.")
+    if len(offsets) != len(values) + 1 or offsets[0] != 0 or offsets[-1] != len(item_ids):
+        raise ValueError("Offsets must run from 0 to the number of item ids, one more than the values.")
+    if any(offsets[i] > offsets[i + 1] for i in range(len(values))):
+        raise ValueError("Offsets must not decrease.")
+    if any(x < 0 or x >= num_items for x in item_ids):
+        raise ValueError("Item ids must refer to items of the universe.")
+
+
+def drop_repeats(item_ids, offsets, num_items):
+    """Drops items listed twice inside an atom, keeping the first occurrence."""
+    n = len(offsets) - 1
+    numpy = _numpy()
+    if numpy is None:
+        if all(offsets[i + 1] - offsets[i] == len(set(item_ids[offsets[i]:offsets[i + 1]]))
+               for i in range(n)):
+            return item_ids, offsets
+        ids = array('i')
+        new_offsets = array('q', [0])
+        for i in range(n):
+            ids.extend(dict.fromkeys(item_ids[offsets[i]:offsets[i + 1]]))
+            new_offsets.append(len(ids))
+        return ids, new_offsets
+
+    ids = numpy.frombuffer(item_ids, dtype=numpy.intc)
+    if len(ids) < 2:
+        return item_ids, offsets
+    atom = numpy.repeat(numpy.arange(n), numpy.diff(numpy.frombuffer(offsets, dtype=numpy.int64)))
+    keys = atom * max(num_items, 1) + ids
+    first = numpy.unique(keys, return_index=True)[1]
+    if len(first) == len(keys):
+        return item_ids, offsets
+    keep = numpy.zeros(len(keys), dtype=bool)
+    keep[first] = True
+    counts = numpy.bincount(atom[keep], minlength=n)
+    return (as_array('i', ids[keep]),
+            as_array('q', numpy.concatenate(([0], numpy.cumsum(counts)))))
+
+
+def used_items(universe, item_ids):
+    """Returns the names of the distinct items referenced by item_ids."""
+    names = universe.names
+    return [names[i] for i in sorted(set(item_ids))]
+
+
+class DummyAllocator(object):
+    """Hands out fresh dummy items "d", "d0", "d1", ... that are not yet in a universe.
+
+    The candidate counter only moves forward and membership is a dict lookup,
+    so allocating n dummies costs O(n) however many items the universe holds.
+    """
+
+    __slots__ = ('universe', 'prefix', 'counter')
+
+    def __init__(self, universe, prefix="d"):
+        self.universe = universe
+        self.prefix = prefix
+        self.counter = -1
+
+    def new(self):
+        """Interns a new dummy item and returns its id."""
+        while True:
+            if self.counter < 0:
+                name = self.prefix
+            else:
+                name = self.prefix + str(self.counter)
+            self.counter += 1
+            if name not in self.universe:
+                return self.universe.intern(name)
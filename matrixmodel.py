@@ -0,0 +1,89 @@
+import numpy
+from scipy.sparse import csr_matrix, vstack
+
+
+def constraint_matrix(model):
+    """Builds the rows of a WDPModel as one sparse matrix, A x <= rhs.
+
+    Columns are the model variables, atoms first and indicators after them.
+    The atom-item incidence comes straight from the CSR arrays, transposed
+    in bulk, and keeps the items shared by several atoms; every group adds
+    one row. Returns (A, rhs) with A a scipy.sparse.csr_matrix.
+    """
+    n = model.num_atoms
+    size = n + model.num_indicators
+    ids = numpy.asarray(model.item_ids, dtype=numpy.int64)
+    offsets = numpy.asarray(model.offsets, dtype=numpy.int64)
+    num_items = int(ids.max()) + 1 if len(ids) else 0
+
+    # items x atoms, keeping only the items that can conflict
+    incidence = csr_matrix((numpy.ones(len(ids)), ids, offsets), shape=(n, num_items))
+    items = incidence.T.tocsr()
+    shared = numpy.flatnonzero(numpy.diff(items.indptr) > 1)
+    items = items[shared]
+    items.resize(len(shared), size)
+
+    # one row per group: members minus the parent indicator
+    cols = []
+    data = []
+    indptr = [0]
+    rhs = []
+    for members, parent in model.groups:
+        if parent is None and len(members) < 2:
+            continue
+        members = numpy.asarray(members, dtype=numpy.int64)
+        cols.append(members)
+        data.append(numpy.ones(len(members)))
+        if parent is not None:
+            cols.append(numpy.array([parent], dtype=numpy.int64))
+            data.append(numpy.array([-1.0]))
+        indptr.append(indptr[-1] + len(members) + (parent is not None))
+        rhs.append(1.0 if parent is None else 0.0)
+    if cols:
+        groups = csr_matrix((numpy.concatenate(data), numpy.concatenate(cols), indptr),
+                            shape=(len(rhs), size))
+    else:
+        groups = csr_matrix((0, size))
+
+    matrix = vstack([items, groups], format='csr')
+    return matrix, numpy.concatenate([numpy.ones(len(shared)), numpy.array(rhs)])
+
+
+def objective(model):
+    """Returns the objective coefficients of every variable (indicators are worth 0)."""
+    c = numpy.zeros(model.num_atoms + model.num_indicators)
+    c[:model.num_atoms] = model.values
+    return c
+
+
+def variable_names(model):
+    """Returns the column names z1, z2, ... for atoms and y1, y2, ... for indicators."""
+    return (["z%d" % (i + 1) for i in range(model.num_atoms)]
+            + ["y%d" % (i + 1) for i in range(model.num_indicators)])
+
+
+def write_mps(model, path):
+    """Writes model as a free-format MPS file any MIP solver can read.
+
+    MPS minimises, so the objective row holds the negated values; all
+    variables are binary. Rows are named R1, R2, ... in the order of
+    constraint_matrix.
+    """
+    matrix, rhs = constraint_matrix(model)
+    columns = matrix.tocsc()
+    c = objective(model)
+    names = variable_names(model)
+    with open(path, 'w') as f:
+        f.write("NAME winner_determination\nROWS\n N OBJ\n")
+        f.writelines(" L R%d\n" % (r + 1) for r in range(len(rhs)))
+        f.write("COLUMNS\n    MARKER 'MARKER' 'INTORG'\n")
+        for j, name in enumerate(names):
+            start, stop = columns.indptr[j], columns.indptr[j + 1]
+            f.write("    %s OBJ %r\n" % (name, -float(c[j])))
+            f.writelines("    %s R%d %r\n" % (name, r + 1, float(v))
+                         for r, v in zip(columns.indices[start:stop], columns.data[start:stop]))
+        f.write("    MARKER 'MARKER' 'INTEND'\nRHS\n")
+        f.writelines("    RHS R%d %r\n" % (r + 1, float(v)) for r, v in enumerate(rhs) if v)
+        f.write("BOUNDS\n")
+        f.writelines(" BV BND %s\n" % name for name in names)
+        f.write("ENDATA\n")
@@ -0,0 +1,133 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+# callbacks hook(kind, name, value) with kind "time" (seconds) or "count";
+# while the list is empty instrumentation costs one truth test per phase
+_hooks = []
+
+
+def add_hook(hook):
+    """Registers hook(kind, name, value) to receive every timing and counter."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+def enabled():
+    """Whether any hook listens; callers can skip work that only feeds counters."""
+    return bool(_hooks)
+
+
+def count(name, n=1):
+    """Reports n more of counter name."""
+    if _hooks:
+        for hook in list(_hooks):
+            hook("count", name, n)
+
+
+def timing(name, seconds):
+    """Reports seconds spent in phase name, for phases a with block cannot time."""
+    if _hooks:
+        for hook in list(_hooks):
+            hook("time", name, seconds)
+
+
+class _Phase(object):
+    """Context manager timing one phase with perf_counter."""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        for hook in list(_hooks):
+            hook("time", self.name, elapsed)
+
+
+class _NoPhase(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_no_phase = _NoPhase()
+
+
+def phase(name):
+    """Returns a context manager timing the phase name, a shared no-op when nothing listens."""
+    return _Phase(name) if _hooks else _no_phase
+
+
+class Metrics(object):
+    """Totals of the phase timings and counters reported while it is registered.
+
+    timings maps a phase ("to_OR", "model", "presolve", "solve", "solver",
+    "extract", ...) to its total seconds, calls to the number of times it
+    ran, and counters a counter name ("atoms", "items", "dummy_items",
+    "constraints", "bnb_nodes", "lp_iterations", ...) to its total.
+    Phases run in worker processes (workers > 1) are not seen.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.calls = {}
+        self.counters = {}
+
+    def __call__(self, kind, name, value):
+        if kind == "time":
+            self.timings[name] = self.timings.get(name, 0.0) + value
+            self.calls[name] = self.calls.get(name, 0) + 1
+        else:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self):
+        return {"timings": dict(self.timings), "calls": dict(self.calls),
+                "counters": dict(self.counters)}
+
+    def reset(self):
+        self.timings.clear()
+        self.calls.clear()
+        self.counters.clear()
+
+
+@contextmanager
+def collect(metrics=None):
+    """Collects the metrics of the calls made inside the with block.
+
+        with collect() as m:
+            bid.WDP()
+        m.timings["solve"], m.counters["constraints"]
+    """
+    if metrics is None:
+        metrics = Metrics()
+    add_hook(metrics)
+    try:
+        yield metrics
+    finally:
+        remove_hook(metrics)
+
+
+class LogHook(object):
+    """Logs every timing and counter as one JSON object per record."""
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger if logger is not None else logging.getLogger("biddinglanguages.metrics")
+        self.level = level
+
+    def __call__(self, kind, name, value):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, json.dumps({"kind": kind, "name": name, "value": value}))
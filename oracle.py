@@ -0,0 +1,214 @@
+from array import array
+from bnb import BranchAndBound
+
+# memoized bundles kept per bid before the memo starts over
+MEMO_ENTRIES = 1 << 16
+
+# bundles whose subset recursion meets at most 2 ** DP_BITS sub-bundles use it
+DP_BITS = 20
+
+
+class ValueOracle(object):
+    """Answers what a bid is worth for a bundle of items, see BiddingLanguage.value.
+
+    The value of a bundle is the optimum of the bid's WDP restricted to the
+    atoms whose items all lie in the bundle. Atoms and bundles are bitmasks
+    over the items the bid uses, and item_atoms[k] is the bitmask of the
+    atoms holding item k, so the atoms that fit a bundle are found with one
+    OR per item left out of it.
+
+    Without indicator variables (OR, XOR, ORofXOR and bid trees without an
+    OR node under an XOR node) every "at most one" group also gets a bit,
+    below the item bits and set in every bundle, and a bundle is solved by
+    a recursion over its bits: the lowest bit is either left unused or
+    taken by one of the atoms whose lowest bit it is. Groups are thus
+    decided one after the other, then items, so there are (groups + 1) *
+    2 ** items sub-bundles; the recursion runs when that is at most
+    2 ** DP_BITS. Sub-bundles are memoized too, so later queries reuse
+    them. Other bundles go to BranchAndBound on the atoms that fit.
+    """
+
+    def __init__(self, bid, memo_entries=MEMO_ENTRIES):
+        model = bid.model()
+        n = model.num_atoms
+        self.universe = bid.universe
+        self.model = model
+        self.memo_entries = memo_entries
+        self.memo = {}
+        self.packed = {}
+
+        # a bit for every item the bid uses
+        self.bit_of = {}
+        self.masks = [0] * n
+        self.item_atoms = []
+        item_ids, offsets = model.item_ids, model.offsets
+        for i in range(n):
+            mask = 0
+            for k in range(offsets[i], offsets[i + 1]):
+                bit = self.bit_of.get(item_ids[k])
+                if bit is None:
+                    bit = self.bit_of[item_ids[k]] = len(self.item_atoms)
+                    self.item_atoms.append(0)
+                self.item_atoms[bit] |= 1 << i
+                mask |= 1 << bit
+            self.masks[i] = mask
+        self.all_items = (1 << len(self.item_atoms)) - 1
+
+        # groups to rebuild for the atoms of a bundle: those an atom belongs
+        # to, and those over indicators only, which every restriction keeps
+        self.atom_groups = [[] for i in range(n)]
+        self.indicator_groups = []
+        for g, (members, parent) in enumerate(model.groups):
+            atoms = [m for m in members if m < n]
+            for m in atoms:
+                self.atom_groups[m].append(g)
+            if len(atoms) < len(members) or not members:
+                self.indicator_groups.append(g)
+        self.exclusive = not model.num_indicators and n > 1 and any(
+            len(members) == n for members, parent in model.groups)
+
+        # for the recursion: the best value per atom mask, filed under the
+        # lowest bit of the mask
+        self.group_atoms = []
+        self.by_low_bit = {}
+        self.free = 0
+        if not model.num_indicators:
+            shared = [members for members, parent in model.groups if len(members) > 1]
+            self.group_atoms = [0] * len(shared)
+            masks = [mask << len(shared) for mask in self.masks]
+            for bit, members in enumerate(shared):
+                for m in members:
+                    masks[m] |= 1 << bit
+                    self.group_atoms[bit] |= 1 << m
+            best = {}
+            for i in range(n):
+                if model.values[i] > 0:
+                    if masks[i]:
+                        best[masks[i]] = max(best.get(masks[i], model.values[i]), model.values[i])
+                    else:
+                        # atoms without items or groups are always won
+                        self.free += model.values[i]
+            for mask, v in best.items():
+                low = (mask & -mask).bit_length() - 1
+                self.by_low_bit.setdefault(low, []).append((mask, v))
+
+    def bundle_mask(self, bundle):
+        """Returns the bitmask of the items of bundle that the bid uses."""
+        ids, bit_of = self.universe.ids, self.bit_of
+        mask = 0
+        for item in bundle:
+            bit = bit_of.get(ids.get(item))
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def excluded(self, mask):
+        """Returns the bitmask of the atoms holding an item outside the bundle mask."""
+        excluded = 0
+        outside = self.all_items & ~mask
+        item_atoms = self.item_atoms
+        while outside:
+            low = outside & -outside
+            excluded |= item_atoms[low.bit_length() - 1]
+            outside ^= low
+        return excluded
+
+    def fitting(self, mask):
+        """Returns the indexes of the atoms whose items all lie in the bundle mask."""
+        excluded = self.excluded(mask)
+        values = self.model.values
+        return [i for i in range(len(values)) if not excluded >> i & 1 and values[i] > 0]
+
+    def value(self, bundle):
+        mask = self.bundle_mask(bundle)
+        result = self.memo.get(mask)
+        if result is None:
+            result = None
+            if not self.model.num_indicators and bin(mask).count('1') <= DP_BITS:
+                # only groups with an atom that fits can matter
+                excluded = self.excluded(mask)
+                groups = 0
+                for bit, atoms in enumerate(self.group_atoms):
+                    if atoms & ~excluded:
+                        groups |= 1 << bit
+                # the recursion meets (groups + 1) * 2 ** items sub-bundles
+                if (bin(groups).count('1') + 1) << bin(mask).count('1') <= 1 << DP_BITS:
+                    result = self.free + self._subsets((mask << len(self.group_atoms)) | groups)
+            if result is None:
+                result = self._solve(self.fitting(mask))
+            self._remember(self.memo, mask, result)
+        return result
+
+    def _remember(self, memo, mask, result):
+        if len(memo) >= self.memo_entries:
+            memo.clear()
+        memo[mask] = result
+
+    def _subsets(self, mask):
+        """Best value of atoms packed into the bits of mask (group bits included)."""
+        # one bit is decided per step, so a bid with many groups would nest
+        # too deep for recursion; sub-bundles wait on an explicit stack and
+        # their values are kept here until the end, since the shared memo
+        # may be cleared on the way
+        by_low_bit, packed = self.by_low_bit, self.packed
+        found = {0: 0}
+        stack = [mask]
+        while stack:
+            m = stack[-1]
+            if m in found:
+                stack.pop()
+                continue
+            if m in packed:
+                found[m] = packed[m]
+                stack.pop()
+                continue
+            low = m & -m
+            fits = [(m & ~atom, v) for atom, v in by_low_bit.get(low.bit_length() - 1, ())
+                    if atom & m == atom]
+            missing = [rest for rest in [m ^ low] + [rest for rest, v in fits]
+                       if rest not in found and rest not in packed]
+            if missing:
+                stack.extend(missing)
+                continue
+            result = found.get(m ^ low, packed.get(m ^ low))
+            for rest, v in fits:
+                v += found.get(rest, packed.get(rest))
+                if v > result:
+                    result = v
+            found[m] = result
+            stack.pop()
+        for m, result in found.items():
+            if m:
+                self._remember(packed, m, result)
+        return found[mask]
+
+    def _solve(self, atoms):
+        values = self.model.values
+        if not atoms:
+            return 0
+        if len(atoms) == 1 or self.exclusive:
+            return max(values[i] for i in atoms)
+        return sum(values[atoms[k]] for k in BranchAndBound(self.restrict(atoms)).solve())
+
+    def restrict(self, atoms):
+        """Builds the model of the given atoms only, keeping every indicator."""
+        model = self.model
+        n = model.num_atoms
+        number = dict((a, k) for k, a in enumerate(atoms))
+        shift = len(atoms) - n
+        item_ids = array('i')
+        offsets = array('q', [0])
+        for a in atoms:
+            item_ids.extend(model.item_ids[model.offsets[a]:model.offsets[a + 1]])
+            offsets.append(len(item_ids))
+
+        touched = set(self.indicator_groups)
+        for a in atoms:
+            touched.update(self.atom_groups[a])
+        groups = []
+        for g in sorted(touched):
+            members, parent = model.groups[g]
+            members = [number[m] if m < n else m + shift for m in members if m >= n or m in number]
+            groups.append((members, None if parent is None else parent + shift))
+        return type(model)(item_ids, offsets, [model.values[a] for a in atoms], groups,
+                           model.num_indicators)
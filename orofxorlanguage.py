@@ -1,69 +1,39 @@
-from biddinglanguage import BiddingLanguage
+from biddinglanguage import ClauseBid
+from itemuniverse import DummyAllocator
 from orlanguage import OR
+from wdpmodel import WDPModel
 from xorlanguage import XOR
 
-import copy
-
-class ORofXOR(BiddingLanguage):
+class ORofXOR(ClauseBid):
     """Class implementing ORofXOR bidding language."""
 
-    def __init__(self, bids):
-
-        # Verify that bids are represented as a list
-        if type(bids) != list:
-            raise TypeError("Bids must be a list.")
-
-        total_items = []
-        size = 0
-        # Check that each bid is another XOR bid
-        for bid in bids:
-            if type(bid) != XOR:
-                raise TypeError("Each bid must be of type XOR.")
-            size += bid.size
-            total_items.extend(bid.items)
-
-        # instantiate fields
-        self.bids = bids
-        self.join = "OR"
-        self.size = size
-        self.items = list(set(total_items))
+    __slots__ = ()
+    join = "OR"
+    clause_type = XOR
 
-    def __str__(self):
-        result = "(" + str(self.bids[0]) + ")"
-        for i in range(1, len(self.bids)):
-            result += " "+ self.join + " "
-            result += "(" + str(self.bids[i]) + ")"
-        return result
+    def __init__(self, bids, universe=None):
+        ClauseBid.__init__(self, bids, universe)
 
     def to_OR(self):
         """Translates ORofXOR bid to the OR* bidding language."""
+        return self._translated(OR)
 
-        new_bids = []
-        dummy = "d"
-        i = 0
-        current_items = list(self.items)
+    def _translate(self, universe):
+        dummies = DummyAllocator(universe)
 
         # iterate over every XOR clause in the bid
-        for xor_clause in self.bids:
+        for c in range(self.num_clauses):
             # create a unique dummy variable for each clause
-            while dummy in current_items:
-                dummy = "d" + str(i)
-                i += 1
-            current_items.append(dummy)
+            dummy_id = dummies.new()
 
             # add dummy variable to each bid within the clause
-            for items, value in xor_clause.bids:
-                new_items = list(items)
-                new_items.append(dummy)
-                new_bids.append((new_items, value))
-        
-        # Construct new OR bid
-        return OR(new_bids)  
-
-    def WDP(self):
-        """Solves winner determination problem."""
-        or_bid = self.to_OR()
-        return or_bid.WDP()
-            
-
-
+            for k in range(self.clause_offsets[c], self.clause_offsets[c + 1]):
+                ids = self.atom_ids(k)
+                ids.append(dummy_id)
+                yield ids, self.values[k]
+
+    def model(self):
+        """Builds the WDP model: item rows plus one "at most one" row per XOR clause."""
+        co = self.clause_offsets
+        groups = [(range(co[c], co[c + 1]), None) for c in range(self.num_clauses)]
+        return WDPModel(self.item_ids, self.offsets, self.values, groups)
@@ -0,0 +1,149 @@
+import time
+from array import array
+from backends import SolveResult
+
+
+class Presolve(object):
+    """Shrinks a WDPModel before it is solved and maps solutions back.
+
+    Three reductions are applied, each keeping at least one optimal solution:
+
+    * atoms worth nothing are dropped;
+    * an atom is dropped when another atom with the same group membership
+      has a subset of its items and at least its value; duplicates merge
+      into the most valuable copy (the lowest index on ties);
+    * atoms that share no item and no group with any remaining atom are
+      fixed to 1 and taken out of the model.
+
+    A dominating atom must have items, so the two atoms can never win
+    together. The subset search stops after max_checks candidate pairs,
+    by default as many as the model has atoms and item entries, so it
+    costs about one more pass over the model. With dominance=False it is
+    skipped: engines whose work depends only on the items, like "dp",
+    gain nothing from fewer atoms. Given a deadline, a time.time(), the
+    search and the fixing stop there; past it nothing is reduced.
+    """
+
+    def __init__(self, model, max_checks=None, dominance=True, deadline=None):
+        self.original = model
+        n = model.num_atoms
+        if deadline is not None and time.time() >= deadline:
+            # no time left to spend: the model stays as it is
+            self.fixed = []
+            self.kept = list(range(n))
+            self.model = model
+            return
+        values = model.values
+        item_ids, offsets = model.item_ids, model.offsets
+        if max_checks is None:
+            max_checks = len(item_ids) + n
+        if not dominance:
+            max_checks = 0
+
+        # signature: the groups an atom takes part in; single-member groups
+        # only link the atom to their parent, so the parent stands for them
+        signature = [[] for i in range(n)]
+        for g, (members, parent) in enumerate(model.groups):
+            if len(members) > 1:
+                for m in members:
+                    if m < n:
+                        signature[m].append(('group', g))
+            elif parent is not None:
+                for m in members:
+                    if m < n:
+                        signature[m].append(('link', parent))
+        signature = [tuple(sorted(s)) for s in signature]
+
+        items = [frozenset(item_ids[offsets[i]:offsets[i + 1]]) for i in range(n)]
+        alive = [values[i] > 0 for i in range(n)]
+
+        # index atoms by their smallest item so subsets can be found through
+        # the items of the larger atom, most valuable first
+        by_first = {}
+        if max_checks > 0:
+            for i in sorted(range(n), key=values.__getitem__, reverse=True):
+                if alive[i] and items[i]:
+                    by_first.setdefault(min(items[i]), []).append(i)
+
+        checks = 0
+        for a in range(n):
+            if deadline is not None and not a % 1024 and time.time() >= deadline:
+                break
+            if not alive[a] or checks >= max_checks:
+                continue
+            for x in items[a]:
+                for b in by_first.get(x, ()):
+                    checks += 1
+                    if values[b] < values[a] or checks > max_checks:
+                        break
+                    if b == a or not alive[b] or signature[b] != signature[a]:
+                        continue
+                    if not items[b] <= items[a]:
+                        continue
+                    # equal atoms of equal value: keep the lower index
+                    if items[b] == items[a] and values[b] == values[a] and b > a:
+                        continue
+                    alive[a] = False
+                    break
+                if not alive[a]:
+                    break
+
+        # atoms with no groups and no shared items are always taken
+        fixed = []
+        if deadline is None or time.time() < deadline:
+            shared = {}
+            for i in range(n):
+                if alive[i]:
+                    for x in items[i]:
+                        shared[x] = shared.get(x, 0) + 1
+            fixed = [i for i in range(n) if alive[i] and not signature[i]
+                     and all(shared[x] == 1 for x in items[i])]
+        for i in fixed:
+            alive[i] = False
+
+        self.fixed = fixed
+        self.kept = [i for i in range(n) if alive[i]]
+        self.model = self._reduced_model()
+
+    @property
+    def reduced(self):
+        """Whether presolve removed anything."""
+        return len(self.kept) < self.original.num_atoms
+
+    def _reduced_model(self):
+        model = self.original
+        n = model.num_atoms
+        position = dict((a, k) for k, a in enumerate(self.kept))
+        shift = len(self.kept) - n
+
+        item_ids = array('i')
+        offsets = array('q', [0])
+        values = []
+        for a in self.kept:
+            item_ids.extend(model.item_ids[model.offsets[a]:model.offsets[a + 1]])
+            offsets.append(len(item_ids))
+            values.append(model.values[a])
+
+        # renumber group members; dropped atoms leave their groups
+        groups = []
+        for members, parent in model.groups:
+            new_members = [position[m] if m < n else m + shift for m in members
+                           if m >= n or m in position]
+            if new_members:
+                groups.append((new_members, None if parent is None else parent + shift))
+        return type(model)(item_ids, offsets, values, groups, model.num_indicators)
+
+    def reduce_incumbent(self, incumbent):
+        """Maps a feasible set of original atom indexes into the reduced model."""
+        if incumbent is None:
+            return None
+        position = dict((a, k) for k, a in enumerate(self.kept))
+        return [position[a] for a in incumbent if a in position]
+
+    def restore(self, result):
+        """Maps a SolveResult of the reduced model back to the original atoms."""
+        fixed_value = sum(self.original.values[i] for i in self.fixed)
+        selected = sorted([self.kept[k] for k in result.selected] + self.fixed)
+        bound = None if result.bound is None else result.bound + fixed_value
+        return SolveResult(selected, result.objective + fixed_value, bound,
+                           result.status, result.backend, result.seconds)
@@ -0,0 +1,388 @@
+"""Local auction service: bids and solve requests over a TCP or Unix socket.
+
+Every request is one line of JSON and gets one line of JSON back, carrying
+the "id" of the request when it has one. Replies to solve requests come
+when the solve ends, so they may overtake each other; match them by id.
+
+    {"op": "submit", "bid": [...]}               -> {"bid": fingerprint, "atoms": n}
+    {"op": "solve", "bid": ..., "options": {...}} -> winners, as Winners.as_dict
+    {"op": "stats"}                              -> see AuctionService.stats
+
+A bid is the list of lines of its JSONL form (see bidfile.to_records), the
+fingerprint of a bid submitted before, or, with "format": "binary" and
+"length": n, the n bytes of its binary bid file sent right after the line;
+n may be at most the service's max_payload, and a larger or invalid length
+ends the connection after the error reply, as the payload cannot be skipped.
+options are those of the bid's WDP (engine, time_limit, gap, translate,
+mode, budget_ms, ...). Errors come back as {"error": message}.
+"""
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from optparse import OptionParser
+
+from bidfile import from_records, loads
+from metrics import count, phase, timing
+
+# latencies kept for the percentiles of stats()
+LATENCY_WINDOW = 1024
+
+# largest binary payload accepted by default, in bytes
+MAX_PAYLOAD = 64 << 20
+
+
+def _parse(payload, records):
+    """Builds a bid from a binary payload or JSONL records and returns it with its fingerprint."""
+    bid = loads(payload) if payload is not None else from_records(records)
+    return bid, bid.fingerprint()
+
+
+def _solve(bid, options):
+    """Runs one WDP in a worker and returns its winners as plain data."""
+    return bid.WDP(**options).as_dict()
+
+
+class AuctionService(object):
+    """Serves WDP solves of many clients from one event loop.
+
+    Solve requests wait in a queue of at most max_queue entries; once it is
+    full the service stops reading requests, so clients that send faster
+    than the workers solve are held back by their sockets. concurrency
+    solves (default workers) run at a time on a pool of workers processes,
+    or threads with processes=False, which suits the pulp engines. A solve
+    asked again, for a bid with the same fingerprint and the same options,
+    while the first is still queued or running waits for that one instead
+    of being solved twice. Submitted bids are kept by fingerprint, the
+    max_bids most recently used ones. Bids sent with a request are read and
+    fingerprinted on a thread, so the event loop keeps serving meanwhile; a
+    request naming a fingerprint needs neither. Binary payloads are limited
+    to max_payload bytes and checked before a bid is built from them. A
+    worker process that dies fails the solves it was running and the pool
+    is replaced, so later solves go on.
+
+    Reports the counters "service_requests", "service_solves",
+    "service_coalesced" and "service_errors" and the phases
+    "service_queue" (waiting for a worker) and "service_solve" to the
+    metrics hooks.
+    """
+
+    def __init__(self, workers=2, concurrency=None, max_queue=64, processes=True,
+                 max_bids=1024, max_payload=MAX_PAYLOAD):
+        self.workers = workers
+        self.concurrency = concurrency if concurrency is not None else workers
+        self.max_queue = max_queue
+        self.processes = processes
+        self.max_bids = max_bids
+        self.max_payload = max_payload
+        self.bids = OrderedDict()
+        self.requests = 0
+        self.solves = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.server = None
+        self._executor = None
+        self._queue = None
+        self._tasks = []
+        self._pending = {}
+
+    def start(self):
+        """Starts the workers; done by serve, needed before calling solve directly."""
+        if self._queue is not None:
+            return
+        self._executor = self._new_executor()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.ensure_future(self._work()) for k in range(self.concurrency)]
+
+    def _new_executor(self):
+        executor_type = ProcessPoolExecutor if self.processes else ThreadPoolExecutor
+        return executor_type(max_workers=self.workers)
+
+    def _replace_executor(self, broken):
+        """Swaps a broken process pool for a new one, once however many solves saw it break."""
+        if self._executor is broken:
+            broken.shutdown(wait=False)
+            self._executor = self._new_executor()
+
+    async def serve(self, host="127.0.0.1", port=0, path=None):
+        """Listens on a Unix socket at path, or else on host and port, and returns the server."""
+        self.start()
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def close(self):
+        """Stops listening, cancels the workers and shuts the pool down."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for key, future in self._pending.items():
+            if not future.done():
+                future.cancel()
+        self._tasks = []
+        self._pending = {}
+        self._queue = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        """Returns the queue depth, solves in flight, request counts and latencies (seconds)."""
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+
+        return {"queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "in_flight": self.in_flight, "requests": self.requests, "solves": self.solves,
+                "coalesced": self.coalesced, "errors": self.errors, "bids": len(self.bids),
+                "latency_p50": percentile(0.5), "latency_p99": percentile(0.99)}
+
+    def submit(self, bid, key=None):
+        """Keeps a bid for later solve requests and returns its fingerprint, key when known."""
+        if key is None:
+            key = bid.fingerprint()
+        self.bids[key] = bid
+        self.bids.move_to_end(key)
+        while len(self.bids) > self.max_bids:
+            self.bids.popitem(last=False)
+        return key
+
+    def lookup(self, key):
+        """Returns the submitted bid with fingerprint key."""
+        bid = self.bids.get(key)
+        if bid is None:
+            raise ValueError("Unknown bid %r, submit it first." % (key,))
+        self.bids.move_to_end(key)
+        return bid
+
+    async def solve(self, bid, options=None):
+        """Solves a bid through the queue and returns its winners as plain data."""
+        fingerprint = await asyncio.get_running_loop().run_in_executor(None, bid.fingerprint)
+        return await asyncio.shield(await self._enqueue(bid, fingerprint, options or {}))
+
+    async def _enqueue(self, bid, fingerprint, options):
+        """Queues a solve, or finds the same one already queued, and returns its future."""
+        key = (fingerprint, repr(sorted(options.items())))
+        future = self._pending.get(key)
+        if future is not None:
+            self.coalesced += 1
+            count("service_coalesced")
+            return future
+        future = self._pending[key] = asyncio.get_running_loop().create_future()
+        try:
+            await self._queue.put((key, bid, options, future, time.perf_counter()))
+        except BaseException:
+            # given up while the queue was full: nobody will solve it, but
+            # requests coalesced onto it meanwhile must still get a reply
+            del self._pending[key]
+            future.set_exception(RuntimeError("The solve was given up before it was queued."))
+            # marks the exception as seen in case no request waits on it
+            future.exception()
+            raise
+        return future
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key, bid, options, future, queued = await self._queue.get()
+            timing("service_queue", time.perf_counter() - queued)
+            self.in_flight += 1
+            self.solves += 1
+            count("service_solves")
+            executor = self._executor
+            try:
+                with phase("service_solve"):
+                    result = await loop.run_in_executor(executor, _solve, bid, options)
+            except BrokenProcessPool as e:
+                # a worker died; the solve is not retried, as its bid may be the cause
+                self._replace_executor(executor)
+                if not future.done():
+                    future.set_exception(e)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.in_flight -= 1
+                self._pending.pop(key, None)
+                self._queue.task_done()
+
+    async def _bid(self, message, payload):
+        """Reads the bid of a request (binary payload, JSONL records or a fingerprint)
+        and returns it with its fingerprint."""
+        bid = message.get("bid")
+        if payload is None and isinstance(bid, str):
+            return self.lookup(bid), bid
+        if payload is None and not isinstance(bid, list):
+            raise ValueError("A request needs a bid: JSONL records, a fingerprint or a binary payload.")
+        return await asyncio.get_running_loop().run_in_executor(None, _parse, payload, bid)
+
+    async def handle(self, reader, writer):
+        """Serves one connection until the client closes it."""
+        lock = asyncio.Lock()
+        replies = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                start = time.perf_counter()
+                self.requests += 1
+                count("service_requests")
+                message = None
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError("A request must be a JSON object.")
+                    payload = None
+                    if message.get("format") == "binary":
+                        length = message.get("length")
+                        if type(length) != int or not 0 <= length <= self.max_payload:
+                            # the payload cannot be told apart from the next
+                            # requests, so the connection ends here
+                            error = ValueError("Payload length must be an int from 0 to %d."
+                                               % self.max_payload)
+                            await self._write(writer, lock, message, self._error(error), start)
+                            break
+                        payload = await reader.readexactly(length)
+                    op = message.get("op")
+                    if op == "solve":
+                        options = message.get("options") or {}
+                        if not isinstance(options, dict):
+                            raise ValueError("Options must be a JSON object.")
+                        bid, key = await self._bid(message, payload)
+                        future = await self._enqueue(bid, key, options)
+                        # the reply is written when the solve ends, meanwhile
+                        # the connection takes more requests
+                        task = asyncio.ensure_future(
+                            self._reply_later(message, future, start, writer, lock))
+                        replies.add(task)
+                        task.add_done_callback(replies.discard)
+                        continue
+                    elif op == "submit":
+                        bid, key = await self._bid(message, payload)
+                        reply = {"bid": self.submit(bid, key), "atoms": bid.size}
+                    elif op == "stats":
+                        reply = self.stats()
+                    else:
+                        raise ValueError("Unknown op %r, expected submit, solve or stats." % (op,))
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as e:
+                    reply = self._error(e)
+                await self._write(writer, lock, message, reply, start)
+            if replies:
+                await asyncio.gather(*replies, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def _reply_later(self, message, future, start, writer, lock):
+        # shielded: a client going away must not cancel a solve others wait for
+        try:
+            reply = await asyncio.shield(future)
+        except Exception as e:
+            reply = self._error(e)
+        await self._write(writer, lock, message, reply, start)
+
+    def _error(self, e):
+        self.errors += 1
+        count("service_errors")
+        return {"error": str(e) or type(e).__name__}
+
+    async def _write(self, writer, lock, message, reply, start):
+        if isinstance(message, dict) and "id" in message:
+            reply = dict(reply, id=message["id"])
+        async with lock:
+            writer.write(json.dumps(reply).encode('utf-8') + b"\n")
+            await writer.drain()
+        self.latencies.append(time.perf_counter() - start)
+
+
+class ServiceClient(object):
+    """Minimal client of an AuctionService, one request at a time.
+
+        client = await ServiceClient.connect(port=port)
+        winners = await client.call({"op": "solve", "bid": fingerprint})
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=None, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def call(self, message, payload=None):
+        """Sends a request, with the bytes of a binary bid as payload, and returns the reply."""
+        if payload is not None:
+            message = dict(message, format="binary", length=len(payload))
+        self.writer.write(json.dumps(message).encode('utf-8') + b"\n")
+        if payload is not None:
+            self.writer.write(payload)
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def _run(options):
+    service = AuctionService(options.workers, options.concurrency, options.max_queue,
+                             not options.threads, max_payload=options.max_payload)
+    server = await service.serve(options.host, options.port, options.unix)
+    for sock in server.sockets:
+        sys.stderr.write("Listening on %s\n" % (sock.getsockname(),))
+    try:
+        await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(args):
+    usage_msg = "Usage:  %prog [options]"
+    parser = OptionParser(usage=usage_msg)
+    parser.add_option("--host", dest="host", default="127.0.0.1",
+                      help="Set address to listen on")
+    parser.add_option("--port", dest="port", default=7878, type="int",
+                      help="Set TCP port to listen on")
+    parser.add_option("--unix", dest="unix", default=None,
+                      help="Listen on a Unix socket at this path instead")
+    parser.add_option("--workers", dest="workers", default=2, type="int",
+                      help="Set number of worker processes")
+    parser.add_option("--concurrency", dest="concurrency", default=None, type="int",
+                      help="Set number of solves running at a time (default: workers)")
+    parser.add_option("--max-queue", dest="max_queue", default=64, type="int",
+                      help="Set number of solves waiting before requests are held back")
+    parser.add_option("--max-payload", dest="max_payload", default=MAX_PAYLOAD, type="int",
+                      help="Set largest binary bid accepted, in bytes")
+    parser.add_option("--threads", dest="threads", action="store_true", default=False,
+                      help="Solve on threads instead of processes")
+    (options, args) = parser.parse_args(args[1:])
+    try:
+        asyncio.run(_run(options))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv)
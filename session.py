@@ -0,0 +1,189 @@
+from array import array
+from backends import NOT_SOLVED, OPTIMAL, PulpBackend, get_backend
+from itemuniverse import ItemUniverse
+from wdpmodel import WDPModel
+
+
+class WDPSession(object):
+    """Persistent OR winner determination problem that is updated in place.
+
+    Atoms are identified by the key add_atom returns. With engine "pulp" the
+    LpProblem lives across solves: adding, removing or re-pricing an atom
+    only touches that atom's variable, objective term and item rows, and the
+    previous solution (always still feasible) is handed to CBC as a MIP
+    start. With engine "bnb" the previous winners seed the incumbent.
+    "auto" is resolved once, without a model, by backends.get_backend, to
+    an engine that takes the previous winners as a start when there is one.
+    options (time_limit, gap, threads) configure the backend as in
+    WDPModel.solve; the SolveResult of the last solve is kept in result.
+
+    Changes that cannot improve on the current winners - removing or
+    lowering a losing atom, raising a winning one - skip the solver.
+    """
+
+    def __init__(self, bid=None, engine="auto", **options):
+        self.backend = get_backend(engine, start=True, **options)
+        self.result = None
+        self.universe = ItemUniverse()
+        self.atoms = {}
+        self.rows = {}
+        self.winning = set()
+        self.optimal = True
+        self.next_key = 0
+        self.problem = None
+        self.variables = {}
+        self.constraints = {}
+        self.retired = 0
+        if bid is not None:
+            for items, value in bid.to_OR().bids:
+                self.add_atom(items, value)
+
+    def __len__(self):
+        return len(self.atoms)
+
+    def _row_name(self, item):
+        return 'item{}'.format(item)
+
+    def _build(self):
+        """Builds the persistent pulp problem from the current atoms."""
+        from pulp import LpBinary, LpMaximize, LpProblem, LpVariable, lpSum
+        self.problem = LpProblem('winner_determination', LpMaximize)
+        self.variables = {}
+        self.constraints = {}
+        self.retired = 0
+        for key, (ids, value) in self.atoms.items():
+            z = LpVariable('z{}'.format(key), 0, 1, LpBinary)
+            z.setInitialValue(1 if key in self.winning else 0)
+            self.variables[key] = z
+        self.problem += lpSum(value * self.variables[key] for key, (ids, value) in self.atoms.items())
+        for item, keys in self.rows.items():
+            if len(keys) > 1:
+                self._add_row(item, keys)
+
+    def _add_row(self, item, keys):
+        from pulp import lpSum
+        constraint = lpSum(self.variables[k] for k in keys) <= 1
+        self.problem += constraint, self._row_name(item)
+        # rows are looked up here rather than in problem.constraints, which
+        # pulp no longer offers as a dict
+        self.constraints[item] = constraint
+
+    def add_atom(self, items, value):
+        """Adds an atom and returns its key."""
+        if type(value) != float and type(value) != int:
+            raise TypeError("Value must be of a numeric type.")
+        if type(items) != list:
+            raise TypeError("Items must be in a list.")
+        ids = array('i', dict.fromkeys(self.universe.intern(item) for item in items))
+
+        key = self.next_key
+        self.next_key += 1
+        self.atoms[key] = (ids, value)
+        if value > 0:
+            self.optimal = False
+
+        if self.problem is not None:
+            from pulp import LpBinary, LpVariable
+            z = LpVariable('z{}'.format(key), 0, 1, LpBinary)
+            z.setInitialValue(0)
+            self.variables[key] = z
+            self.problem.objective[z] = value
+        for item in ids:
+            keys = self.rows.setdefault(item, [])
+            keys.append(key)
+            if self.problem is None:
+                continue
+            # an item row is only needed once two atoms share the item
+            if item in self.constraints:
+                _expr(self.constraints[item])[z] = 1
+            elif len(keys) > 1:
+                self._add_row(item, keys)
+        return key
+
+    def remove_atom(self, key):
+        """Withdraws the atom with the given key."""
+        ids, value = self.atoms.pop(key)
+        if key in self.winning:
+            self.winning.discard(key)
+            self.optimal = False
+
+        # pulp cannot unregister a variable, so it is fixed to 0 instead and
+        # the problem is rebuilt once retired variables outnumber live ones
+        z = self.variables.pop(key, None)
+        if z is not None:
+            self.problem.objective[z] = 0
+            z.upBound = 0
+            z.setInitialValue(0)
+            self.retired += 1
+        for item in ids:
+            keys = self.rows[item]
+            keys.remove(key)
+            if not keys:
+                del self.rows[item]
+            # pulp cannot drop a row either; a row left with one atom is harmless
+            if z is not None and item in self.constraints:
+                del _expr(self.constraints[item])[z]
+        if self.retired > len(self.atoms):
+            # the pulp objects go with the problem; the next solve rebuilds all
+            self.problem = None
+            self.variables = {}
+            self.constraints = {}
+            self.retired = 0
+
+    def update_value(self, key, value):
+        """Changes the value of the atom with the given key."""
+        if type(value) != float and type(value) != int:
+            raise TypeError("Value must be of a numeric type.")
+        ids, old = self.atoms[key]
+        self.atoms[key] = (ids, value)
+        if key in self.winning:
+            if value < old:
+                self.optimal = False
+        elif value > old and value > 0:
+            self.optimal = False
+        if self.problem is not None:
+            self.problem.objective[self.variables[key]] = value
+
+    def solve(self):
+        """Re-solves if needed and returns the winners as (key, items, value) tuples."""
+        if not self.optimal:
+            if isinstance(self.backend, PulpBackend):
+                self._solve_pulp()
+            else:
+                self._solve_model()
+            # a solve cut short by a limit may still improve on a later call
+            self.optimal = self.result.status == OPTIMAL
+        return [(key, self.universe.name_list(self.atoms[key][0]), self.atoms[key][1])
+                for key in sorted(self.winning)]
+
+    def _solve_pulp(self):
+        if self.problem is None:
+            self._build()
+        # every variable still holds the last solution, which stays feasible
+        # after any change, so it is passed on as the MIP start
+        keys = list(self.variables)
+        self.result = self.backend.solve_problem(
+            self.problem, [self.variables[key] for key in keys], [self.atoms[key][1] for key in keys], True)
+        # without a solution the previous winners are still the best known
+        if self.result.status != NOT_SOLVED:
+            self.winning = set(keys[i] for i in self.result.selected)
+
+    def _solve_model(self):
+        keys = list(self.atoms)
+        item_ids = array('i')
+        offsets = array('q', [0])
+        values = []
+        for key in keys:
+            ids, value = self.atoms[key]
+            item_ids.extend(ids)
+            offsets.append(len(item_ids))
+            values.append(value)
+        position = dict((key, i) for i, key in enumerate(keys))
+        incumbent = [position[key] for key in self.winning]
+        self.result = self.backend.solve(WDPModel(item_ids, offsets, values), incumbent)
+        self.winning = set(keys[i] for i in self.result.selected)
+
+
+def _expr(constraint):
+    """Returns the affine expression of a pulp constraint (pulp >= 3 wraps it in .expr)."""
+    return getattr(constraint, 'expr', constraint)
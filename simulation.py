@@ -2,11 +2,12 @@ import logging
 import random
 import sys
 from optparse import OptionParser
+from batch import in_process, solve_many
+from metrics import collect
 from orlanguage import OR
 from orofxorlanguage import ORofXOR
 from xorlanguage import XOR
 from xoroforlanguage import XORofOR
-import time
 
 def configure_logging(loglevel):
     """Configure logging, as seen in pset 5."""
@@ -59,7 +60,7 @@ def make_orofxor_bid(total_items, num_bids, max_items, max_val, num_clauses):
 
     bids = []
     for i in range(num_clauses):
-        xor_clause = make_xor_bid(total_items, num_bids // num_clauses, max_items, max_val, num_clauses)
+        xor_clause = make_xor_bid(total_items, num_bids // num_clauses, max_items, max_val)
         bids.append(xor_clause)
     return ORofXOR(bids)
 
@@ -68,29 +69,40 @@ def make_xorofor_bid(total_items, num_bids, max_items, max_val, num_clauses):
 
     bids = []
     for i in range(num_clauses):
-        or_clause = make_or_bid(total_items, num_bids // num_clauses, max_items, max_val, num_clauses)
+        or_clause = make_or_bid(total_items, num_bids // num_clauses, max_items, max_val)
         bids.append(or_clause)
     return XORofOR(bids)
 
-def run_WDP_sim(options, language):
-    """Run simulation for the winner determination problem given options."""
-
-    sum_time = 0
-
+def make_generator(options):
+    """Seeds the generators; returns an InstanceGenerator if a distribution is set."""
+    if options.distribution is None:
+        random.seed(options.seed)
+        return None
+    from generator import InstanceGenerator
+    return InstanceGenerator(options.seed)
+
+def make_bid(options, language, generator=None):
+    """Generates a random bid of a language, with the generator if there is one."""
+    if generator is not None:
+        return generator.bid(language, options.distribution, options.num_items, options.num_bids,
+                             options.max_items, options.num_clauses, options.max_value)
+    items = create_items(options.num_items)
+    if language == 'OR':
+        return make_or_bid(items, options.num_bids, options.max_items, options.max_value)
+    elif language == 'XOR':
+        return make_xor_bid(items, options.num_bids, options.max_items, options.max_value)
+    elif language == 'XORofOR':
+        return make_xorofor_bid(items, options.num_bids, options.max_items, options.max_value, options.num_clauses)
+    return make_orofxor_bid(items, options.num_bids, options.max_items, options.max_value, options.num_clauses)
+
+def make_WDP_bids(options, language):
+    """Generates the bids of every iteration of the WDP simulation, logging each one."""
+
+    generator = make_generator(options)
     for i in range(1, options.iters + 1):
         logging.info("==== Iteration %d / %d. ====" % (i, options.iters))
-        items = create_items(options.num_items)
+        bid = make_bid(options, language, generator)
 
-        # Create bid based on language
-        if language == 'OR':
-            bid = make_or_bid(items, options.num_bids, options.max_items, options.max_value)
-        elif language == 'XOR':
-            bid = make_xor_bid(items, options.num_bids, options.max_items, options.max_value)
-        elif language == 'XORofOR':
-            bid = make_xorofor_bid(items, options.num_bids, options.max_items, options.max_value, options.num_clauses)
-        else:
-            bid = make_orofxor_bid(items, options.num_bids, options.max_items, options.max_value, options.num_clauses)
-        
         # Log each atom in the bid
         logging.info("Number of atoms: %d" % bid.size)
         logging.debug("List of all bids:")
@@ -102,42 +114,56 @@ def run_WDP_sim(options, language):
                 logging.debug("\t %s clause:" % bid.join)
                 for atom in clause.bids:
                     logging.debug("\t \t %s bid on items %s for value %d" % (clause.join, atom[0], atom[1]))
+        yield bid
 
-        # Solve WDP and time its duration
-        start_time = time.time()
-        winners = bid.WDP()
-        duration = time.time() - start_time
-
-        # Log the allocated winners
-        logging.debug("List of allocated winners:")
-        for winner in winners:
-            logging.debug("\t Bidder %d is allocated items %s with value %d." % winner)
-        logging.info("\t WDP took %s seconds." % duration)
-        sum_time += duration
+def run_WDP_sim(options, language):
+    """Run simulation for the winner determination problem given options."""
+
+    sum_time = 0
+
+    # Solve the WDPs on a pool of workers; results arrive as they finish.
+    # Threads suit pulp, whose solver runs in a subprocess anyway; the
+    # in-process engines need processes, whose phases are not collected
+    bids = make_WDP_bids(options, language)
+    processes = options.workers > 1 and in_process(options.engine)
+    with collect() as metrics:
+        for result in solve_many(bids, workers=options.workers, processes=processes,
+                                 engine=options.engine):
+            i = result.index + 1
+            if result.error is not None:
+                logging.error("\t Iteration %d failed: %r" % (i, result.error))
+                continue
+
+            # Log the allocated winners
+            logging.debug("List of allocated winners in iteration %d:" % i)
+            for winner in result.winners:
+                logging.debug("\t Bidder %d is allocated items %s with value %d." % winner)
+            logging.info("\t Iteration %d: WDP took %s seconds." % (i, result.seconds))
+            sum_time += result.seconds
     
     # Log the average duration of WDP
     avg_time = sum_time / float(options.iters)
     logging.info("\t ==== Summary ====")
     logging.info("\t Average WDP time: %f" % avg_time)
+    for name in sorted(metrics.timings):
+        logging.info("\t Total %s time: %f (%d calls)" % (name, metrics.timings[name], metrics.calls[name]))
+    for name in sorted(metrics.counters):
+        logging.info("\t Total %s: %d" % (name, metrics.counters[name]))
 
 def run_translate_sim(options, language):
     """Run simulation for the translation problem given options."""
 
+    generator = make_generator(options)
     for i in range(1, options.iters + 1):
             logging.info("==== Iteration %d / %d. ====" % (i, options.iters))
 
             # Create bids given the language
-            items = create_items(options.num_items)
-            if language == 'XOR':
-                bid = make_xor_bid(items, options.num_bids, options.max_items, options.max_value)
-            elif language == 'XORofOR':
-                bid = make_xorofor_bid(items, options.num_bids, options.max_items, options.max_value, options.num_clauses)
-            else:
-                bid = make_orofxor_bid(items, options.num_bids, options.max_items, options.max_value, options.num_clauses) 
+            bid = make_bid(options, language, generator)
 
             # Log original bids and some summary numbers               
             logging.info("\t Current number of atoms: %d" % bid.size)
             logging.info("\t Current number of items: %d" % len(bid.items))
+            logging.info("\t Current number of item occurrences: %d" % len(bid.item_ids))
             logging.debug("List of all bids:")
             if language == 'OR' or language == 'XOR':
                 for atom in bid.bids:
@@ -153,7 +179,10 @@ def run_translate_sim(options, language):
             # Log translated bids and some summary numbers
             logging.info("\t Translated number of atoms: %d" % translated.size)
             logging.info("\t Translated number of items: %d" % len(translated.items))
+            logging.info("\t Translated number of item occurrences: %d" % len(translated.item_ids))
             logging.info("\t Dummy items: %d" % (len(translated.items)-len(bid.items)))
+            if language == 'XORofOR':
+                logging.info("\t Dummy items with pairwise encoding: %d" % bid.pairwise_dummies())
             logging.debug("List of all bids:")
             for atom in translated.bids:
                 logging.debug("\t OR bid on items %s for value %d" % atom)
@@ -200,6 +229,23 @@ def main(args):
     parser.add_option("--iters",
                       dest="iters", default=1, type="int",
                       help="Number of different runs.")
+
+    parser.add_option("--workers",
+                      dest="workers", default=1, type="int",
+                      help="Number of WDPs solved at the same time.")
+
+    parser.add_option("--engine",
+                      dest="engine", default="auto",
+                      help="Set WDP engine: 'auto', 'pulp', 'bnb', 'dp' or 'highs'")
+
+    parser.add_option("--seed",
+                      dest="seed", default=None, type="int",
+                      help="Seed the bid generator so runs can be repeated")
+
+    parser.add_option("--distribution",
+                      dest="distribution", default=None,
+                      help="Generate bids in bulk from a distribution: 'uniform', 'regions', "
+                           "'arbitrary', 'paths' or 'scheduling'")
     
     (options, args) = parser.parse_args()
 
@@ -0,0 +1,69 @@
+import random
+from bisect import bisect_right
+from approx import approximate, item_bound, lp_relaxation
+from backends import FEASIBLE, OPTIMAL
+from orlanguage import OR
+from xorlanguage import XOR
+from xoroforlanguage import XORofOR
+
+
+def test_approx():
+    orbid = OR([(['D'], 1), (['A', 'B'], 3), (['B', 'C'], 2.5), (['A', 'C', 'D'], 3),
+                (['E', 'C', 'D'], 1.5), (['E', 'F'], 4.5), (['F'], 3.5), (['B', 'D'], 1)])
+    winners = orbid.WDP(mode="approx", budget_ms=1000)
+    assert winners == [(0, ['D'], 1), (1, ['A', 'B'], 3), (5, ['E', 'F'], 4.5)]
+    # the LP relaxation takes half of A-B, B-C, A-C-D and D
+    assert winners.status == FEASIBLE
+    assert winners.objective == 8.5 and abs(winners.bound - 9.25) < 1e-6
+    # with no time left the greedy pass still tries its first atoms, and the bound still holds
+    winners = orbid.WDP(mode="approx", budget_ms=0)
+    assert winners == [(0, ['D'], 1), (1, ['A', 'B'], 3), (6, ['F'], 3.5)]
+    assert winners.status == FEASIBLE and winners.bound >= 8.5
+    # a lone atom leaves presolve nothing to hand over
+    assert XOR([(['A'], 2)]).WDP(mode="approx") == [(0, ['A'], 2)]
+    assert XOR([(['A'], 2)]).WDP(warm_start=True) == [(0, ['A'], 2)]
+
+    # the greedy choice of X blocks Y and Z, local search swaps them in
+    result = approximate(OR([(['A', 'B'], 4), (['A'], 3), (['B'], 3)]).model(), budget_ms=1000)
+    assert result.selected == [1, 2] and result.objective == 6
+
+    # the LP relaxation of three pairwise conflicting pairs is worth 1.5 each
+    triangle = OR([(['A', 'B'], 2), (['B', 'C'], 2), (['A', 'C'], 2)]).model()
+    assert abs(lp_relaxation(triangle)[1] - 3) < 1e-6
+    result = approximate(triangle)
+    assert result.objective == 2 and result.status == FEASIBLE
+    assert abs(result.gap - 1 / 3.0) < 1e-6
+
+    # A and B are worth half of each atom, the group its best half: 0.5 + 1 + 1
+    assert item_bound(XOR([(['A'], 1), (['B'], 2), ([], -1)]).model(), [0, 1]) == 2.5
+
+    winners = XOR([(['A'], 1), (['B'], 2)]).WDP(mode="approx")
+    assert winners == [(1, ['B'], 2)] and winners.status == OPTIMAL
+    xoroforbid = XORofOR([OR([(['A'], 3), (['B'], 3)]), OR([(['A', 'B'], 5)])])
+    assert xoroforbid.WDP(mode="approx") == [(0, ['A'], 3), (1, ['B'], 3)]
+
+def test_approx_random():
+    rng = random.Random(1)
+    items = [chr(ord('A') + i) for i in range(10)]
+    for trial in range(10):
+        atoms = [(rng.sample(items, rng.randint(1, 4)), rng.randint(1, 20)) for i in range(25)]
+        orbid = OR(atoms)
+        exact = orbid.WDP(engine="bnb")
+        approx = orbid.WDP(mode="approx", budget_ms=200)
+        # a feasible allocation no better than the optimum, under a valid bound
+        used = [item for i, bundle, value in approx for item in bundle]
+        assert len(used) == len(set(used))
+        assert approx.objective <= exact.objective <= approx.bound + 1e-6
+        assert orbid.WDP(engine="bnb", warm_start=True).objective == exact.objective
+        assert orbid.WDP(engine="bnb", warm_start=True, time_limit=10).objective == exact.objective
+
+    # clause indicators are respected by every step, including the greedy pass alone
+    for trial in range(10):
+        clauses = [OR([(rng.sample(items, rng.randint(1, 3)), rng.randint(1, 20))
+                       for i in range(5)]) for c in range(4)]
+        bid = XORofOR(clauses)
+        exact = bid.WDP(engine="bnb").objective
+        for budget_ms in [0, 200]:
+            approx = bid.WDP(mode="approx", budget_ms=budget_ms)
+            assert len(set(bisect_right(bid.clause_offsets, i) for i, bundle, value in approx)) <= 1
+            assert 0 < approx.objective <= exact <= approx.bound + 1e-6
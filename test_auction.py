@@ -0,0 +1,60 @@
+import pytest
+from auction import Auction
+from orlanguage import OR
+from orofxorlanguage import ORofXOR
+from xorlanguage import XOR
+from xoroforlanguage import XORofOR
+
+
+def make_auction():
+    auction = Auction()
+    auction.add("alice", OR([(["A", "B"], 10), (["C"], 4)]))
+    auction.add("bob", XOR([(["B"], 7), (["C", "D"], 9)], auction.universe))
+    auction.add("carol", XORofOR([OR([(["A"], 3), (["D"], 3)]), OR([(["E"], 5)])]))
+    return auction
+
+def test_auction():
+    auction = make_auction()
+    assert len(auction) == 3
+    assert auction.size == 7
+
+    # items with the same name are shared across bidders
+    model = auction.model()
+    assert model.num_atoms == 7
+    assert model.num_indicators == 2
+    assert sorted(auction.universe.names) == ['A', 'B', 'C', 'D', 'E']
+
+    expected = {
+        "alice": [(0, ['A', 'B'], 10)],
+        "bob": [(1, ['C', 'D'], 9)],
+        "carol": [(2, ['E'], 5)],
+    }
+    assert auction.WDP() == expected
+    assert auction.WDP(engine="bnb") == expected
+
+    with pytest.raises(ValueError):
+        auction.add("alice", OR([(["E"], 1)]))
+
+def test_auction_groups():
+    auction = Auction()
+    auction.add(1, ORofXOR([XOR([(["A"], 5), (["B"], 6)]), XOR([(["C"], 1)])]))
+    auction.add(2, XOR([(["A"], 4), (["C"], 3)]))
+    expected = {1: [(1, ['B'], 6), (2, ['C'], 1)], 2: [(0, ['A'], 4)]}
+    assert auction.WDP() == expected
+    assert auction.WDP(engine="bnb") == expected
+
+def test_payments():
+    auction = make_auction()
+    expected = {"alice": 0, "bob": 4, "carol": 0}
+    assert auction.payments() == expected
+    assert sorted(auction.counterfactuals) == ["alice", "bob", "carol"]
+    assert auction.counterfactuals["bob"].objective == 19
+
+    # the model of WDP is reused, the counterfactual solves may run in processes
+    auction = make_auction()
+    auction.WDP(engine="bnb")
+    assert auction.payments(engine="bnb", workers=2) == expected
+
+    # a bidder added later is part of the next solve; carol now wins nothing
+    auction.add("dave", OR([(["E"], 8)]))
+    assert auction.payments(engine="bnb") == {"alice": 4, "bob": 7, "carol": 0, "dave": 5}
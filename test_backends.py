@@ -0,0 +1,75 @@
+import pytest
+from backends import FEASIBLE, OPTIMAL, Winners, available_backends, get_backend
+from orlanguage import OR
+from xoroforlanguage import XORofOR
+
+
+def make_bid():
+    return OR([(['D'], 1), (['A', 'B'], 3), (['B', 'C'], 2.5), (['A', 'C', 'D'], 3),
+               (['E', 'C', 'D'], 1.5), (['E', 'F'], 4.5), (['F'], 3.5), (['B', 'D'], 1)])
+
+def test_backends():
+    assert available_backends()[:3] == ["auto", "pulp", "bnb"]
+    with pytest.raises(ValueError):
+        get_backend("simplex")
+
+    orbid = make_bid()
+    for engine in available_backends():
+        winners = orbid.WDP(engine=engine, time_limit=10, gap=0, threads=1)
+        assert isinstance(winners, Winners)
+        assert winners == [(0, ['D'], 1), (1, ['A', 'B'], 3), (5, ['E', 'F'], 4.5)]
+        assert winners.status == OPTIMAL
+        assert winners.objective == winners.bound == 8.5
+        assert winners.gap == 0
+
+def test_bnb_limits():
+    # every atom is worth 1 per item, so the bound is loose and a gap stops early
+    atoms = [([chr(ord('A') + (i + k) % 12) for k in range(3)], 3) for i in range(12)]
+    atoms += [([chr(ord('A') + i), chr(ord('A') + (i + 5) % 12)], 2) for i in range(12)]
+    winners = OR(atoms).WDP(engine="bnb", gap=0.5)
+    assert winners.status == FEASIBLE
+    assert winners.objective <= 12 <= winners.bound
+    assert winners.gap <= 0.5
+
+    xoroforbid = XORofOR([OR(atoms[:12]), OR(atoms[12:])])
+    winners = xoroforbid.WDP(engine="bnb", time_limit=0)
+    assert winners.objective <= winners.bound
+    assert xoroforbid.WDP(engine="bnb").objective == 12
+
+    for gap in (-0.1, 1.0, 2.0):
+        with pytest.raises(ValueError):
+            OR(atoms).WDP(engine="bnb", gap=gap)
+
+def test_matrix_model(tmp_path):
+    pytest.importorskip("scipy")
+    from matrixmodel import constraint_matrix
+    from pulp import LpProblem, PULP_CBC_CMD, value
+
+    xoroforbid = XORofOR([OR([(['A', 'B'], 10), (['C'], 12)]), OR([(['B', 'C'], 15), (['D'], 8)])])
+    model = xoroforbid.model()
+    matrix, rhs = constraint_matrix(model)
+    # items B and C are shared, then four atom-indicator links and one indicator row
+    assert matrix.shape == (7, 6)
+    assert list(rhs) == [1, 1, 0, 0, 0, 0, 1]
+    assert xoroforbid.WDP(engine="highs") == [(2, ['B', 'C'], 15), (3, ['D'], 8)]
+
+    path = str(tmp_path / "wdp.mps")
+    model.write_mps(path)
+    variables, problem = LpProblem.fromMPS(path)
+    problem.solve(PULP_CBC_CMD(msg=False))
+    assert value(problem.objective) == -23
+    assert [variables['z%d' % i].value() for i in range(1, 5)] == [0, 0, 1, 1]
+
+def test_empty_model():
+    # presolve settles a lone atom, leaving no variables for the engine
+    for engine in available_backends():
+        winners = OR([(['B'], 7)]).WDP(engine=engine)
+        assert winners == [(0, ['B'], 7)]
+        assert winners.status == OPTIMAL
+        assert OR([]).WDP(engine=engine) == []
+
+def test_bnb_deep():
+    # one branch selects every atom of the first clause, deeper than the recursion limit
+    xoroforbid = XORofOR([OR([(['i%d' % k], 1) for k in range(1500)]), OR([(['x'], 5)])])
+    winners = xoroforbid.WDP(engine="bnb")
+    assert winners.status == OPTIMAL and winners.objective == 1500
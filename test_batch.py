@@ -0,0 +1,47 @@
+from batch import in_process, solve_many
+from orlanguage import OR
+from xorlanguage import XOR
+
+
+class BrokenBid(object):
+    def WDP(self, **options):
+        raise RuntimeError("solver crashed")
+
+def test_solve_many():
+    bids = [OR([(['A'], 2), (['A', 'B'], 3)]), BrokenBid(), XOR([(['A'], 2), (['B'], 5)])]
+    results = sorted(solve_many(bids, workers=2, engine="bnb"), key=lambda r: r.index)
+    assert [r.index for r in results] == [0, 1, 2]
+    assert results[0].winners == [(1, ['A', 'B'], 3)]
+    assert isinstance(results[1].error, RuntimeError)
+    assert results[1].winners is None
+    assert results[2].winners == [(1, ['B'], 5)]
+    assert all(r.seconds >= 0 for r in results)
+
+def test_solve_many_bounded():
+    # the input is only read as fast as results are consumed
+    taken = []
+    def bids():
+        for i in range(20):
+            taken.append(i)
+            yield OR([(['A'], i + 1)])
+    results = solve_many(bids(), workers=1, max_in_flight=3, engine="bnb")
+    first = next(results)
+    assert len(taken) <= 4
+    rest = list(results)
+    assert len(rest) == 19
+    assert sorted(r.winners[0][2] for r in rest + [first]) == list(range(1, 21))
+
+def test_solve_many_processes():
+    bids = [OR([(['A'], v), (['A', 'B'], 3)]) for v in range(1, 6)]
+    results = sorted(solve_many(bids, workers=2, processes=True, engine="bnb"), key=lambda r: r.index)
+    assert [r.winners.objective for r in results] == [3, 3, 3, 4, 5]
+    assert in_process("auto") and in_process("dp") and not in_process("pulp")
+
+def test_solve_many_unpicklable():
+    # a bid that never reaches the worker still gets its result
+    class LocalBid(BrokenBid):
+        pass
+    bids = [OR([(['A'], 1)]), LocalBid()]
+    results = sorted(solve_many(bids, workers=2, processes=True, engine="bnb"), key=lambda r: r.index)
+    assert results[0].winners.objective == 1
+    assert results[1].winners is None and results[1].error is not None
@@ -0,0 +1,38 @@
+import csv
+from benchmark import compare, load_json, main, percentile, run, save_csv, save_json
+
+
+def test_percentile():
+    assert percentile([3, 1, 2, 4], 50) == 2.5
+    assert percentile([5], 99) == 5
+    assert percentile(range(101), 90) == 90
+
+def test_benchmark(tmp_path):
+    grid = {'language': ['OR', 'XORofOR'], 'action': ['WDP', 'translate'], 'num_items': [6],
+            'num_bids': [8], 'max_items': [3], 'num_clauses': [2]}
+    results = run(grid, repeats=3, warmups=1, engine="bnb")
+    # OR is not translated
+    assert [(r['language'], r['action']) for r in results] == \
+        [('OR', 'WDP'), ('XORofOR', 'WDP'), ('XORofOR', 'translate')]
+    assert all(r['min'] <= r['p50'] <= r['p90'] <= r['max'] for r in results)
+
+    save_json(results, str(tmp_path / "base.json"))
+    save_csv(results, str(tmp_path / "base.csv"))
+    assert load_json(str(tmp_path / "base.json")) == results
+    with open(str(tmp_path / "base.csv")) as f:
+        assert len(list(csv.DictReader(f))) == 3
+
+    slower = [dict(r, p50=r['p50'] * 2 + 0.01) for r in results]
+    assert compare(results, results) == []
+    regressions = compare(results, slower)
+    assert len(regressions) == 3 and regressions[0][1] == results[0]['p50']
+
+def test_compare_zero_baseline(tmp_path, capsys):
+    case = {'language': 'XOR', 'action': 'WDP', 'engine': 'bnb', 'num_items': 6,
+            'num_bids': 8, 'max_items': 3, 'num_clauses': 2}
+    save_json([dict(case, p50=0.0)], str(tmp_path / "base.json"))
+    save_json([dict(case, p50=0.5)], str(tmp_path / "current.json"))
+    assert main(["benchmark", "compare", str(tmp_path / "base.json"),
+                 str(tmp_path / "current.json")]) == 1
+    out = capsys.readouterr().out
+    assert "0.000000s -> 0.500000s (n/a)" in out and "1 regressions" in out
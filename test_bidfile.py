@@ -0,0 +1,97 @@
+import io
+import json
+import pytest
+from bidfile import BidFile, dumps, export_jsonl, import_jsonl, load, loads, main, save, to_records
+from bidtree import BidTree, ORNode, XORNode
+from orlanguage import OR
+from orofxorlanguage import ORofXOR
+from xorlanguage import XOR
+from xoroforlanguage import XORofOR
+
+
+def make_bids():
+    bid1 = (["A", "B"], 10)
+    bid2 = (["C"], 12.5)
+    bid3 = (["B", "C"], 15)
+    bid4 = (["D"], 4)
+    return [OR([bid1, bid2, bid3]), XOR([bid1, bid3]),
+            ORofXOR([XOR([bid1, bid2]), XOR([]), XOR([bid3, bid4])]),
+            XORofOR([OR([bid1]), OR([bid3, bid4]), OR([])])]
+
+def test_binary_file(tmp_path):
+    for k, bid in enumerate(make_bids()):
+        path = str(tmp_path / ("bid%d.bids" % k))
+        save(bid, path)
+        loaded = load(path)
+        assert type(loaded) == type(bid)
+        assert loaded.canonical() == bid.canonical()
+        assert loaded.WDP(engine="bnb") == bid.WDP(engine="bnb")
+
+    # the sections are used in place
+    # a bid of whole numbers keeps them as ints, and so does a mixed one
+    assert load(str(tmp_path / "bid1.bids")).bids == [(["A", "B"], 10), (["B", "C"], 15)]
+    assert [str(value) for items, value in load(str(tmp_path / "bid0.bids")).bids] == \
+        ["10", "12.5", "15"]
+
+    # nested bids without clauses
+    for bid in [XORofOR([]), ORofXOR([])]:
+        save(bid, str(tmp_path / "empty.bids"))
+        assert load(str(tmp_path / "empty.bids")).canonical() == bid.canonical()
+    with BidFile(str(tmp_path / "bid2.bids")) as f:
+        assert f.names() == ["A", "B", "C", "D"]
+        assert list(f.item_ids) == [0, 1, 2, 1, 2, 3]
+        assert list(f.clause_offsets) == [0, 2, 2, 4]
+
+    # the same bytes travel without a file
+    data = dumps(make_bids()[3])
+    assert data == (tmp_path / "bid3.bids").read_bytes()
+    assert loads(data).canonical() == make_bids()[3].canonical()
+    with pytest.raises(ValueError):
+        loads(data[:-8])
+
+    # an item id out of range, a first offset past 0 and clauses ending
+    # short of the atoms are rejected rather than built into a bid
+    names = data.index(b"ABCD")
+    for position, value in [(names + 8, 7), (names + 32, 9), (len(data) - 8, 1)]:
+        broken = bytearray(data)
+        broken[position] = value
+        with pytest.raises(ValueError):
+            loads(bytes(broken))
+
+    (tmp_path / "junk.bids").write_bytes(b"not a bid file at all, but long enough for a header")
+    with pytest.raises(ValueError):
+        load(str(tmp_path / "junk.bids"))
+
+def test_jsonl():
+    for bid in make_bids():
+        out = io.StringIO()
+        export_jsonl(bid, out)
+        loaded = import_jsonl(io.StringIO(out.getvalue()))
+        assert type(loaded) == type(bid)
+        assert loaded.canonical() == bid.canonical()
+    with pytest.raises(ValueError):
+        import_jsonl(io.StringIO('{"language": "ORofXOR"}\n'
+                                 '{"items": ["A"], "value": 1, "clause": 1}\n'
+                                 '{"items": ["B"], "value": 1, "clause": 0}\n'))
+
+def test_bid_tree_not_serialized():
+    tree = BidTree(ORNode([(["A"], 1), XORNode([(["B"], 2), (["C"], 3)])]))
+    with pytest.raises(TypeError):
+        dumps(tree)
+    with pytest.raises(TypeError):
+        list(to_records(tree))
+
+def test_cli(tmp_path, capsys):
+    path = str(tmp_path / "bid.jsonl")
+    with open(path, 'w') as f:
+        export_jsonl(make_bids()[2], f)
+    main(["bidfile.py", "convert", path, str(tmp_path / "bid.bids")])
+    main(["bidfile.py", "solve", "--engine", "bnb", str(tmp_path / "bid.bids")])
+    result = json.loads(capsys.readouterr().out)
+    assert result["status"] == "optimal" and result["objective"] == 16.5
+    assert [w["index"] for w in result["winners"]] == [1, 3]
+
+    main(["bidfile.py", "translate", path])
+    lines = capsys.readouterr().out.splitlines()
+    assert json.loads(lines[0]) == {"language": "OR"}
+    assert json.loads(lines[1]) == {"items": ["A", "B", "d"], "value": 10}
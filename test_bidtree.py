@@ -0,0 +1,96 @@
+import itertools
+import random
+import pytest
+from bidtree import BidTree, ORNode, XORNode
+from orlanguage import OR
+from orofxorlanguage import ORofXOR
+from xorlanguage import XOR
+from xoroforlanguage import XORofOR
+
+
+def brute_force(tree):
+    """Best value over every set of atoms that respects the items and XOR nodes."""
+    chains = []
+    for i in range(tree.size):
+        chain, entry, v = [], i, tree.atom_parents[i]
+        while v >= 0:
+            chain.append((v, entry))
+            entry, v = ~v, tree.parents[v]
+        chains.append(chain)
+    best = 0
+    for chosen in itertools.product([0, 1], repeat=tree.size):
+        selected = [i for i in range(tree.size) if chosen[i]]
+        items = [item for i in selected for item in tree.atom_ids(i)]
+        active = {}
+        if len(items) == len(set(items)) and all(
+                active.setdefault(v, entry) == entry
+                for i in selected for v, entry in chains[i] if tree.kinds[v] == 1):
+            best = max(best, sum(tree.values[i] for i in selected))
+    return best
+
+def test_bid_tree():
+    tree = BidTree(XORNode([ORNode([(['A'], 3), XORNode([(['B'], 2), (['C'], 4)])]),
+                            (['A', 'B'], 6)]))
+    assert str(tree) == "((['A'], 3) OR ((['B'], 2) XOR (['C'], 4))) XOR (['A', 'B'], 6)"
+    assert tree.bids == [(['A'], 3), (['B'], 2), (['C'], 4), (['A', 'B'], 6)]
+    # one indicator for the OR node, no dummy items
+    model = tree.model()
+    assert model.num_indicators == 1
+    assert model.groups == [([4, 3], None), ([1, 2], 4), ([0], 4)]
+    for engine in ["pulp", "bnb"]:
+        assert tree.WDP(engine=engine) == [(0, ['A'], 3), (2, ['C'], 4)]
+    assert tree.WDP(engine="bnb", translate=True).objective == 7
+    assert tree.canonical() != BidTree(ORNode(tree.bids)).canonical()
+    # the flat constructors of AtomicBid have no tree to give
+    with pytest.raises(ValueError):
+        BidTree.from_iter(tree.bids)
+    with pytest.raises(ValueError):
+        BidTree.from_arrays([0, 1], [0, 1, 2], [1, 2])
+
+    # the fixed languages are trees of depth two at most
+    for bid in [OR([(['A'], 1), (['B'], 2)]), XOR([(['A'], 1), (['B'], 2)]),
+                ORofXOR([XOR([(['A'], 3), (['B'], 1)]), XOR([(['C'], 5), (['A'], 4)])]),
+                XORofOR([OR([(['A'], 3), (['B'], 1)]), OR([(['C'], 5)])])]:
+        tree = BidTree(bid)
+        assert tree.bids == [bid.atom(i) for i in range(bid.size)]
+        assert tree.WDP(engine="bnb").objective == bid.WDP(engine="bnb").objective
+
+    with pytest.raises(TypeError):
+        BidTree([(['A'], 1)])
+    with pytest.raises(TypeError):
+        BidTree(ORNode([(['A'], "one")]))
+    with pytest.raises(TypeError):
+        BidTree(ORNode([(['A'], 1), None, (['B'], 2)]))
+
+def test_random_trees():
+    rng = random.Random(0)
+    items = list("ABCDEFG")
+
+    def node(depth):
+        children = []
+        for k in range(rng.randint(1, 4)):
+            if depth < 3 and rng.random() < 0.4:
+                children.append(node(depth + 1))
+            else:
+                children.append((rng.sample(items, rng.randint(1, 3)), rng.randint(1, 9)))
+        return (ORNode if rng.random() < 0.5 else XORNode)(children)
+
+    for trial in range(60):
+        tree = BidTree(node(0))
+        if tree.size > 12:
+            continue
+        best = brute_force(tree)
+        assert tree.WDP(engine="bnb").objective == best
+        assert tree.to_OR().WDP(engine="bnb").objective == best
+
+def test_deep_tree():
+    pytest.importorskip("scipy")
+    # alternating OR and XOR nodes, far deeper than the recursion limit
+    node = (['z'], 1)
+    for depth in range(1500):
+        node = (ORNode if depth % 2 else XORNode)([node, (['i%d' % depth], 1)])
+    tree = BidTree(ORNode([node]))
+    model = tree.model()
+    # an indicator per OR node below the top, a row per XOR node and per atom under an indicator
+    assert model.num_indicators == 749 and len(model.groups) == 750 + 749
+    assert tree.WDP(engine="highs").objective == 751
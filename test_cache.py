@@ -0,0 +1,63 @@
+from cache import BidCache
+from orlanguage import OR
+from orofxorlanguage import ORofXOR
+from xorlanguage import XOR
+from xoroforlanguage import XORofOR
+
+
+def test_fingerprint():
+    orbid = OR([(['A', 'B'], 3), (['C'], 2)])
+    assert orbid.fingerprint() == OR([(['B', 'A'], 3.0), (['C'], 2)]).fingerprint()
+    assert orbid.fingerprint() != OR([(['C'], 2), (['A', 'B'], 3)]).fingerprint()
+    assert orbid.fingerprint() != XOR([(['A', 'B'], 3), (['C'], 2)]).fingerprint()
+    # the same atoms split into clauses differently are different bids
+    xor1, xor2 = XOR([(['A'], 1)]), XOR([(['B'], 2)])
+    assert ORofXOR([xor1, xor2]).fingerprint() != ORofXOR([XOR([(['A'], 1), (['B'], 2)])]).fingerprint()
+    assert XORofOR([OR([(['A'], 1)])]).fingerprint() != ORofXOR([XOR([(['A'], 1)])]).fingerprint()
+
+def test_cache(tmp_path):
+    cache = BidCache(path=str(tmp_path))
+    xorbid = XOR([(['A', 'B'], 3), (['B'], 2)])
+    assert str(cache.to_OR(xorbid)) == str(xorbid.to_OR())
+    assert cache.WDP(xorbid, engine="bnb") == [(0, ['A', 'B'], 3)]
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    # a reordered bid hits, but reports its own item order
+    winners = cache.WDP(XOR([(['B', 'A'], 3), (['B'], 2)]), engine="bnb")
+    assert winners == [(0, ['B', 'A'], 3)] and winners.objective == 3
+    assert cache.hits == 1
+    cache.WDP(xorbid, engine="pulp")
+    assert cache.misses == 3
+
+    # a new cache on the same directory finds the entries on disk
+    other = BidCache(path=str(tmp_path))
+    assert other.WDP(xorbid, engine="bnb") == [(0, ['A', 'B'], 3)]
+    assert (other.disk_hits, other.misses) == (1, 0)
+    other.invalidate(xorbid)
+    assert len(other) == 0 and not list(tmp_path.iterdir())
+
+def test_cache_limits():
+    cache = BidCache(max_entries=2)
+    bids = [OR([(['A'], i + 1)]) for i in range(3)]
+    for bid in bids:
+        cache.WDP(bid, engine="bnb")
+    assert len(cache) == 2 and cache.evictions == 1
+    cache.WDP(bids[0], engine="bnb")
+    assert cache.misses == 4
+    cache.invalidate()
+    assert len(cache) == 0 and cache.nbytes == 0
+
+def test_cache_exact():
+    cache = BidCache()
+    # translations keep the item order of the bid asking for them
+    assert cache.to_OR(XOR([(['A', 'B'], 1)])).bids == [(['A', 'B', 'd'], 1)]
+    assert cache.to_OR(XOR([(['B', 'A'], 1)])).bids == [(['B', 'A', 'd'], 1)]
+    assert cache.to_OR(XOR([(['A', 'B'], 1)])).bids == [(['A', 'B', 'd'], 1)]
+    assert cache.hits == 1
+
+    # a solve stopped by its limit is not kept
+    atoms = [([chr(ord('A') + (i + k) % 12) for k in range(3)], 3) for i in range(12)]
+    orbid = OR(atoms)
+    assert cache.WDP(orbid, engine="bnb", gap=0.5).status != "optimal"
+    cache.WDP(orbid, engine="bnb", gap=0.5)
+    assert cache.hits == 1 and len(cache) == 2
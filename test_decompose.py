@@ -0,0 +1,43 @@
+from decompose import components, submodel
+from orlanguage import OR
+from xoroforlanguage import XORofOR
+
+
+def test_components():
+    orbid = OR([(['A', 'B'], 3), (['C'], 2), (['B', 'D'], 4), (['C', 'E'], 5), (['F'], 1)])
+    assert components(orbid.model()) == [([0, 2], []), ([1, 3], []), ([4], [])]
+
+    # clause indicators tie the atoms of an XORofOR together
+    xoroforbid = XORofOR([OR([(['A'], 3), (['B'], 1)]), OR([(['C'], 5)])])
+    model = xoroforbid.model()
+    assert components(model) == [([0, 1, 2], [3, 4])]
+    sub = submodel(model, [0, 1, 2], [3, 4])
+    assert sub.num_indicators == 2
+    assert sub.groups == [([0], 3), ([1], 3), ([2], 4), ([3, 4], None)]
+
+def test_parallel_WDP():
+    # twenty copies of a small conflicting block over disjoint items
+    atoms = []
+    for block in range(20):
+        a, b, c, d = ["%s%d" % (x, block) for x in "ABCD"]
+        atoms += [([a, b], 3), ([b, c], 4), ([c, d], 3), ([a], 1), ([d], 1)] * 4
+        atoms += [([a, b, c, d], 7 + block % 2)]
+    orbid = OR(atoms)
+    winners = orbid.WDP(presolve=False, workers=2)
+    assert winners == orbid.WDP(presolve=False, workers=1)
+    assert winners.objective == 20 * 7 + 10
+
+def test_shared_time_limit():
+    import random
+    import time
+    from backends import FEASIBLE
+    # eight components too hard to finish, all under one quarter second
+    rng = random.Random(0)
+    atoms = []
+    for c in range(8):
+        items = ['%s%d' % (chr(ord('A') + i), c) for i in range(30)]
+        atoms += [(rng.sample(items, rng.randint(2, 6)), rng.randint(1, 30)) for k in range(120)]
+    start = time.perf_counter()
+    winners = OR(atoms).WDP(engine="bnb", time_limit=0.25, presolve=False)
+    assert time.perf_counter() - start < 1.0
+    assert winners.status == FEASIBLE
@@ -0,0 +1,55 @@
+import pytest
+from auction import Auction
+from backends import get_backend, has_highs, has_pulp
+from bidtree import BidTree, ORNode, XORNode
+from dp import SubsetDP
+from generator import InstanceGenerator
+from orlanguage import OR
+from session import WDPSession
+from xorlanguage import XOR
+
+
+def test_dp():
+    generator = InstanceGenerator(7)
+    for language in ["OR", "XOR", "ORofXOR", "XORofOR"]:
+        for k in range(5):
+            bid = generator.bid(language, "uniform", 8, 25, 4, 3)
+            model = bid.model()
+            winners = bid.WDP(engine="dp", presolve=False)
+            assert winners.status == "optimal"
+            assert winners.objective == bid.WDP(engine="bnb").objective
+            assert winners == [(i,) + bid.atom(i) for i in winners.result.selected]
+            assert SubsetDP(model).supported()
+
+def test_auto():
+    orbid = OR([(["A"], 2), (["A", "B"], 3), (["B", "C"], 2), (["D"], -1)])
+    winners = orbid.WDP()
+    assert winners == [(0, ['A'], 2), (2, ['B', 'C'], 2)]
+    assert winners.result.backend == "dp"
+
+    # too many items for auto, and a shape dp does not take
+    wide = OR([([str(k), str(k + 1)], 1) for k in range(40)])
+    assert wide.WDP().result.backend == ("highs" if has_highs() else "pulp")
+    # get_backend resolves "auto" itself, without a model as for a session
+    assert get_backend("auto", model=orbid.model()).name == "dp"
+    assert get_backend("auto", model=wide.model()).name == get_backend("auto").name
+    # a start goes to an engine that takes one, and is dropped by those that do not
+    started = get_backend("auto", model=wide.model(), start=True)
+    assert started.takes_start or not has_pulp()
+    assert not get_backend("highs").takes_start and not get_backend("dp").takes_start
+    if has_highs():
+        assert wide.model().solve("highs", incumbent=[0], warm_start=True).objective == 20
+    assert WDPSession(orbid).solve() == [(0, ['A'], 2), (2, ['B', 'C'], 2)]
+    tree = BidTree(XORNode([ORNode([(["A"], 3), XORNode([(["B"], 2), (["C"], 4)])]),
+                            (["A", "B"], 6)]))
+    assert not SubsetDP(tree.model()).supported()
+    assert tree.WDP().objective == 7
+    with pytest.raises(ValueError):
+        tree.WDP(engine="dp")
+
+def test_auction_dp():
+    auction = Auction()
+    auction.add("alice", OR([(["A", "B"], 10), (["C"], 4)]))
+    auction.add("bob", XOR([(["B"], 7), (["C", "D"], 9)], auction.universe))
+    assert auction.WDP(engine="dp") == auction.WDP(engine="bnb")
+    assert auction.payments(engine="dp") == {"alice": 0, "bob": 4}
@@ -0,0 +1,55 @@
+import time
+import pytest
+from generator import DISTRIBUTIONS, InstanceGenerator, main
+from bidfile import load
+from orofxorlanguage import ORofXOR
+from xoroforlanguage import XORofOR
+
+
+def test_seeded():
+    for distribution in DISTRIBUTIONS:
+        first = InstanceGenerator(7).bid('XORofOR', distribution, 30, 40, 5, 4)
+        second = InstanceGenerator(7).bid('XORofOR', distribution, 30, 40, 5, 4)
+        assert first.canonical() == second.canonical()
+    assert InstanceGenerator(7).bid('OR', 'uniform', 30, 40, 5).canonical() != \
+        InstanceGenerator(8).bid('OR', 'uniform', 30, 40, 5).canonical()
+
+def test_distributions():
+    for distribution in DISTRIBUTIONS:
+        for num_items in [1, 3, 50]:
+            bid = InstanceGenerator(1).bid('OR', distribution, num_items, 200, 6)
+            assert bid.size == 200
+            for items, value in bid.bids:
+                assert 1 <= len(items) <= 6
+                assert len(set(items)) == len(items)
+                assert type(value) == int and value >= 1
+            assert len(bid.items) <= num_items
+
+def test_languages():
+    bid = InstanceGenerator(2).bid('ORofXOR', 'regions', 10, 9, 3, num_clauses=3)
+    assert type(bid) == ORofXOR
+    assert [clause.size for clause in bid.bids] == [3, 3, 3]
+    assert type(InstanceGenerator(2).bid('XORofOR', 'paths', 10, 9, 3, 2)) == XORofOR
+    assert bid.WDP(engine="bnb").objective > 0
+    with pytest.raises(ValueError):
+        InstanceGenerator(2).bid('AND', 'uniform', 10, 9, 3)
+    with pytest.raises(ValueError):
+        InstanceGenerator(2).bid('OR', 'gaussian', 10, 9, 3)
+    with pytest.raises(ValueError):
+        InstanceGenerator(2).bid('XORofOR', 'uniform', 10, 9, 3, num_clauses=0)
+    # bids only carry the items they use
+    bid = InstanceGenerator(2).bid('OR', 'uniform', 1000, 3, 2)
+    assert len(bid.universe) == len(bid.items) <= 6
+
+def test_main(tmp_path):
+    path = str(tmp_path / "bid.bids")
+    main(["generator.py", "--seed", "4", "--language", "XORofOR", "--distribution",
+          "scheduling", "--num-bids", "12", "--num-clauses", "3", path])
+    bid = load(path)
+    assert bid.canonical() == InstanceGenerator(4).bid('XORofOR', 'scheduling', 10, 12, 5, 3).canonical()
+
+def test_million_atoms():
+    start = time.perf_counter()
+    bid = InstanceGenerator(0).bid('OR', 'uniform', 1000, 1000000, 5)
+    assert bid.size == 1000000
+    assert time.perf_counter() - start < 10
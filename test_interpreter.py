@@ -0,0 +1,48 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from biddinglanguagesinterpreter import run_script
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# seconds a one-off scripted solve may take from a cold start
+COLD_START_BUDGET = 1.5
+
+SCRIPT = """
+# a bid per language, then solve and translate them
+{"op": "bid", "name": "b1", "language": "XOR", "atoms": [[["A", "B"], 10], [["C"], 12]]}
+{"op": "bid", "name": "b2", "language": "XORofOR", "clauses": [[[["A", "B"], 10], [["C"], 12]], [[["B", "C"], 15]]]}
+{"op": "solve", "name": "b1", "engine": "bnb"}
+{"op": "solve", "name": "b2", "engine": "bnb"}
+{"op": "translate", "name": "b1"}
+{"op": "solve", "name": "b3"}
+"""
+
+def test_script_mode():
+    out = io.StringIO()
+    assert run_script(io.StringIO(SCRIPT), out) == 1
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert results[0]["bid"] == "(['A', 'B'], 10) XOR (['C'], 12)"
+    assert results[2]["winners"] == [{"index": 1, "items": ["C"], "value": 12}]
+    assert results[3]["objective"] == 22 and results[3]["status"] == "optimal"
+    assert results[4]["as"] == "b1_as_OR"
+    assert results[4]["bid"] == "(['A', 'B', 'd'], 10) OR (['C', 'd'], 12)"
+    assert results[5]["line"] == 8 and "b3" in results[5]["error"]
+
+def test_cold_start():
+    # neither the solvers nor the prompt toolkit load until they are used
+    code = ("import sys, biddinglanguagesinterpreter; "
+            "print([m for m in ('pulp', 'scipy', 'numpy', 'PyInquirer') if m in sys.modules])")
+    loaded = subprocess.check_output([sys.executable, "-c", code], cwd=HERE)
+    assert json.loads(loaded.decode().replace("'", '"')) == []
+
+    command = '{"op": "bid", "name": "b", "language": "OR", "atoms": [[["A"], 1]]}\n' \
+              '{"op": "solve", "name": "b", "engine": "bnb"}\n'
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "biddinglanguagesinterpreter.py", "--script", "-"],
+                            input=command.encode(), cwd=HERE, stdout=subprocess.PIPE, check=True).stdout
+    assert time.perf_counter() - start < COLD_START_BUDGET
+    assert json.loads(output.decode().splitlines()[1])["objective"] == 1
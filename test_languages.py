@@ -1,8 +1,10 @@
 import pytest
+from array import array
 from orlanguage import OR
 from orofxorlanguage import ORofXOR
 from xorlanguage import XOR
 from xoroforlanguage import XORofOR
+from itemuniverse import ItemUniverse
 
 
 def test_OR():
@@ -107,3 +109,152 @@ def test_XORofOR():
     assert str(orbid) == "(['A', 'B', 'd', 'd0'], 10) OR (['C', 'd1', 'd2'], 12) OR (['D', 'E', 'd', 'd1'], 10) OR (['F', 'd0', 'd2'], 12)"
     assert orbid.size == 4
     assert len(orbid.items) == 10
+
+def test_item_universe():
+    universe = ItemUniverse()
+    xorbid1 = XOR([(["A", "B"], 10), (["B", "B", "C"], 12)], universe)
+    xorbid2 = XOR([(["C", "D"], 10)], universe)
+    assert universe.names == ['A', 'B', 'C', 'D']
+    assert list(xorbid1.atom_ids(1)) == [1, 2]
+    assert xorbid1.bids == [(['A', 'B'], 10), (['B', 'C'], 12)]
+    assert not hasattr(xorbid1, '__dict__')
+
+    # clauses sharing a universe keep their ids, others are re-interned
+    orofxorbid = ORofXOR([xorbid1, xorbid2])
+    assert orofxorbid.universe is universe
+    assert list(orofxorbid.item_ids) == [0, 1, 1, 2, 2, 3]
+    orofxorbid = ORofXOR([xorbid2, XOR([(["E"], 1)])])
+    assert orofxorbid.universe is not universe
+    assert sorted(orofxorbid.items) == ['C', 'D', 'E']
+    assert str(orofxorbid.bids[1]) == "(['E'], 1)"
+
+    # translation does not leak dummy items into the original universe
+    xorbid1.to_OR()
+    assert 'd' not in universe
+
+def test_XORofOR_orthogonal_encoding():
+    # five clauses of three atoms each, with no real items in common
+    clauses = [OR([(["%s%d" % (c, k)], k + 1) for k in range(3)]) for c in "ABCDE"]
+    xoroforbid = XORofOR(clauses)
+    assert xoroforbid.pairwise_dummies() == 90
+
+    orbid = xoroforbid.to_OR()
+    assert len(orbid.items) - len(xoroforbid.items) <= 25
+    assert str(xoroforbid.to_OR(encoding="orthogonal")) == str(orbid)
+
+    # atoms share a dummy exactly when they come from different clauses
+    for i in range(15):
+        for j in range(i + 1, 15):
+            shared = set(orbid.atom_ids(i)) & set(orbid.atom_ids(j))
+            assert bool(shared) == (i // 3 != j // 3)
+
+    with pytest.raises(ValueError):
+        xoroforbid.to_OR(encoding="triangular")
+
+def test_native_WDP():
+    bid1 = (["A", "B"], 10)
+    bid2 = (["C"], 12)
+    bid3 = (["B", "C"], 15)
+    bid4 = (["D"], 4)
+
+    # an OR bid is its own translation
+    orbid = OR([bid1, bid2, bid3])
+    assert orbid.WDP(translate=True) == orbid.WDP()
+
+    xorbid = XOR([bid1, bid2, bid3])
+    assert xorbid.WDP() == [(2, ['B', 'C'], 15)]
+    assert xorbid.WDP(translate=True) == xorbid.WDP()
+
+    orofxorbid = ORofXOR([XOR([bid1, bid2]), XOR([bid3, bid4])])
+    assert orofxorbid.WDP() == [(1, ['C'], 12), (3, ['D'], 4)]
+    assert orofxorbid.WDP(translate=True) == orofxorbid.WDP()
+
+    # the first clause is worth 22 and beats any mix of atoms across clauses
+    xoroforbid = XORofOR([OR([bid1, bid2]), OR([bid3, bid4])])
+    assert xoroforbid.WDP() == [(0, ['A', 'B'], 10), (1, ['C'], 12)]
+    assert xoroforbid.WDP(translate=True) == xoroforbid.WDP()
+    model = xoroforbid.model()
+    assert model.num_indicators == 2
+    assert len(model.groups) == 5
+
+def test_bnb_engine():
+    bid1 = (['D'], 1)
+    bid2 = (['A', 'B'], 3)
+    bid3 = (['B', 'C'], 2.5)
+    bid4 = (['A', 'C', 'D'], 3)
+    bid5 = (['E', 'C', 'D'], 1.5)
+    bid6 = (['E', 'F'], 4.5)
+    bid7 = (['F'], 3.5)
+    bid8 = (['B', 'D'], 1)
+    orbid = OR([bid1, bid2, bid3, bid4, bid5, bid6, bid7, bid8])
+    assert orbid.WDP(engine="bnb") == [(0, ['D'], 1), (1, ['A', 'B'], 3), (5, ['E', 'F'], 4.5)]
+    assert OR([([], 2), (['A'], 0)]).WDP(engine="bnb") == [(0, [], 2)]
+
+    bid1 = (["A", "B"], 10)
+    bid2 = (["C"], 12)
+    bid3 = (["B", "C"], 15)
+    bid4 = (["D"], 4)
+    assert XOR([bid1, bid2, bid3]).WDP(engine="bnb") == [(2, ['B', 'C'], 15)]
+    orofxorbid = ORofXOR([XOR([bid1, bid2]), XOR([bid3, bid4])])
+    assert orofxorbid.WDP(engine="bnb") == [(1, ['C'], 12), (3, ['D'], 4)]
+    xoroforbid = XORofOR([OR([bid1, bid2]), OR([bid3, bid4])])
+    assert xoroforbid.WDP(engine="bnb") == [(0, ['A', 'B'], 10), (1, ['C'], 12)]
+    xoroforbid = XORofOR([OR([bid1, bid2]), OR([bid3, (["D"], 8)])])
+    assert xoroforbid.WDP(engine="bnb") == [(2, ['B', 'C'], 15), (3, ['D'], 8)]
+
+    with pytest.raises(ValueError):
+        orbid.WDP(engine="simplex")
+
+def test_streaming_translation():
+    bid1 = (["A", "B"], 10)
+    bid2 = (["C"], 12)
+    bid3 = (["B", "C"], 15)
+    bid4 = (["D"], 4)
+    bids = [XOR([bid1, bid2, bid3]), ORofXOR([XOR([bid1, bid2]), XOR([bid3, bid4])]),
+            XORofOR([OR([bid1, bid2]), OR([bid3]), OR([bid4, bid1])])]
+    for bid in bids:
+        translated = bid.to_OR()
+        assert list(bid.iter_OR()) == translated.bids
+        assert bid.translation_size() == (translated.size, len(translated.item_ids))
+    xoroforbid = bids[2]
+    assert list(xoroforbid.iter_OR(encoding="orthogonal")) == xoroforbid.to_OR("orthogonal").bids
+    with pytest.raises(ValueError):
+        xoroforbid.iter_OR(encoding="triangular")
+
+    # from_iter consumes a generator once and checks atoms like the constructor
+    orbid = OR.from_iter(atom for atom in xoroforbid.iter_OR())
+    assert orbid.bids == xoroforbid.to_OR().bids
+    with pytest.raises(TypeError):
+        OR.from_iter(iter([(["A"], "1")]))
+
+def test_from_arrays():
+    atoms = [(['A', 'B'], 3), (['B', 'C', 'B'], 2.5), ([], 1)]
+    item_ids, offsets, values = [0, 1, 1, 2, 1], [0, 2, 5, 5], [3, 2.5, 1]
+    orbid = OR.from_arrays(item_ids, offsets, values, items=['A', 'B', 'C'])
+    assert orbid.bids == OR(atoms).bids
+    assert str(orbid) == str(OR(atoms))
+    xorbid = XOR.from_arrays(array('i', item_ids), array('q', offsets), values, universe=orbid.universe)
+    assert xorbid.bids == XOR(atoms).bids and xorbid.universe is orbid.universe
+    # without names the ids are the items
+    assert OR.from_arrays([2, 0], [0, 1, 2], [1, 2]).bids == [([2], 1), ([0], 2)]
+    # trusted arrays are kept as they are
+    ids = array('i', [0, 1])
+    assert OR.from_arrays(ids, array('q', [0, 2]), [1], trusted=True).item_ids is ids
+
+    with pytest.raises(ValueError):
+        OR.from_arrays([0, 3], [0, 2], [1], items=['A', 'B'])
+    with pytest.raises(ValueError):
+        OR.from_arrays([0, 1], [0, 2, 1], [1, 2], items=['A', 'B'])
+    with pytest.raises(ValueError):
+        OR.from_arrays([0], [0, 1], [1], items=['A', 'A'])
+    with pytest.raises(TypeError):
+        OR.from_arrays([0], [0, 1], ['1'], items=['A'])
+
+def test_from_numpy_arrays():
+    numpy = pytest.importorskip("numpy")
+    orbid = OR.from_arrays(numpy.array([0, 1, 1, 2, 1]), numpy.array([0, 2, 5, 5]),
+                           numpy.array([3, 2, 1]), items=['A', 'B', 'C'])
+    assert orbid.bids == [(['A', 'B'], 3), (['B', 'C'], 2), ([], 1)]
+    assert type(orbid.values[0]) == int
+    with pytest.raises(TypeError):
+        OR.from_arrays(numpy.array([0.5]), numpy.array([0, 1]), numpy.array([1]))
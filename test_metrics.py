@@ -0,0 +1,41 @@
+import json
+import logging
+from metrics import LogHook, add_hook, collect, enabled, phase, remove_hook
+from orlanguage import OR
+from xoroforlanguage import XORofOR
+
+
+def make_bid():
+    return XORofOR([OR([(['A', 'B'], 10), (['C'], 12)]), OR([(['B', 'C'], 15), (['D'], 8)])])
+
+def test_metrics():
+    assert not enabled()
+    assert phase("solve") is phase("model")
+
+    bid = make_bid()
+    with collect() as metrics:
+        bid.WDP(engine="bnb", translate=True)
+    assert not enabled()
+    for name in ["to_OR", "model", "presolve", "solve", "solver", "extract"]:
+        assert metrics.calls[name] == 1 and metrics.timings[name] >= 0
+    # pairwise encoding: one dummy per cross-clause pair
+    assert metrics.counters["dummy_items"] == 4
+    assert metrics.counters["atoms"] == 4 and metrics.counters["items"] == 8
+    assert metrics.counters["bnb_nodes"] > 0
+
+    with collect() as metrics:
+        bid.WDP(engine="pulp", presolve=False)
+    assert metrics.counters["constraints"] == 7
+    assert "lp_iterations" in metrics.counters and metrics.calls["read_solution"] == 1
+
+def test_log_hook(caplog):
+    hook = LogHook()
+    add_hook(hook)
+    try:
+        with caplog.at_level(logging.DEBUG, logger="biddinglanguages.metrics"):
+            OR([(['A'], 1)]).WDP(engine="bnb")
+    finally:
+        remove_hook(hook)
+    records = [json.loads(record.getMessage()) for record in caplog.records]
+    assert {"kind": "count", "name": "atoms", "value": 1} in records
+    assert any(r["kind"] == "time" and r["name"] == "solve" for r in records)
@@ -0,0 +1,56 @@
+import random
+import pytest
+from bidtree import BidTree, ORNode, XORNode
+from generator import InstanceGenerator
+from orlanguage import OR
+from orofxorlanguage import ORofXOR
+from xorlanguage import XOR
+from xoroforlanguage import XORofOR
+
+
+def restricted(bid, bundle):
+    """The bid with only the atoms that fit in bundle."""
+    def fit(atoms):
+        return [atom for atom in atoms if set(atom[0]) <= bundle]
+    if type(bid) in (OR, XOR):
+        return type(bid)(fit(bid.bids))
+    return type(bid)([bid.clause_type(fit(clause.bids)) for clause in bid.bids])
+
+def test_value():
+    orbid = OR([(['A', 'B'], 3), (['B', 'C'], 2), (['C'], 2), (['A'], 1)])
+    assert orbid.value(['A', 'B', 'C']) == 5
+    assert orbid.value({'B', 'C', 'Z'}) == 2
+    assert orbid.value([]) == 0
+    xorbid = XOR([(['A', 'B'], 3), (['B', 'C'], 2), (['C'], 2), (['A'], 1)])
+    assert xorbid.value(['A', 'B', 'C']) == 3 and xorbid.value(['A', 'C']) == 2
+    assert XORofOR([OR([(['A'], 3), (['B'], 1)]), OR([(['A', 'B'], 5)])]).value(['A', 'B']) == 5
+    assert ORofXOR([XOR([(['A'], 3), (['B'], 4)]), XOR([(['C'], 5)])]).value(['A', 'B', 'C']) == 9
+    tree = BidTree(XORNode([ORNode([(['A'], 3), XORNode([(['B'], 2), (['C'], 4)])]),
+                            (['A', 'B'], 6)]))
+    assert [tree.value(bundle) for bundle in [['A', 'B', 'C'], ['A', 'B'], ['B', 'C']]] == [7, 6, 4]
+    with pytest.raises(TypeError):
+        orbid.value("ABC")
+
+def test_value_random():
+    rng = random.Random(0)
+    for seed in range(20):
+        for language in ['OR', 'XOR', 'ORofXOR', 'XORofOR']:
+            # few items go through the subset recursion, many through branch and bound
+            for num_items in [8, 30]:
+                bid = InstanceGenerator(seed).bid(language, 'uniform', num_items, 12, 3, 3)
+                names = bid.universe.names
+                for query in range(4):
+                    bundle = set(rng.sample(names, rng.randint(0, len(names))))
+                    assert bid.value(bundle) == restricted(bid, bundle).WDP(engine="bnb").objective
+                assert bid.value(names) == bid.WDP(engine="bnb").objective
+    # answers are memoized, one per distinct bundle asked
+    memoized = len(bid._oracle.memo)
+    assert 1 <= memoized <= 5
+    assert bid.value(names) == bid.WDP(engine="bnb").objective
+    assert len(bid._oracle.memo) == memoized
+
+def test_value_many_groups():
+    # one bit per group is decided at a time, far more than the recursion limit
+    bid = ORofXOR([XOR([(['A'], 1), (['B'], 2)]) for k in range(1500)])
+    assert bid.value(['A', 'B']) == 3
+    assert bid.value(['B']) == 2
@@ -0,0 +1,37 @@
+from orlanguage import OR
+from orofxorlanguage import ORofXOR
+from presolve import Presolve
+from xorlanguage import XOR
+from xoroforlanguage import XORofOR
+
+
+def test_presolve():
+    orbid = OR([(['A', 'B'], 3), (['B', 'A'], 5), (['A'], 6), (['B', 'C'], 2),
+                (['E'], 1), (['C'], 0), (['C', 'D'], 4)])
+    reduction = Presolve(orbid.model())
+    # (['A', 'B'], 3) and its duplicate are dominated by (['A'], 6), which
+    # then conflicts with nothing, like (['E'], 1); (['C'], 0) is worthless
+    assert reduction.kept == [3, 6]
+    assert reduction.fixed == [2, 4]
+    assert reduction.model.num_atoms == 2
+    assert orbid.WDP() == [(2, ['A'], 6), (4, ['E'], 1), (6, ['C', 'D'], 4)]
+    assert orbid.WDP(presolve=False) == orbid.WDP()
+    assert orbid.WDP().objective == 11
+    # without the dominance scan only worthless and free atoms go
+    reduction = Presolve(orbid.model(), dominance=False)
+    assert reduction.kept == [0, 1, 2, 3, 6] and reduction.fixed == [4]
+    # past its deadline presolve leaves the model alone
+    reduction = Presolve(orbid.model(), deadline=0)
+    assert not reduction.reduced and reduction.fixed == []
+    assert orbid.WDP(engine="bnb", time_limit=10) == orbid.WDP()
+
+    # dominance only applies within the same XOR clause
+    orofxorbid = ORofXOR([XOR([(['A', 'B'], 3), (['A'], 4)]), XOR([(['A', 'C'], 5), (['C'], 1)])])
+    assert Presolve(orofxorbid.model()).kept == [1, 2, 3]
+    assert orofxorbid.WDP(engine="bnb") == orofxorbid.WDP(engine="bnb", presolve=False)
+
+    # an atom with free items is still bound to its clause in XORofOR
+    xoroforbid = XORofOR([OR([(['A'], 3), (['Z'], 1)]), OR([(['A'], 5)])])
+    reduction = Presolve(xoroforbid.model())
+    assert reduction.fixed == []
+    assert xoroforbid.WDP() == [(2, ['A'], 5)]
@@ -0,0 +1,153 @@
+import asyncio
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from bidfile import dumps, to_records
+from metrics import collect
+from orlanguage import OR
+from service import AuctionService, ServiceClient
+from xoroforlanguage import XORofOR
+
+
+def make_bid():
+    return XORofOR([OR([(["A", "B"], 10), (["C"], 4)]), OR([(["B", "C"], 15)])])
+
+def test_service(monkeypatch):
+    async def run():
+        service = AuctionService(workers=2, processes=False)
+        server = await service.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+        client = await ServiceClient.connect(port=port)
+        try:
+            bid = make_bid()
+            expected = bid.WDP(engine="bnb").as_dict()
+
+            # bids come as JSONL records or binary files and are kept by fingerprint
+            reply = await client.call({"op": "submit", "bid": list(to_records(bid)), "id": 1})
+            assert reply == {"bid": bid.fingerprint(), "atoms": 3, "id": 1}
+
+            # a fingerprint in the request is the key, the bid is not hashed again
+            fingerprint = bid.fingerprint()
+            with monkeypatch.context() as patch:
+                patch.setattr(XORofOR, "fingerprint", None)
+                reply = await client.call({"op": "solve", "bid": fingerprint,
+                                           "options": {"engine": "bnb"}})
+            assert reply == expected
+            reply = await client.call({"op": "solve", "options": {"engine": "bnb"}}, dumps(bid))
+            assert reply == expected
+
+            reply = await client.call({"op": "solve", "bid": "nope", "id": "x"})
+            assert reply["id"] == "x" and "Unknown bid" in reply["error"]
+            reply = await client.call({"op": "shout"})
+            assert "error" in reply
+
+            stats = await client.call({"op": "stats"})
+            assert stats["requests"] == 6 and stats["solves"] == 2 and stats["errors"] == 2
+            assert stats["queue_depth"] == 0 and stats["latency_p99"] >= stats["latency_p50"] > 0
+        finally:
+            await client.close()
+            await service.close()
+    asyncio.run(run())
+
+def test_coalesce():
+    async def run():
+        service = AuctionService(workers=1, processes=False)
+        service.start()
+        try:
+            bid = make_bid()
+            with collect() as m:
+                results = await asyncio.gather(
+                    service.solve(bid, {"engine": "bnb"}), service.solve(make_bid(), {"engine": "bnb"}),
+                    service.solve(bid, {"engine": "bnb", "gap": 0.5}))
+            assert results[0] == results[1]
+            assert results[2]["winners"] == results[0]["winners"]
+            assert service.solves == 2 and service.coalesced == 1
+            assert m.counters["service_coalesced"] == 1 and m.calls["service_queue"] == 2
+        finally:
+            await service.close()
+    asyncio.run(run())
+
+def test_given_up_while_full():
+    async def run():
+        # no workers, so the first solve fills the queue and the second waits for room
+        service = AuctionService(workers=1, concurrency=0, max_queue=1, processes=False)
+        service.start()
+        try:
+            bid = make_bid()
+            first = asyncio.ensure_future(service.solve(bid))
+            waiting = asyncio.ensure_future(service.solve(bid, {"engine": "bnb"}))
+            await asyncio.sleep(0.1)
+            coalesced = asyncio.ensure_future(service.solve(bid, {"engine": "bnb"}))
+            await asyncio.sleep(0.1)
+            assert service.coalesced == 1
+            waiting.cancel()
+            with pytest.raises(RuntimeError):
+                await coalesced
+            first.cancel()
+        finally:
+            await service.close()
+    asyncio.run(run())
+
+def test_processes(tmp_path):
+    async def run():
+        service = AuctionService(workers=2, max_queue=1)
+        path = str(tmp_path / "service.sock")
+        await service.serve(path=path)
+        try:
+            clients = [await ServiceClient.connect(path=path) for k in range(3)]
+            bids = [OR([(["A"], k + 1), (["A", "B"], 2 * k)]) for k in range(3)]
+            replies = await asyncio.gather(*[
+                client.call({"op": "solve", "bid": list(to_records(bid)),
+                             "options": {"engine": "bnb"}})
+                for client, bid in zip(clients, bids)])
+            assert [reply["objective"] for reply in replies] == [1, 2, 4]
+            for client in clients:
+                await client.close()
+        finally:
+            await service.close()
+    asyncio.run(run())
+
+def test_bad_payloads():
+    async def run():
+        service = AuctionService(workers=1, processes=False, max_payload=1024)
+        server = await service.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            data = bytearray(dumps(make_bid()))
+            # an item id past the item table is caught before the bid is built;
+            # the ids follow the names "ABC", padded to 8 bytes
+            data[data.index(b"ABC") + 8] = 9
+            client = await ServiceClient.connect(port=port)
+            reply = await client.call({"op": "submit"}, bytes(data))
+            assert "universe" in reply["error"]
+            assert "bid" in await client.call({"op": "submit"}, dumps(make_bid()))
+            await client.close()
+
+            # too long a payload ends the connection after the error
+            client = await ServiceClient.connect(port=port)
+            reply = await client.call({"op": "submit"}, b"\0" * 2048)
+            assert "Payload length" in reply["error"]
+            assert await client.reader.readline() == b""
+            await client.close()
+        finally:
+            await service.close()
+    asyncio.run(run())
+
+def test_broken_pool():
+    async def run():
+        service = AuctionService(workers=1)
+        service.start()
+        try:
+            bid = make_bid()
+            expected = bid.WDP(engine="bnb").as_dict()
+            assert await service.solve(bid, {"engine": "bnb"}) == expected
+            # a worker that dies breaks the pool; the service replaces it
+            broken = service._executor
+            for process in list(broken._processes.values()):
+                process.kill()
+            with pytest.raises(BrokenProcessPool):
+                await service.solve(bid, {"engine": "bnb", "gap": 0.1})
+            assert service._executor is not broken
+            assert await service.solve(bid, {"engine": "bnb"}) == expected
+        finally:
+            await service.close()
+    asyncio.run(run())
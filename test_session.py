@@ -0,0 +1,43 @@
+import pytest
+from orlanguage import OR
+from session import WDPSession
+
+
+@pytest.mark.parametrize("engine", ["pulp", "bnb"])
+def test_session(engine):
+    orbid = OR([(['A'], 2), (['A', 'B', 'D'], 3), (['B', 'C'], 2), (['C', 'D'], 1)])
+    session = WDPSession(orbid, engine=engine)
+    assert len(session) == 4
+    assert session.solve() == [(0, ['A'], 2), (2, ['B', 'C'], 2)]
+
+    # withdrawing a losing atom keeps the winners without re-solving
+    session.remove_atom(3)
+    assert session.optimal
+    assert session.solve() == [(0, ['A'], 2), (2, ['B', 'C'], 2)]
+
+    key = session.add_atom(['D', 'E'], 4)
+    assert session.solve() == [(0, ['A'], 2), (2, ['B', 'C'], 2), (key, ['D', 'E'], 4)]
+
+    session.update_value(1, 10)
+    assert session.solve() == [(1, ['A', 'B', 'D'], 10)]
+    session.update_value(1, 12)
+    assert session.optimal
+
+    session.remove_atom(1)
+    assert session.solve() == [(0, ['A'], 2), (2, ['B', 'C'], 2), (key, ['D', 'E'], 4)]
+
+    with pytest.raises(TypeError):
+        session.add_atom(['A'], "ten")
+    with pytest.raises(ValueError):
+        WDPSession(engine="simplex")
+
+def test_session_remove_all():
+    # the problem is dropped once retired variables outnumber live atoms
+    session = WDPSession(engine="pulp")
+    keys = [session.add_atom([item], 1) for item in "ABC"]
+    assert len(session.solve()) == 3
+    for key in keys:
+        session.remove_atom(key)
+    assert session.problem is None and session.solve() == []
+    key = session.add_atom(['A'], 5)
+    assert session.solve() == [(key, ['A'], 5)]
@@ -0,0 +1,129 @@
+import time
+
+from approx import approximate
+from backends import get_backend
+from decompose import solve_components
+from metrics import count, enabled, phase
+from presolve import Presolve
+
+# share of time_limit the warm start heuristic may use when budget_ms is not given
+WARM_START_SHARE = 0.1
+
+
+class WDPModel(object):
+    """Winner determination problem built directly from a bid's structure.
+
+    Variables 0 .. num_atoms - 1 are the atoms, stored in CSR form like the
+    bids themselves. Variables from num_atoms on are clause indicators. Every
+    group (members, parent) is one "at most one" row, sum(members) <= parent,
+    or sum(members) <= 1 when parent is None.
+    """
+
+    __slots__ = ('item_ids', 'offsets', 'values', 'groups', 'num_indicators')
+
+    def __init__(self, item_ids, offsets, values, groups=None, num_indicators=0):
+        self.item_ids = item_ids
+        self.offsets = offsets
+        self.values = values
+        self.groups = groups if groups is not None else []
+        self.num_indicators = num_indicators
+
+    @property
+    def num_atoms(self):
+        return len(self.values)
+
+    def item_rows(self):
+        """Returns a dict mapping each item id to the atoms that contain it."""
+        rows = {}
+        item_ids, offsets = self.item_ids, self.offsets
+        for i in range(self.num_atoms):
+            for k in range(offsets[i], offsets[i + 1]):
+                rows.setdefault(item_ids[k], []).append(i)
+        return rows
+
+    def count_size(self):
+        """Reports the atoms, distinct items, constraint rows and indicators to the metrics hooks."""
+        rows = self.item_rows()
+        count("atoms", self.num_atoms)
+        count("items", len(rows))
+        count("indicators", self.num_indicators)
+        count("constraints", sum(1 for atoms in rows.values() if len(atoms) > 1)
+              + sum(1 for members, parent in self.groups if parent is not None or len(members) > 1))
+
+    def write_mps(self, path):
+        """Writes the model to an MPS file, see matrixmodel.write_mps."""
+        from matrixmodel import write_mps
+        write_mps(self, path)
+
+    def solve(self, engine="auto", incumbent=None, presolve=True, workers=1,
+              mode="exact", budget_ms=None, warm_start=False, **options):
+        """Solves the model and returns a SolveResult.
+
+        engine is "pulp" (CBC through pulp), "bnb" (the in-process branch and
+        bound of bnb.py), "dp" (the subset dynamic programming of dp.py, for
+        few items), "highs" (HiGHS through scipy, given the whole model as
+        one sparse matrix) or the name of any other pulp solver installed
+        here; see backends.available_backends(). "auto" is resolved for this
+        model by backends.get_backend. options are the backend settings
+        time_limit (seconds), gap (relative MIP gap) and threads; time_limit
+        is wall-clock time for the whole call, so presolve and decomposition
+        use up part of it. incumbent is an optional feasible set of atom
+        indexes to start from; given one, or warm_start, "auto" prefers an
+        engine that takes it. "highs" and "dp" take no start, so incumbent
+        and warm_start are dropped for them. Unless presolve is False the model is first reduced by presolve.Presolve,
+        without its dominance scan for "dp".
+        The model is then split into independent parts that are solved on
+        their own, on a pool of workers processes when workers > 1 (see
+        decompose.solve_components).
+
+        With mode="approx" no exact solver runs: approx.approximate returns
+        the best allocation it finds within budget_ms milliseconds, with an
+        upper bound and gap. Presolve cannot stop half way, so it is skipped
+        in that mode when there is a budget. With warm_start=True that
+        allocation is computed first and handed to the exact engine as its
+        MIP start; without budget_ms it gets WARM_START_SHARE of the time left.
+        """
+        if mode not in ("exact", "approx"):
+            raise ValueError("Unknown mode %r, expected 'exact' or 'approx'." % (mode,))
+        # time_limit bounds the whole call, every step gets what is left of it
+        time_limit = options.get("time_limit")
+        deadline = None if time_limit is None or mode != "exact" else time.time() + time_limit
+        backend = None
+        if mode == "exact":
+            backend = get_backend(engine, model=self, start=incumbent is not None or warm_start,
+                                  **options)
+            if not backend.takes_start:
+                # computing a start the engine ignores would only cost time
+                incumbent = None
+                warm_start = False
+        if enabled():
+            self.count_size()
+        model = self
+        with phase("presolve"):
+            # "dp" works per mask of items, so dropping atoms saves it nothing
+            reduction = Presolve(self, dominance=backend is None or backend.name != "dp",
+                                 deadline=deadline) \
+                if presolve and (mode == "exact" or budget_ms is None) else None
+        if reduction is not None and reduction.reduced:
+            count("presolve_removed", self.num_atoms - reduction.model.num_atoms)
+            model = reduction.model
+            incumbent = reduction.reduce_incumbent(incumbent)
+        else:
+            reduction = None
+
+        if mode == "approx":
+            with phase("approx"):
+                result = approximate(model, budget_ms)
+        else:
+            if warm_start:
+                # without a budget of its own the heuristic takes a share of the time left
+                if budget_ms is None and deadline is not None:
+                    budget_ms = WARM_START_SHARE * max(0.0, deadline - time.time()) * 1000.0
+                with phase("approx"):
+                    start = approximate(model, budget_ms).selected
+                if incumbent is None or sum(model.values[a] for a in start) > \
+                        sum(model.values[a] for a in incumbent):
+                    incumbent = start
+            with phase("solve"):
+                result = solve_components(model, backend, incumbent, workers, deadline)
+        return reduction.restore(result) if reduction is not None else result
@@ -1,79 +1,140 @@
-from biddinglanguage import BiddingLanguage
+from array import array
+from biddinglanguage import ClauseBid
+from itemuniverse import DummyAllocator
 from orlanguage import OR
-from xorlanguage import XOR
+from wdpmodel import WDPModel
 
-import copy
+def _next_prime(n):
+    """Returns the smallest prime that is at least n."""
+    n = max(n, 2)
+    while any(n % d == 0 for d in range(2, int(n ** 0.5) + 1)):
+        n += 1
+    return n
 
-class XORofOR(BiddingLanguage):
+class XORofOR(ClauseBid):
     """Class implementing XORofOR bidding language."""
 
-    def __init__(self, bids):
-
-        # Verify that bids are represented as a list
-        if type(bids) != list:
-            raise TypeError("Bids must be a list.")
-
-        total_items = []
-        size = 0
-        # Check that each bid is another OR bid
-        for bid in bids:
-            if type(bid) != OR:
-                raise TypeError("Each bid must be of type OR.")
-            size += bid.size
-            total_items.extend(bid.items)
-
-        # instantiate fields
-        self.bids = bids
-        self.join = "XOR"
-        self.size = size
-        self.items = list(set(total_items))
-
-    def __str__(self):
-        result = "(" + str(self.bids[0]) + ")"
-        for i in range(1, len(self.bids)):
-            result += " "+ self.join + " "
-            result += "(" + str(self.bids[i]) + ")"
-        return result
-
-    def to_OR(self):
-        """Translates XORofOR bid to the OR* bidding language."""
-
-        new_bids = []
-        current_items = list(self.items)
-        dummy = "d"
-        i = 0
-        clause_index = 0
-        curr_index = 0
-        dummies_per_bid = [[] for k in range(self.size)]
-        
+    __slots__ = ()
+    join = "XOR"
+    clause_type = OR
+
+    def __init__(self, bids, universe=None):
+        ClauseBid.__init__(self, bids, universe)
+
+    def clause_sizes(self):
+        """Returns the number of atoms in each OR clause."""
+        co = self.clause_offsets
+        return [co[c + 1] - co[c] for c in range(self.num_clauses)]
+
+    def pairwise_dummies(self):
+        """Number of dummy items the pairwise translation needs: one per cross-clause atom pair."""
+        total = 0
+        seen = 0
+        for n in self.clause_sizes():
+            total += n * seen
+            seen += n
+        return total
+
+    def to_OR(self, encoding="auto"):
+        """Translates XORofOR bid to the OR* bidding language.
+
+        Two atoms must share a dummy item exactly when they sit in different
+        clauses. The "pairwise" encoding gives every such pair its own dummy.
+        The "orthogonal" encoding lets one dummy cover one atom from each of
+        several clauses at once, using the rows of an orthogonal array over
+        GF(q), which needs at most q*q dummies for q >= every clause size.
+        "auto" picks whichever needs fewer dummies.
+        """
+        return self._translated(OR, encoding=encoding)
+
+    def _translate(self, universe, encoding="auto"):
+        if encoding not in ("auto", "pairwise", "orthogonal"):
+            raise ValueError("Encoding must be 'auto', 'pairwise' or 'orthogonal'.")
+        sizes = self.clause_sizes()
+        q = _next_prime(max(sizes + [len(sizes) - 1]))
+        dummies = DummyAllocator(universe)
+        if encoding == "orthogonal" or (encoding == "auto" and q * q < self.pairwise_dummies()):
+            return self._orthogonal_atoms(dummies, q)
+        return self._pairwise_atoms(dummies)
+
+    def _pairwise_atoms(self, dummies):
+        """Gives each atom one dummy for every atom of every other clause.
+
+        An atom allocates the dummies it shares with the atoms of later
+        clauses when it is reached. Dummy ids are consecutive, so the dummy
+        an earlier atom x allocated for atom k is found by arithmetic
+        instead of being stored.
+        """
+        co = self.clause_offsets
+        base = len(dummies.universe)
+        own = array('q')    # number of the first dummy allocated by each atom
+        allocated = 0
+
         # iterate through every OR clause in the bid
-        for i in range(len(self.bids)):
-            or_clause = self.bids[i]
-            clause_index += len(or_clause.bids)
-
-            # iterate through every bid in the clause
-            for items, value in or_clause.bids:
-                bid_dummies = []
-                # create a dummy variable for every other bid not in the current clause
-                for x in range(clause_index, self.size):
-                    while dummy in current_items:
-                        dummy = "d" + str(i)
-                        i += 1
-                    bid_dummies.append(dummy)
-                    current_items.append(dummy)
-                    dummies_per_bid[x].append(dummy)
-
-                # create new clause with previous dummies and it's newly created ones 
-                new_items = list(items)
-                new_items.extend(dummies_per_bid[curr_index])
-                new_items.extend(bid_dummies)
-                new_bids.append((new_items, value))
-                curr_index += 1
-        return OR(new_bids)  
-
-    def WDP(self):
-        """Solves winner determination problem."""
-        or_bid = self.to_OR()
-        return or_bid.WDP()
+        for c in range(self.num_clauses):
+            clause_index = co[c + 1]
+            later = self.size - clause_index
+            for k in range(co[c], clause_index):
+                ids = self.atom_ids(k)
+
+                # dummies shared with the atoms of earlier clauses
+                for e in range(c):
+                    skip = k - co[e + 1]
+                    ids.extend(base + own[x] + skip for x in range(co[e], co[e + 1]))
+
+                # a new dummy for every bid in a later clause
+                own.append(allocated)
+                for x in range(later):
+                    ids.append(dummies.new())
+                allocated += later
+                yield ids, self.values[k]
+
+    def _orthogonal_atoms(self, dummies, q):
+        """Covers every cross-clause pair with the rows of an orthogonal array.
+
+        Row (x, y) of the array gives clause c < q the symbol (x + c*y) mod q
+        and clause q the symbol y; any two clauses agree on a pair of symbols
+        in exactly one row. Atom j of clause c takes the dummy of every row
+        giving clause c symbol j, and rows touching fewer than two atoms are
+        dropped.
+        """
+
+        def rows(c, j):
+            if c < q:
+                return [((j - c * y) % q) * q + y for y in range(q)]
+            return [x * q + j for x in range(q)]
+
+        # count how many atoms use each row
+        hits = {}
+        for c in range(self.num_clauses):
+            for j in range(self.clause_offsets[c + 1] - self.clause_offsets[c]):
+                for row in rows(c, j):
+                    hits[row] = hits.get(row, 0) + 1
+
+        # allocate a dummy only for rows shared by two or more atoms
+        row_dummy = {}
+        for row in sorted(hits):
+            if hits[row] > 1:
+                row_dummy[row] = dummies.new()
+        del hits
+
+        for c in range(self.num_clauses):
+            first = self.clause_offsets[c]
+            for k in range(first, self.clause_offsets[c + 1]):
+                ids = self.atom_ids(k)
+                ids.extend(row_dummy[row] for row in rows(c, k - first) if row in row_dummy)
+                yield ids, self.values[k]
 
+    def model(self):
+        """Builds the WDP model with one indicator variable per OR clause.
 
+        Each atom is linked to its clause indicator and at most one indicator
+        may be set, so no dummy items are needed.
+        """
+        n = self.size
+        co = self.clause_offsets
+        groups = []
+        for c in range(self.num_clauses):
+            groups.extend(([k], n + c) for k in range(co[c], co[c + 1]))
+        groups.append((range(n, n + self.num_clauses), None))
+        return WDPModel(self.item_ids, self.offsets, self.values, groups, self.num_clauses)